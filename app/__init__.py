@@ -14,9 +14,70 @@ def create_app():
     global db
     db = SQLA(app)
     create_views(app)
+
+    from app.redis_manager import redis_manager
+    redis_manager.init_app(app)
+
+    from app.async_redis_manager import async_redis_manager
+    if app.config.get('REDIS_ASYNC_FANOUT', True):
+        async_redis_manager.init_app(app)
+        redis_manager.async_backend = async_redis_manager
+
+    from app.slowlog import slowlog_aggregator
+    slowlog_aggregator.init_app(app)
+
+    from app.pubsub_hub import pubsub_hub
+    pubsub_hub.init_app(app)
+
+    from app.metrics import multiprocess_store
+    multiprocess_store.init_app(app)
+
+    from app.permissions import permission_cache, create_permission_indexes
+    permission_cache.ttl = app.config.get('PERMISSION_CACHE_TTL', permission_cache.ttl)
+
+    from app.activity_storage import upgrade_activity_schema
+    from app.commands import activity_cli
+    with app.app_context():
+        upgrade_activity_schema(db.engine)
+        create_permission_indexes(db.engine)
+    app.cli.add_command(activity_cli)
+
+    start_background_workers(app)
     return app
 
 
+def start_background_workers(app):
+    from app.activity_writer import activity_writer
+    if app.config.get('ACTIVITY_ASYNC', True):
+        activity_writer.start(app)
+
+    from app.monitoring import metrics_poller
+    if app.config.get('METRICS_POLL_ENABLED', True):
+        metrics_poller.start(app)
+
+    from app.metrics import multiprocess_store
+    multiprocess_store.start()
+
+
+def stop_background_workers():
+    from app.activity_writer import activity_writer
+    from app.metrics import multiprocess_store
+    from app.monitoring import metrics_poller
+    activity_writer.stop()
+    metrics_poller.stop()
+    multiprocess_store.stop()
+
+
+def reset_after_fork(app):
+    # A worker forked from a preloaded master must not reuse the master's sockets or threads
+    from app.redis_manager import redis_manager
+    redis_manager.reset()
+    with app.app_context():
+        # close=False leaves the parent's connections alone, the worker just stops using them
+        db.engine.dispose(close=False)
+    start_background_workers(app)
+
+
 def create_views(app):
     global appbuilder
 
@@ -31,9 +92,12 @@ def create_views(app):
     from app.views.team import TeamView
     from app.views.team_redis_role import TeamRedisRoleView
     from app.views.activity import ActivityView
+    from app.views.metrics import MetricsView
 
     appbuilder.add_view(RedisConnectionView, "Connections", icon="fa-database")
     appbuilder.add_view(TeamView, "Teams", icon="fa-users")
     appbuilder.add_view(TeamRedisRoleView, "TeamRedisRole", icon="fa-vcard")
     appbuilder.add_view(ActivityView, 'ActivityFeed', icon="fa-file-text-o")
+    appbuilder.add_link('ActivitySearch', href='/activityview/feed/', icon="fa-search")
     appbuilder.add_view_no_menu(RedisDetailView)
+    appbuilder.add_view_no_menu(MetricsView)
@@ -0,0 +1,134 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import OperationalError
+
+from app.models import Activity, ActivityArchive
+
+log = logging.getLogger(__name__)
+
+# How message search is answered, decided once the schema is upgraded: "fts5", "postgres" or "like"
+search_backend = 'like'
+
+SQLITE_FTS_STATEMENTS = [
+    "CREATE VIRTUAL TABLE activity_fts USING fts5(message, content='activity', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS activity_fts_insert AFTER INSERT ON activity BEGIN "
+    "INSERT INTO activity_fts(rowid, message) VALUES (new.id, new.message); END",
+    "CREATE TRIGGER IF NOT EXISTS activity_fts_delete AFTER DELETE ON activity BEGIN "
+    "INSERT INTO activity_fts(activity_fts, rowid, message) VALUES ('delete', old.id, old.message); END",
+    "CREATE TRIGGER IF NOT EXISTS activity_fts_update AFTER UPDATE OF message ON activity BEGIN "
+    "INSERT INTO activity_fts(activity_fts, rowid, message) VALUES ('delete', old.id, old.message); "
+    "INSERT INTO activity_fts(rowid, message) VALUES (new.id, new.message); END",
+    "INSERT INTO activity_fts(activity_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade_activity_schema(engine):
+    """Bring an existing activity table up to date: new columns, indexes, the archive and the search index.
+
+    create_all only creates missing tables, and only on a fresh database, so what was added later is applied here.
+    """
+    global search_backend
+
+    ActivityArchive.__table__.create(engine, checkfirst=True)
+    table = Activity.__table__
+    existing = {column['name'] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as connection:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if hasattr(column.type, 'create'):
+                column.type.create(connection, checkfirst=True)
+            connection.execute(text(
+                f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}'))
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+
+    if engine.dialect.name == 'sqlite':
+        search_backend = 'fts5' if _install_sqlite_fts(engine) else 'like'
+    elif engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_activity_message_fts ON activity "
+                                    "USING GIN (to_tsvector('simple', message))"))
+        search_backend = 'postgres'
+    else:
+        search_backend = 'like'
+
+
+def _install_sqlite_fts(engine) -> bool:
+    with engine.begin() as connection:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'activity_fts'")).first()
+    if exists:
+        return True
+    try:
+        with engine.begin() as connection:
+            for statement in SQLITE_FTS_STATEMENTS:
+                connection.execute(text(statement))
+        return True
+    except OperationalError as e:
+        log.warning(f"SQLite FTS5 is not available, activity search falls back to LIKE: {e}")
+        return False
+
+
+def _fts5_query(search: str) -> str:
+    # Every word becomes a quoted phrase so FTS5 operators in user input are taken literally
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in search.split())
+
+
+def apply_message_search(query, search: str):
+    if not search.strip():
+        return query
+    if search_backend == 'fts5':
+        return query.filter(Activity.id.in_(
+            select(text('rowid')).select_from(text('activity_fts')).where(text('activity_fts MATCH :search'))
+        )).params(search=_fts5_query(search))
+    if search_backend == 'postgres':
+        return query.filter(func.to_tsvector('simple', Activity.message).op('@@')(
+            func.plainto_tsquery('simple', search)))
+    return query.filter(Activity.message.ilike(f'%{search}%'))
+
+
+def activity_page(session, before_id: int = None, limit: int = 50, search: str = None, connection_id: int = None,
+                  command: str = None, outcome=None, created_by_fk: int = None) -> Tuple[List[Activity], Optional[int]]:
+    """Keyset pagination over activities, newest first.
+
+    Returns the page and the id to pass as before_id for the next one, None on the last page.
+    """
+    query = session.query(Activity).order_by(Activity.id.desc())
+    if before_id is not None:
+        query = query.filter(Activity.id < before_id)
+    if connection_id is not None:
+        query = query.filter(Activity.connection_id == connection_id)
+    if command:
+        query = query.filter(Activity.command == command.upper())
+    if outcome is not None:
+        query = query.filter(Activity.outcome == outcome)
+    if created_by_fk is not None:
+        query = query.filter(Activity.created_by_fk == created_by_fk)
+    if search:
+        query = apply_message_search(query, search)
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+def archive_activities(session, older_than: datetime, batch_size: int = 1000) -> int:
+    """Move activities created before older_than into activity_archive, one batch per transaction."""
+    activity = Activity.__table__
+    columns = [column.name for column in ActivityArchive.__table__.columns]
+    archived = 0
+    while True:
+        ids = [row.id for row in session.query(Activity.id).filter(Activity.created_on < older_than)
+               .order_by(Activity.id).limit(batch_size)]
+        if not ids:
+            return archived
+        session.execute(ActivityArchive.__table__.insert().from_select(
+            columns, select(*[activity.c[name] for name in columns]).where(activity.c.id.in_(ids))))
+        session.execute(activity.delete().where(activity.c.id.in_(ids)))
+        session.commit()
+        archived += len(ids)
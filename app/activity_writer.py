@@ -0,0 +1,153 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy.exc import OperationalError
+
+from app.models import Activity
+from app.metrics import activity_write_latency
+
+log = logging.getLogger(__name__)
+
+
+class ActivityWriter:
+    """Queues activity records and inserts them in bulk from a background thread.
+
+    A batch is written once batch_size records are waiting or flush_interval seconds
+    have passed since the first one arrived. Whatever is queued is written on shutdown.
+    When the queue is full the request writes its record itself instead of waiting for room,
+    and a batch the database refused for a transient reason is retried with a growing delay.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0, max_queue_size: int = 10000,
+                 retries: int = 3, retry_backoff: float = 0.1):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.written = 0
+        self.failed = 0
+        self.overflowed = 0
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        if self.running:
+            return
+        self._app = app
+        self.batch_size = app.config.get('ACTIVITY_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('ACTIVITY_FLUSH_INTERVAL', self.flush_interval)
+        self.retries = app.config.get('ACTIVITY_WRITE_RETRIES', self.retries)
+        self.retry_backoff = app.config.get('ACTIVITY_RETRY_BACKOFF', self.retry_backoff)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='activity-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def write(self, message: str, connection_id: int = None, command: str = None, outcome=None):
+        # The user is read here, the writer thread has no request context
+        user_id = Activity.get_user_id()
+        now = datetime.now()
+        record = {
+            'message': message,
+            'connection_id': connection_id,
+            'command': command,
+            'outcome': outcome,
+            'created_on': now,
+            'changed_on': now,
+            'created_by_fk': user_id,
+            'changed_by_fk': user_id,
+        }
+        if not self.running:
+            self._insert([record])
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # The writer is behind (a stalled database), blocking here would hang every request thread
+            self.overflowed += 1
+            self._insert([record])
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                with self._app.app_context():
+                    self._insert(batch)
+
+        # Drain what is left once stop was requested
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            with self._app.app_context():
+                self._insert(batch)
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, records: List[Dict[str, Any]]):
+        from app import db
+
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            try:
+                with activity_write_latency.time(), db.engine.begin() as connection:
+                    connection.execute(Activity.__table__.insert(), records)
+                self.written += len(records)
+                return
+            except Exception as e:
+                # Locked SQLite files and dropped connections usually clear up, anything else will not
+                if isinstance(e, OperationalError) and attempt < self.retries:
+                    log.warning("Writing %s activity records failed, retrying in %.1fs", len(records), delay)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5)
+                    continue
+                self.failed += len(records)
+                log.exception("Failed to write %s activity records", len(records))
+                return
+
+activity_writer = ActivityWriter()
@@ -0,0 +1,272 @@
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Dict, Iterable, List, Tuple, Union
+
+import redis.asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster, ClusterNode
+from redis.asyncio.sentinel import Sentinel
+
+from app.client_registry import ClientRegistry
+from app.enums import RedisDeploymentType
+from app.metrics import redis_info_errors, redis_info_latency
+from app.redis_manager import _parse_hosts, _encode_cluster_cursor, _decode_cluster_cursor
+
+
+class EventLoopThread:
+    """An asyncio event loop on a daemon thread that blocking code hands coroutines to."""
+
+    def __init__(self, name: str = 'redis-async'):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self.loop.run_forever, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+            self._thread = None
+            self.loop = None
+
+    def run(self, coroutine: Awaitable, timeout: float = None) -> Any:
+        # Blocks the calling thread until the coroutine finished on the loop
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+
+async def _close_idle(client):
+    # Only idle connections, others may be in the middle of a command for another task
+    if isinstance(client, RedisCluster):
+        # Each node keeps its idle connections in _free, like client_registry.disconnect_idle
+        # they are closed where they wait and reconnect when they are next used
+        for node in client.get_nodes():
+            await asyncio.gather(*(connection.disconnect() for connection in list(node._free)),
+                                 return_exceptions=True)
+    else:
+        await client.connection_pool.disconnect(inuse_connections=False)
+
+
+class AsyncRedisManager:
+    """RedisManager's fan-out operations on redis.asyncio, run on one event loop thread.
+
+    Methods take RedisConnection rows instead of ids because the loop thread has no app
+    context to load them. At most max_concurrency commands are in flight at once. Clients live
+    under ('async', id) keys in the ClientRegistries of the RedisManager using this backend, so
+    they count against the same REDIS_MAX_CLIENTS and idle timeout as the blocking ones.
+    """
+
+    def __init__(self, max_concurrency: int = 32):
+        self.max_concurrency = max_concurrency
+        self.pool_options = {
+            'max_connections': 20,
+            'socket_timeout': 5,
+            'socket_connect_timeout': 3,
+            'health_check_interval': 30,
+        }
+        self.connections = ClientRegistry()
+        self.info_connections = ClientRegistry(max_clients=1024)
+        self.info_pool_size = 2
+        self.runner = EventLoopThread()
+        self._semaphore = None
+
+    def init_app(self, app):
+        self.max_concurrency = app.config.get('REDIS_ASYNC_MAX_CONCURRENCY', self.max_concurrency)
+        self.pool_options = {
+            'max_connections': app.config.get('REDIS_POOL_MAX_CONNECTIONS', self.pool_options['max_connections']),
+            'socket_timeout': app.config.get('REDIS_SOCKET_TIMEOUT', self.pool_options['socket_timeout']),
+            'socket_connect_timeout': app.config.get('REDIS_SOCKET_CONNECT_TIMEOUT',
+                                                     self.pool_options['socket_connect_timeout']),
+            'health_check_interval': app.config.get('REDIS_HEALTH_CHECK_INTERVAL',
+                                                    self.pool_options['health_check_interval']),
+        }
+
+    def run(self, coroutine: Awaitable, timeout: float = None) -> Any:
+        return self.runner.run(coroutine, timeout=timeout)
+
+    def share_registries(self, connections: ClientRegistry, info_connections: ClientRegistry):
+        self.connections = connections
+        self.info_connections = info_connections
+
+    def invalidate(self, connection_id: int):
+        self.connections.invalidate(('async', connection_id))
+        self.info_connections.invalidate(('async', connection_id))
+
+    def reset(self):
+        # Clients belong to the loop that created them, so both are thrown away together
+        clients = [registry.pop(key) for registry in (self.connections, self.info_connections)
+                   for key, _ in registry.items() if isinstance(key, tuple) and key[0] == 'async']
+        if clients and self.runner.loop is not None:
+            async def close_all():
+                await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+            self.run(close_all())
+        self._semaphore = None
+        self.runner.stop()
+
+    def reset_after_fork(self):
+        # The loop thread does not survive a fork, RedisManager.reset drops the inherited clients
+        self._semaphore = None
+        self.runner = EventLoopThread(self.runner.name)
+
+    def _close_client(self, client):
+        # Called from any thread by the registry, the close itself has to run on the client's loop
+        loop = self.runner.loop
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close_idle(client), loop)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created on first use so it is bound to the loop thread
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def gather(self, awaitables: Iterable[Awaitable], return_exceptions: bool = True) -> List[Any]:
+        async def bounded(awaitable):
+            async with self.semaphore:
+                return await awaitable
+
+        return await asyncio.gather(*(bounded(awaitable) for awaitable in awaitables),
+                                    return_exceptions=return_exceptions)
+
+    def get_connection(self, connection):
+        return self.connections.get_or_create(('async', connection.id), lambda: self._create_client(connection),
+                                              close=self._close_client)
+
+    def get_info_connection(self, connection):
+        # Small clients of their own, like RedisManager.fetch_info, INFO for every connection would churn the LRU
+        return self.info_connections.get_or_create(
+            ('async', connection.id), lambda: self._create_client(connection, max_connections=self.info_pool_size),
+            close=self._close_client)
+
+    def _create_client(self, connection, **pool_overrides):
+        pool_options = dict(self.pool_options, **pool_overrides)
+        if connection.deployment_type == RedisDeploymentType.STANDALONE:
+            return aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(
+                host=connection.host,
+                port=connection.port,
+                db=connection.db,
+                password=connection.password,
+                **pool_options
+            ))
+        elif connection.deployment_type == RedisDeploymentType.SENTINEL:
+            sentinel = Sentinel(_parse_hosts(connection.sentinel_hosts), password=connection.password,
+                                socket_timeout=pool_options['socket_timeout'])
+            return sentinel.master_for(connection.sentinel_master, **pool_options)
+        elif connection.deployment_type == RedisDeploymentType.MASTER_SLAVE:
+            return aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(
+                host=connection.master_host,
+                port=connection.master_port,
+                password=connection.password,
+                **pool_options
+            ))
+        elif connection.deployment_type == RedisDeploymentType.CLUSTER:
+            cluster_nodes = [ClusterNode(host, port) for host, port in _parse_hosts(connection.cluster_nodes)]
+            return RedisCluster(
+                startup_nodes=cluster_nodes,
+                password=connection.password,
+                **pool_options
+            )
+        raise ValueError(f"Unsupported deployment type: {connection.deployment_type}")
+
+    async def fetch_info(self, connection) -> Dict[str, Any]:
+        with redis_info_latency.time(connection.id, errors=redis_info_errors):
+            return await self.get_info_connection(connection).info()
+
+    async def get_redis_info(self, connection) -> Dict[str, Any]:
+        try:
+            info = await self.fetch_info(connection)
+            return {
+                'cpu_usage': info.get('used_cpu_sys', 'N/A'),
+                'memory_usage': info.get('used_memory_human', 'N/A'),
+                'status': 'Connected'
+            }
+        except Exception as e:
+            return {
+                'cpu_usage': 'N/A',
+                'memory_usage': 'N/A',
+                'status': f'Disconnected: {str(e)}'
+            }
+
+    async def get_redis_info_many(self, connections, timeout: float = None) -> Dict[int, Dict[str, Any]]:
+        # Hosts that miss the deadline are reported as timed out instead of holding up the caller.
+        # The deadline covers the wait for a semaphore slot, so a page never takes longer than timeout.
+        async def bounded(connection):
+            # INFO is only started once a slot is free, a timeout while waiting leaves nothing behind
+            async with self.semaphore:
+                return await self.get_redis_info(connection)
+
+        async def with_deadline(connection):
+            try:
+                return await asyncio.wait_for(bounded(connection), timeout)
+            except asyncio.TimeoutError:
+                return {
+                    'cpu_usage': 'N/A',
+                    'memory_usage': 'N/A',
+                    'status': 'Timed out'
+                }
+
+        connections = list(connections)
+        results = await asyncio.gather(*(with_deadline(connection) for connection in connections))
+        return {connection.id: result for connection, result in zip(connections, results)}
+
+    async def execute_command(self, connection, *args: Any) -> Any:
+        return await self.get_connection(connection).execute_command(*args)
+
+    async def scan_keys(self, connection, cursor: Union[int, str] = 0, match: str = None, count: int = None,
+                        _type: str = None) -> Tuple[Union[int, str], List[Any]]:
+        client = self.get_connection(connection)
+        if not isinstance(client, RedisCluster):
+            return await client.scan(cursor=int(cursor), match=match, count=count, _type=_type)
+
+        # Same opaque cursor as RedisManager._scan_cluster, so the two can continue each other's scans
+        await client.initialize()
+        cursor = str(cursor)
+        if cursor == '0':
+            cursors = {node.name: 0 for node in client.get_primaries()}
+        else:
+            cursors = _decode_cluster_cursor(cursor)
+
+        nodes = []
+        for node_name, node_cursor in cursors.items():
+            node = client.get_node(node_name=node_name)
+            if node is None:
+                raise ValueError(f"Cluster node {node_name} is gone, restart the scan")
+            nodes.append((node, node_cursor))
+
+        args = []
+        if match is not None:
+            args += ['MATCH', match]
+        if count is not None:
+            args += ['COUNT', count]
+        if _type is not None:
+            args += ['TYPE', _type]
+        replies = await self.gather((node.execute_command('SCAN', node_cursor, *args) for node, node_cursor in nodes),
+                                    return_exceptions=False)
+
+        next_cursors = {}
+        keys = []
+        for (node, _), (node_cursor, node_keys) in zip(nodes, replies):
+            keys.extend(node_keys)
+            if int(node_cursor) != 0:
+                next_cursors[node.name] = int(node_cursor)
+        return _encode_cluster_cursor(next_cursors), keys
+
+
+async_redis_manager = AsyncRedisManager()
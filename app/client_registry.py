@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from queue import Empty
+from typing import Any, Callable
+
+import redis
+from redis.cluster import RedisCluster
+
+
+def disconnect_idle(pool):
+    """Close the connections waiting in a pool, leaving the ones checked out by other threads alone.
+
+    Those finish their command and are closed when the pool is garbage collected.
+    """
+    if isinstance(pool, redis.BlockingConnectionPool):
+        # Its disconnect() has no idle-only mode, so idle connections are taken out of the
+        # queue, closed and put back, nobody else can pick them up in between
+        idle = []
+        while True:
+            try:
+                idle.append(pool.pool.get_nowait())
+            except Empty:
+                break
+        for connection in idle:
+            if connection is not None:
+                connection.disconnect()
+            pool.pool.put_nowait(connection)
+    else:
+        pool.disconnect(inuse_connections=False)
+
+
+def close_client(client):
+    # RedisCluster owns one pool per node, plain and Sentinel clients a single pool
+    if isinstance(client, RedisCluster):
+        for node in list(client.nodes_manager.nodes_cache.values()):
+            if node.redis_connection is not None:
+                disconnect_idle(node.redis_connection.connection_pool)
+        return
+    pool = getattr(client, 'connection_pool', None)
+    if pool is not None:
+        disconnect_idle(pool)
+    else:
+        client.close()
+
+
+class ClientRegistry:
+    """Thread-safe, size-bounded LRU of redis clients keyed by connection id.
+
+    Clients are closed with close_client unless get_or_create was given another close callable,
+    the async backend passes one that closes its clients on their event loop.
+    """
+
+    def __init__(self, max_clients: int = 64, idle_timeout: float = 600):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self._clients = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, connection_id: int):
+        with self._lock:
+            entry = self._clients.get(connection_id)
+            if entry is None:
+                return None
+            entry[1] = time.monotonic()
+            self._clients.move_to_end(connection_id)
+            return entry[0]
+
+    def get_or_create(self, connection_id: int, factory: Callable[[], Any],
+                      close: Callable[[Any], None] = close_client):
+        client = self.get(connection_id)
+        if client is not None:
+            return client
+
+        # Building a client can hit the network (cluster slot discovery), so the
+        # lock is not held while the factory runs. The first client stored wins.
+        created = factory()
+        with self._lock:
+            entry = self._clients.get(connection_id)
+            if entry is not None:
+                close(created)
+                return self.get(connection_id)
+            self._clients[connection_id] = [created, time.monotonic(), close]
+            evicted = self._collect_evictions()
+        for client, _, close_evicted in evicted:
+            close_evicted(client)
+        return created
+
+    def invalidate(self, connection_id: int):
+        with self._lock:
+            entry = self._clients.pop(connection_id, None)
+        if entry is not None:
+            client, _, close = entry
+            close(client)
+
+    def pop(self, connection_id: int):
+        # Takes a client out without closing it, None when there is none
+        with self._lock:
+            entry = self._clients.pop(connection_id, None)
+        return entry[0] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+        for client, _, close in entries:
+            close(client)
+
+    def items(self):
+        with self._lock:
+            return [(connection_id, entry[0]) for connection_id, entry in self._clients.items()]
+
+    def _collect_evictions(self):
+        # Least recently used clients sit at the front, drop idle ones and then trim to size
+        evicted = []
+        now = time.monotonic()
+        while len(self._clients) > 1:
+            connection_id, entry = next(iter(self._clients.items()))
+            if len(self._clients) <= self.max_clients and now - entry[1] < self.idle_timeout:
+                break
+            del self._clients[connection_id]
+            evicted.append(entry)
+        return evicted
+
+    def __contains__(self, connection_id: int):
+        with self._lock:
+            return connection_id in self._clients
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
@@ -0,0 +1,116 @@
+import re
+from typing import List, Tuple, Union
+
+_WHITESPACE_RE = re.compile(r'\s*')
+# Characters that end or change the meaning of an unquoted argument
+_BARE_SPECIAL_RE = re.compile(r'[\s{}\[\]"]')
+_EMBEDDED_STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# Inside {...} or [...] everything up to the next bracket is skipped in one match, strings included
+_NESTED_TEXT_RE = re.compile(r'(?:[^{}\[\]"]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.DOTALL)
+_DOUBLE_QUOTED_SPECIAL_RE = re.compile(r'["\\]')
+_SINGLE_QUOTED_SPECIAL_RE = re.compile(r"['\\]")
+_HEX_RE = re.compile(r'[0-9a-fA-F]{2}')
+
+_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'a': '\a'}
+_OPENING = '{['
+_CLOSING = '}]'
+
+
+def split_command(command_string: str) -> List[Union[str, bytes]]:
+    """Split a console line into arguments the way redis-cli does.
+
+    "double quoted" arguments understand \\n, \\r, \\t, \\b, \\a, \\xHH and \\ escapes, 'single quoted'
+    ones only \\'. An argument with a \\xHH escape is returned as bytes, so \\xff is sent as one raw byte.
+    Unquoted arguments may contain JSON: whitespace inside {...} or [...] does not split them.
+    The line is walked slice by slice, so the cost is linear in its length.
+    """
+    parts = []
+    position, length = 0, len(command_string)
+    while True:
+        position = _WHITESPACE_RE.match(command_string, position).end()
+        if position >= length:
+            return parts
+        char = command_string[position]
+        if char == '"':
+            part, position = _read_double_quoted(command_string, position + 1)
+        elif char == "'":
+            part, position = _read_single_quoted(command_string, position + 1)
+        else:
+            part, position = _read_bare(command_string, position)
+        parts.append(part)
+
+
+def _read_double_quoted(command_string: str, position: int) -> Tuple[Union[str, bytes], int]:
+    chunks = []
+    raw = False
+    while True:
+        match = _DOUBLE_QUOTED_SPECIAL_RE.search(command_string, position)
+        if match is None:
+            raise ValueError("Unbalanced quotes in command")
+        chunks.append(command_string[position:match.start()])
+        if match.group() == '"':
+            end = _after_closing_quote(command_string, match.end())
+            if raw:
+                # redis-py would send a str UTF-8 encoded, \xff must stay the single byte 0xff
+                return b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+                                for chunk in chunks), end
+            return ''.join(chunks), end
+
+        escaped = command_string[match.end():match.end() + 1]
+        hex_digits = _HEX_RE.match(command_string, match.end() + 1) if escaped == 'x' else None
+        if hex_digits:
+            chunks.append(bytes([int(hex_digits.group(), 16)]))
+            raw = True
+            position = hex_digits.end()
+        else:
+            chunks.append(_ESCAPES.get(escaped, escaped))
+            position = match.end() + 1
+
+
+def _read_single_quoted(command_string: str, position: int) -> Tuple[str, int]:
+    chunks = []
+    while True:
+        match = _SINGLE_QUOTED_SPECIAL_RE.search(command_string, position)
+        if match is None:
+            raise ValueError("Unbalanced quotes in command")
+        chunks.append(command_string[position:match.start()])
+        if match.group() == "'":
+            return ''.join(chunks), _after_closing_quote(command_string, match.end())
+
+        # Only \' is an escape, any other backslash is kept as is
+        if command_string[match.end():match.end() + 1] == "'":
+            chunks.append("'")
+            position = match.end() + 1
+        else:
+            chunks.append('\\')
+            position = match.end()
+
+
+def _after_closing_quote(command_string: str, position: int) -> int:
+    if position < len(command_string) and not command_string[position].isspace():
+        raise ValueError("Closing quote must be followed by a space")
+    return position
+
+
+def _read_bare(command_string: str, start: int) -> Tuple[str, int]:
+    depth = 0
+    position = start
+    while True:
+        if depth:
+            position = _NESTED_TEXT_RE.match(command_string, position).end()
+        match = _BARE_SPECIAL_RE.search(command_string, position)
+        if match is None:
+            return command_string[start:], len(command_string)
+        char = match.group()
+        if char == '"':
+            # A string inside the argument is kept verbatim, braces and spaces in it do not count
+            string = _EMBEDDED_STRING_RE.match(command_string, match.start())
+            position = string.end() if string else match.end()
+        elif char in _OPENING:
+            depth += 1
+            position = match.end()
+        elif char in _CLOSING:
+            depth = max(depth - 1, 0)
+            position = match.end()
+        else:
+            return command_string[start:match.start()], match.start()
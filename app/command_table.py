@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Optional
+
+from redis.crc import key_slot
+
+
+def _str(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+class CommandSpec:
+    """What COMMAND reports about one command: arity, flags and where its keys are."""
+
+    def __init__(self, name: str, arity: int, flags: List[str], first_key: int, last_key: int, step: int,
+                 subcommands: Dict[str, 'CommandSpec'] = None):
+        self.name = name
+        self.arity = arity
+        self.flags = set(flags)
+        self.first_key = first_key
+        self.last_key = last_key
+        self.step = step
+        self.subcommands = subcommands or {}
+
+    @classmethod
+    def from_row(cls, row) -> 'CommandSpec':
+        # A raw COMMAND reply row: name, arity, flags, first key, last key, step, ...
+        return cls(_str(row[0]).lower(), int(row[1]), [_str(flag) for flag in row[2]],
+                   int(row[3]), int(row[4]), int(row[5]))
+
+    @property
+    def read_only(self) -> bool:
+        return 'readonly' in self.flags and 'write' not in self.flags
+
+    def check_arity(self, argv: List[Any]):
+        # A positive arity is exact, a negative one is a minimum, both count the command name
+        if len(argv) == self.arity or (self.arity < 0 and len(argv) >= -self.arity):
+            return
+        raise ValueError(f"ERR wrong number of arguments for '{self.name}' command")
+
+    def keys(self, argv: List[Any]) -> Optional[List[Any]]:
+        """The key arguments of argv, or None where only the server can tell (movablekeys)."""
+        if 'movablekeys' in self.flags:
+            return None
+        if self.first_key <= 0:
+            return []
+        last = self.last_key if self.last_key >= 0 else len(argv) + self.last_key
+        return argv[self.first_key:min(last, len(argv) - 1) + 1:self.step or 1]
+
+
+class CommandTable:
+    """The commands one server version supports, keyed by lower case name."""
+
+    def __init__(self, version: str, specs: Dict[str, CommandSpec]):
+        self.version = version
+        self.specs = specs
+
+    @classmethod
+    def from_reply(cls, version: str, reply: Dict[str, Dict[str, Any]]) -> 'CommandTable':
+        # reply is COMMAND as parsed by redis-py, subcommands (Redis 7+) are left as raw rows
+        specs = {}
+        for name, info in reply.items():
+            subcommands = {}
+            for row in info.get('subcommands') or ():
+                subcommand = CommandSpec.from_row(row)
+                subcommands[subcommand.name] = subcommand
+            name = name.lower()
+            specs[name] = CommandSpec(name, int(info['arity']), info['flags'], int(info['first_key_pos']),
+                                      int(info['last_key_pos']), int(info['step_count']), subcommands)
+        return cls(version, specs)
+
+    def lookup(self, argv: List[Any]) -> Optional[CommandSpec]:
+        spec = self.specs.get(_str(argv[0]).lower())
+        if spec is not None and spec.subcommands and len(argv) > 1:
+            return spec.subcommands.get(f'{spec.name}|{_str(argv[1]).lower()}', spec)
+        return spec
+
+
+def check_same_slot(keys: List[Any]):
+    # Multi-key commands on a cluster only work when every key hashes to the same slot
+    slots = {key_slot(key.encode('utf-8') if isinstance(key, str) else key) for key in keys}
+    if len(slots) > 1:
+        raise ValueError("CROSSSLOT Keys in request don't hash to the same slot")
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+activity_cli = AppGroup('activity', help='Activity log maintenance.')
+
+
+@activity_cli.command('archive')
+@click.option('--days', type=int, default=None, help='Archive activities older than this many days.')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows moved per transaction.')
+def archive(days, batch_size):
+    """Move old activities into the activity_archive table."""
+    from app import db
+    from app.activity_storage import archive_activities
+
+    days = days if days is not None else current_app.config.get('ACTIVITY_RETENTION_DAYS', 90)
+    cutoff = datetime.now() - timedelta(days=days)
+    archived = archive_activities(db.session, cutoff, batch_size=batch_size)
+    click.echo(f"Archived {archived} activities created before {cutoff:%Y-%m-%d %H:%M}")
@@ -12,3 +12,8 @@ class TeamRedisPermission(enum.Enum):
     READ = "READ"
     READ_WRITE = "READ_WRITE"
     CLUSTER_ADMIN = "CLUSTER_ADMIN"
+
+
+class ActivityOutcome(enum.Enum):
+    SUCCESS = "SUCCESS"
+    FAILURE = "FAILURE"
@@ -1,6 +1,7 @@
 from flask import g
 from flask_appbuilder.models.sqla.filters import BaseFilter
-from app.models import TeamRedisRole, Team, user_team
+from sqlalchemy import exists
+from app.models import RedisConnection, TeamRedisRole, user_team
 
 
 
@@ -13,7 +14,8 @@ class CanListConnectionFilter(BaseFilter):
         if g.user.is_fab_admin():
             return query
 
-        return query.join(TeamRedisRole). \
-            join(Team, Team.id == TeamRedisRole.team_id). \
-            join(user_team, user_team.c.team_id == Team.id). \
-            filter(user_team.c.user_id == g.user.id)
+        # A semi-join keeps one row per connection however many of the user's teams share it
+        return query.filter(exists().
+                            where(TeamRedisRole.connection_id == RedisConnection.id).
+                            where(user_team.c.team_id == TeamRedisRole.team_id).
+                            where(user_team.c.user_id == g.user.id))
@@ -0,0 +1,111 @@
+import heapq
+import re
+import time
+from typing import Any, Dict, Iterator
+
+
+class KeyspaceAnalyzer:
+    """Walks the keyspace with SCAN and reports the biggest keys and key prefixes.
+
+    MEMORY USAGE and TYPE are pipelined per SCAN page. Only the top_n largest keys are
+    kept (a min-heap), and the scan is slowed down to max_keys_per_sec keys examined by
+    SCAN, matching or not, so it can run against a production master.
+    """
+
+    other_prefix = '<other>'
+
+    def __init__(self, redis_manager, connection_id: int, match: str = None, top_n: int = 50,
+                 delimiters: str = ':', prefix_depth: int = 1, batch_size: int = 500,
+                 max_keys_per_sec: float = None, max_prefixes: int = 10000, report_interval: float = 1):
+        self.redis_manager = redis_manager
+        self.connection_id = connection_id
+        self.match = match
+        self.top_n = top_n
+        self.prefix_depth = prefix_depth
+        self.batch_size = batch_size
+        self.max_keys_per_sec = max_keys_per_sec
+        self.max_prefixes = max_prefixes
+        self.report_interval = report_interval
+        self._delimiter_re = re.compile('|'.join(re.escape(d) for d in delimiters)) if delimiters else None
+
+        self.scanned = 0
+        # What SCAN walked, roughly COUNT per call. With a selective MATCH most of it never reaches scanned.
+        self.examined = 0
+        self.total_bytes = 0
+        self.top_keys = []
+        self.prefixes = {}
+
+    def run(self) -> Iterator[Dict[str, Any]]:
+        started = time.monotonic()
+        last_report = started
+        cursor = 0
+        # Every page comes from the same server, SCAN cursors do not carry over between replicas
+        node = self.redis_manager.pick_read_node(self.connection_id)
+        while True:
+            cursor, keys = self.redis_manager.scan_keys(self.connection_id, cursor=cursor, match=self.match,
+                                                        count=self.batch_size, node=node)
+            self.examined += self.batch_size
+            if keys:
+                for key, (size, key_type) in zip(keys, self.redis_manager.memory_usage_and_type(
+                        self.connection_id, keys, node=node)):
+                    # Keys deleted since the SCAN have no memory usage
+                    if size is not None:
+                        self.add(key, size, key_type)
+
+            if str(cursor) == '0':
+                break
+
+            now = time.monotonic()
+            if now - last_report >= self.report_interval:
+                last_report = now
+                yield self.snapshot(now - started)
+            self._throttle(started)
+
+        yield self.snapshot(time.monotonic() - started, done=True)
+
+    def add(self, key, size: int, key_type):
+        key = key.decode('utf-8', errors='replace') if isinstance(key, bytes) else key
+        key_type = key_type.decode('utf-8') if isinstance(key_type, bytes) else key_type
+        self.scanned += 1
+        self.total_bytes += size
+
+        entry = (size, key, key_type)
+        if len(self.top_keys) < self.top_n:
+            heapq.heappush(self.top_keys, entry)
+        elif size > self.top_keys[0][0]:
+            heapq.heapreplace(self.top_keys, entry)
+
+        prefix = self.prefix_of(key)
+        if prefix not in self.prefixes and len(self.prefixes) >= self.max_prefixes:
+            prefix = self.other_prefix
+        stats = self.prefixes.setdefault(prefix, [0, 0])
+        stats[0] += 1
+        stats[1] += size
+
+    def prefix_of(self, key: str) -> str:
+        if self._delimiter_re is None:
+            return key
+        end = 0
+        for _, match in zip(range(self.prefix_depth), self._delimiter_re.finditer(key)):
+            end = match.end()
+        return key[:end] if end else key
+
+    def snapshot(self, elapsed: float, done: bool = False) -> Dict[str, Any]:
+        prefixes = heapq.nlargest(self.top_n, self.prefixes.items(), key=lambda item: item[1][1])
+        return {
+            'scanned': self.scanned,
+            'total_bytes': self.total_bytes,
+            'elapsed': round(elapsed, 3),
+            'done': done,
+            'top_keys': [{'key': key, 'type': key_type, 'bytes': size}
+                         for size, key, key_type in sorted(self.top_keys, reverse=True)],
+            'prefixes': [{'prefix': prefix, 'keys': count, 'bytes': size}
+                         for prefix, (count, size) in prefixes],
+        }
+
+    def _throttle(self, started: float):
+        if not self.max_keys_per_sec:
+            return
+        ahead = self.examined / self.max_keys_per_sec - (time.monotonic() - started)
+        if ahead > 0:
+            time.sleep(ahead)
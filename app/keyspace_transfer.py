@@ -0,0 +1,104 @@
+import base64
+import json
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List
+
+
+def _b64(value: bytes) -> str:
+    return base64.b64encode(value).decode('ascii')
+
+
+def export_keys(redis_manager, connection_id: int, match: str = None, count: int = 500) -> Iterator[str]:
+    """Yield one JSON line per key: base64 key, PTTL and base64 DUMP payload.
+
+    Keys are read a SCAN page at a time, so memory stays bounded by the page size. The last line is
+    {"done": true, "count": N}, or {"error": ...} when Redis failed half way, so a cut off download
+    cannot pass for a complete one.
+    """
+    cursor = 0
+    exported = 0
+    try:
+        # SCAN and DUMP stay on one server, a cursor continued on another replica skips or repeats keys
+        node = redis_manager.pick_read_node(connection_id)
+        while True:
+            cursor, keys = redis_manager.scan_keys(connection_id, cursor=cursor, match=match, count=count, node=node)
+            if keys:
+                for key, (payload, ttl) in zip(keys, redis_manager.dump_keys(connection_id, keys, node=node)):
+                    # Keys that expired or were deleted since the SCAN have nothing to dump, and a key
+                    # that expired between DUMP and PTTL (-2) would come back without its expiry
+                    if payload is None or ttl == -2:
+                        continue
+                    key = key.encode('utf-8') if isinstance(key, str) else key
+                    exported += 1
+                    yield json.dumps({'key': _b64(key), 'ttl': max(ttl, 0), 'dump': _b64(payload)}) + '\n'
+            if str(cursor) == '0':
+                break
+    except Exception as e:
+        yield json.dumps({'error': str(e), 'count': exported}) + '\n'
+        return
+    yield json.dumps({'done': True, 'count': exported}) + '\n'
+
+
+def read_trailer(stream: BinaryIO, tail_size: int = 4096) -> Dict[str, Any]:
+    """The closing line of an export file, ValueError when the export failed or was cut off.
+
+    Only the end of the file is read, the stream is rewound for import_keys afterwards.
+    """
+    stream.seek(0, os.SEEK_END)
+    stream.seek(max(stream.tell() - tail_size, 0))
+    lines = [line for line in stream.read().splitlines() if line.strip()]
+    stream.seek(0)
+    try:
+        trailer = json.loads(lines[-1]) if lines else None
+    except ValueError:
+        trailer = None
+    if isinstance(trailer, dict) and 'error' in trailer:
+        raise ValueError(f"The export failed after {trailer.get('count', 0)} keys: {trailer['error']}")
+    if not isinstance(trailer, dict) or trailer.get('done') is not True:
+        raise ValueError("The file does not end with the export trailer, the export is incomplete")
+    return trailer
+
+
+def import_keys(redis_manager, connection_id: int, lines: Iterable[bytes], batch_size: int = 500,
+                replace: bool = True) -> Iterator[Dict[str, Any]]:
+    """Restore exported lines in pipelined batches, yielding the running totals after each batch.
+
+    Callers check the file with read_trailer first, the trailer line itself is skipped here.
+    """
+    progress = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            if isinstance(record, dict) and record.get('done'):
+                continue
+            batch.append((base64.b64decode(record['key']), int(record['ttl']), base64.b64decode(record['dump'])))
+        except (ValueError, KeyError, TypeError) as e:
+            _record_failure(progress, f"Line {line_number}: {e}")
+            continue
+        if len(batch) >= batch_size:
+            _restore_batch(redis_manager, connection_id, batch, replace, progress)
+            batch = []
+            yield dict(progress)
+    if batch:
+        _restore_batch(redis_manager, connection_id, batch, replace, progress)
+    yield dict(progress, done=True)
+
+
+def _restore_batch(redis_manager, connection_id: int, batch: List[tuple], replace: bool, progress: Dict[str, Any]):
+    results = redis_manager.restore_keys(connection_id, batch, replace=replace)
+    for (key, _, _), result in zip(batch, results):
+        if isinstance(result, Exception):
+            _record_failure(progress, f"{key.decode('utf-8', errors='replace')}: {result}")
+        else:
+            progress['imported'] += 1
+
+
+def _record_failure(progress: Dict[str, Any], error: str):
+    # Only the first errors are reported back, the count keeps going
+    progress['failed'] += 1
+    if len(progress['errors']) < 20:
+        progress['errors'].append(error)
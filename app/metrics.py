@@ -0,0 +1,399 @@
+import functools
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a cached GET to a slow KEYS or a host that stopped answering
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of samples, one per combination of label values.
+
+    Label values are passed positionally in the order of label_names. A metric built with
+    collect reads its samples from that callback at scrape time instead of being updated.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 collect: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Iterable[Any]) -> Tuple[str, ...]:
+        return tuple(map(str, labels))
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        if self.collect is not None:
+            return self.collect()
+        with self._lock:
+            return dict(self._values)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self, samples: Dict[Tuple[str, ...], float] = None) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        samples = self.samples() if samples is None else samples
+        for labels, value in sorted(samples.items()):
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels: Any, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, *labels: Any):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: Any):
+        # Per label set: one count per bucket plus the overflow, then sum. Buckets are made
+        # cumulative only when rendered, so an observation costs one bisect and two additions.
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, *labels: Any, errors: Counter = None) -> '_Timer':
+        return _Timer(self, labels, errors)
+
+    def samples(self) -> Dict[Tuple[str, ...], List[float]]:
+        with self._lock:
+            return {key: list(counts) for key, counts in self._values.items()}
+
+    def render(self, samples: Dict[Tuple[str, ...], List[float]] = None) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ['+Inf']
+        samples = self.samples() if samples is None else samples
+        for labels, counts in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(counts[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class _Timer:
+    """Context manager that observes the time spent in its block and counts exceptions."""
+
+    def __init__(self, histogram: Histogram, labels: Tuple[Any, ...], errors: Optional[Counter]):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.labels)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = (), collect=None) -> Counter:
+        return self.register(Counter(name, help_text, label_names, collect=collect))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = (), collect=None) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names, collect=collect))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets=buckets))
+
+    def render(self, samples: Dict[str, Dict[Tuple[str, ...], Any]] = None) -> str:
+        """Every metric in the Prometheus text exposition format, from samples by metric name when given."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render(None if samples is None else samples.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiProcessStore:
+    """Shares the registry of every gunicorn worker through a directory, so one scrape covers all of them.
+
+    Each process writes its samples to <pid>.json every flush_interval seconds. Counters and histograms
+    are summed over every file in the directory, including those of workers that exited, so totals never
+    go backwards when gunicorn replaces a worker. Gauges only count workers that are still running.
+    Without a directory render() is the registry of this process alone.
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory: str = None, flush_interval: float = 5):
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        # gunicorn.conf.py exports the directory it made for the workers of one master
+        self.directory = os.getenv('METRICS_MULTIPROCESS_DIR') or app.config.get('METRICS_MULTIPROCESS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval)
+
+    def start(self):
+        if not self.directory or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Writing the metrics of process %s failed", os.getpid())
+
+    def _snapshot(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        return {name: metric.samples() for name, metric in self.registry.metrics.items()}
+
+    def flush(self):
+        if not self.directory:
+            return
+        snapshot = {name: [[list(labels), value] for labels, value in samples.items()]
+                    for name, samples in self._snapshot().items()}
+        # Written next to its final name and renamed, a scrape never reads half a file
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(snapshot, handle)
+        os.replace(path, os.path.join(self.directory, f'{os.getpid()}.json'))
+
+    def collect(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        # This process answers from its live registry, the others from their last flush
+        merged = self._snapshot()
+        if not self.directory:
+            return merged
+        for file_name in os.listdir(self.directory):
+            pid, extension = os.path.splitext(file_name)
+            if extension != '.json' or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                with open(os.path.join(self.directory, file_name)) as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(int(pid))
+            for name, entries in snapshot.items():
+                metric = self.registry.metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                samples = merged[name]
+                for labels, value in entries:
+                    key = tuple(labels)
+                    current = samples.get(key)
+                    if current is None:
+                        samples[key] = value
+                    elif isinstance(value, list):
+                        samples[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        samples[key] = current + value
+        return merged
+
+    def render(self) -> str:
+        return self.registry.render(self.collect() if self.directory else None)
+
+
+def timed_call(histogram: Histogram, errors: Counter):
+    """Decorator for RedisManager methods that take connection_id first, labelled by method and connection."""
+    def decorator(method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, connection_id, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(self, connection_id, *args, **kwargs)
+            except Exception:
+                errors.inc(name, connection_id)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, name, connection_id)
+        return wrapper
+    return decorator
+
+
+def pool_usage(client) -> Tuple[int, int, int]:
+    """Connections in use, idle connections and the limit across the pools of one redis-py client."""
+    if hasattr(client, 'replicas'):
+        # A ReplicaPool, its master is counted with the connection's own client
+        pools = [replica.connection_pool for replica in client.replicas]
+    elif hasattr(client, 'nodes_manager'):
+        pools = [node.redis_connection.connection_pool for node in list(client.nodes_manager.nodes_cache.values())
+                 if node.redis_connection is not None]
+    else:
+        pools = [client.connection_pool]
+
+    in_use = idle = limit = 0
+    for pool in pools:
+        if hasattr(pool, '_connections'):
+            # BlockingConnectionPool: every connection it created, idle ones wait in its queue
+            waiting = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+            in_use += len(pool._connections) - waiting
+            idle += waiting
+        else:
+            in_use += len(pool._in_use_connections)
+            idle += len(pool._available_connections)
+        limit += pool.max_connections
+    return in_use, idle, limit
+
+
+def _pool_samples(field: int) -> Dict[Tuple[str, ...], float]:
+    from app.redis_manager import redis_manager
+
+    samples = {}
+    for key, client in redis_manager.connections.items():
+        role, connection_id = key if isinstance(key, tuple) else ('primary', key)
+        try:
+            samples[(str(connection_id), role)] = pool_usage(client)[field]
+        except Exception:
+            continue
+    return samples
+
+
+def _activity_writer_samples(attribute: str) -> Dict[Tuple[str, ...], float]:
+    from app.activity_writer import activity_writer
+    return {(): getattr(activity_writer, attribute)}
+
+
+def _pubsub_samples(*fields: str) -> Dict[Tuple[str, ...], float]:
+    from app.pubsub_hub import pubsub_hub
+    return {(str(connection_id),): sum(stats[field] for field in fields)
+            for connection_id, stats in pubsub_hub.stats().items()}
+
+
+registry = MetricsRegistry()
+
+command_latency = registry.histogram(
+    'pymyredis_command_duration_seconds', 'Console commands routed by RedisCommandRouter.route_command.',
+    ('command', 'connection'))
+command_errors = registry.counter(
+    'pymyredis_command_errors_total', 'Console commands that failed.', ('command', 'connection'))
+redis_call_latency = registry.histogram(
+    'pymyredis_redis_call_duration_seconds', 'RedisManager calls against a managed Redis.', ('method', 'connection'))
+redis_call_errors = registry.counter(
+    'pymyredis_redis_call_errors_total', 'RedisManager calls that raised.', ('method', 'connection'))
+redis_info_latency = registry.histogram(
+    'pymyredis_redis_info_duration_seconds', 'INFO requests for the connection list and the metrics poller.',
+    ('connection',))
+redis_info_errors = registry.counter(
+    'pymyredis_redis_info_errors_total', 'INFO requests that failed.', ('connection',))
+activity_log_latency = registry.histogram(
+    'pymyredis_activity_log_duration_seconds', 'Time a request spends in save_activity_log.')
+activity_write_latency = registry.histogram(
+    'pymyredis_activity_write_duration_seconds', 'Time to insert one batch of activity records.')
+activity_queue_depth = registry.gauge(
+    'pymyredis_activity_queue_depth', 'Activity records waiting for the writer thread.',
+    collect=lambda: _activity_writer_samples('depth'))
+activity_written = registry.counter(
+    'pymyredis_activity_records_written_total', 'Activity records inserted.',
+    collect=lambda: _activity_writer_samples('written'))
+activity_failed = registry.counter(
+    'pymyredis_activity_records_failed_total', 'Activity records that could not be inserted.',
+    collect=lambda: _activity_writer_samples('failed'))
+activity_overflowed = registry.counter(
+    'pymyredis_activity_records_overflowed_total',
+    'Activity records a request wrote itself because the queue was full.',
+    collect=lambda: _activity_writer_samples('overflowed'))
+pool_in_use = registry.gauge(
+    'pymyredis_pool_connections_in_use', 'Connections checked out of the pools of a managed Redis.',
+    ('connection', 'role'), collect=lambda: _pool_samples(0))
+pool_idle = registry.gauge(
+    'pymyredis_pool_connections_idle', 'Connections waiting in the pools of a managed Redis.',
+    ('connection', 'role'), collect=lambda: _pool_samples(1))
+pool_max = registry.gauge(
+    'pymyredis_pool_max_connections', 'Connection limit of the pools of a managed Redis.',
+    ('connection', 'role'), collect=lambda: _pool_samples(2))
+pubsub_subscribers = registry.gauge(
+    'pymyredis_pubsub_subscribers', 'Clients watching Pub/Sub channels through the shared upstream.',
+    ('connection',), collect=lambda: _pubsub_samples('subscribers'))
+pubsub_channels = registry.gauge(
+    'pymyredis_pubsub_upstream_channels', 'Channels and patterns the shared upstream is subscribed to.',
+    ('connection',), collect=lambda: _pubsub_samples('channels', 'patterns'))
+
+multiprocess_store = MultiProcessStore(registry)
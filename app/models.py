@@ -1,17 +1,18 @@
 from flask_appbuilder import Model
-from sqlalchemy import Column, Integer, String, ForeignKey, Table, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, Enum, Text, DateTime, Index
+from sqlalchemy.orm import relationship, object_session
 from flask_appbuilder.models.mixins import AuditMixin
 from flask_appbuilder.security.sqla.models import User
-from app.enums import TeamRedisPermission, RedisDeploymentType
+from app.enums import TeamRedisPermission, RedisDeploymentType, ActivityOutcome
 from flask_login import current_user
 from markupsafe import Markup
-from flask import url_for
+from flask import url_for, g
 from datetime import datetime
 
 user_team = Table('user_team', Model.metadata,
                   Column('user_id', Integer, ForeignKey('ab_user.id')),
-                  Column('team_id', Integer, ForeignKey('team.id'))
+                  Column('team_id', Integer, ForeignKey('team.id')),
+                  Index('ix_user_team_user_id_team_id', 'user_id', 'team_id')
                   )
 
 
@@ -42,50 +43,43 @@ class ExtendUser(User):
     def is_fab_admin(self):
         return self.roles and any(role.name == 'Admin' for role in self.roles)
 
+    def get_permission_map(self):
+        # {connection_id: {TeamRedisPermission}} resolved with one query and cached per user
+        from app.permissions import permission_cache
+
+        permissions = permission_cache.get(self.id)
+        if permissions is None:
+            rows = object_session(self).query(TeamRedisRole.connection_id, TeamRedisRole.permission). \
+                join(user_team, user_team.c.team_id == TeamRedisRole.team_id). \
+                filter(user_team.c.user_id == self.id)
+            permissions = {}
+            for connection_id, permission in rows:
+                permissions.setdefault(connection_id, set()).add(permission)
+            permission_cache.set(self.id, permissions)
+        return permissions
+
     def get_allowed_connection_ids(self):
-        ids = []
-        for team in self.teams:
-            for role in team.redis_roles:
-                ids.append(role.connection_id)
-        return ids
+        return list(self.get_permission_map())
 
     def get_user_redis_roles(self, redis_connection_id):
-        permissions = []
-        for team in self.teams:
-            for role in team.redis_roles:
-                permissions.append(role.permission)
-        return permissions
+        return list(self.get_permission_map().get(redis_connection_id, ()))
 
     def can_read(self, redis_connection_id):
         if self.is_fab_admin():
             return True
-
-        permissions = self.get_user_redis_roles(redis_connection_id)
-        for permission in permissions:
-            if permission == TeamRedisPermission.READ:
-                return True
-
-        return False
+        # Every role on a connection includes reading it
+        return bool(self.get_permission_map().get(redis_connection_id))
 
     def can_write(self, redis_connection_id):
         if self.is_fab_admin():
             return True
-        permissions = self.get_user_redis_roles(redis_connection_id)
-        for permission in permissions:
-            if permission == TeamRedisPermission.READ_WRITE:
-                return True
-
-        return False
+        permissions = self.get_permission_map().get(redis_connection_id, ())
+        return TeamRedisPermission.READ_WRITE in permissions or TeamRedisPermission.CLUSTER_ADMIN in permissions
 
     def can_cluster_admin(self, redis_connection_id):
         if self.is_fab_admin():
             return True
-        permissions = self.get_user_redis_roles(redis_connection_id)
-        for permission in permissions:
-            if permission == TeamRedisPermission.CLUSTER_ADMIN:
-                return True
-
-        return False
+        return TeamRedisPermission.CLUSTER_ADMIN in self.get_permission_map().get(redis_connection_id, ())
 
 
 class RedisConnection(BaseModel):
@@ -123,8 +117,11 @@ class RedisConnection(BaseModel):
         # This is bad
         from app.redis_manager import redis_manager
 
-        info = redis_manager.get_redis_info(self)
-        return Markup(f'<span> CPU: {info["cpu_usage"]} | RAM: {info["memory_usage"]} </span>')
+        # The list view prefetches INFO for the whole page, see RedisConnectionInterface
+        info = g.get('redis_info', {}).get(self.id) or redis_manager.get_redis_info(self)
+        if info['status'] != 'Connected':
+            return Markup('<span class="text-danger"> {} </span>').format(info['status'])
+        return Markup('<span> CPU: {} | RAM: {} </span>').format(info['cpu_usage'], info['memory_usage'])
 
     def __repr__(self):
         return f"{self.name} - {self.description}"
@@ -151,6 +148,10 @@ class TeamRedisRole(BaseModel):
     permission = Column(Enum(TeamRedisPermission), nullable=False)
 
     team = relationship('Team', back_populates='redis_roles')
+
+    __table_args__ = (
+        Index('ix_team_redis_role_connection_id_team_id', 'connection_id', 'team_id'),
+    )
     connection = relationship('RedisConnection', back_populates='team_roles')
 
     def __repr__(self):
@@ -161,5 +162,31 @@ class Activity(BaseModel):
     id = Column(Integer, primary_key=True)
     message = Column(Text, nullable=False)
 
+    # Structured copies of what the message describes, for filtering without parsing it
+    connection_id = Column(Integer, index=True)
+    command = Column(String(64), index=True)
+    outcome = Column(Enum(ActivityOutcome))
+
+    __table_args__ = (
+        Index('ix_activity_created_on', 'created_on'),
+        Index('ix_activity_created_by_fk', 'created_by_fk'),
+    )
+
+    def __repr__(self):
+        return f"{self.id}"
+
+
+class ActivityArchive(Model):
+    # Activity rows past the retention period are moved here unchanged
+    id = Column(Integer, primary_key=True)
+    message = Column(Text, nullable=False)
+    connection_id = Column(Integer)
+    command = Column(String(64))
+    outcome = Column(Enum(ActivityOutcome))
+    created_on = Column(DateTime, nullable=False, index=True)
+    changed_on = Column(DateTime, nullable=False)
+    created_by_fk = Column(Integer, ForeignKey('ab_user.id'))
+    changed_by_fk = Column(Integer, ForeignKey('ab_user.id'))
+
     def __repr__(self):
         return f"{self.id}"
@@ -0,0 +1,188 @@
+import logging
+import math
+import threading
+import time
+from array import array
+from concurrent.futures import wait
+from typing import Any, Dict, List, Optional
+
+from app.models import RedisConnection
+from app.redis_manager import redis_manager
+
+log = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Fixed-size, array-backed series of floats. Once full the oldest sample is overwritten."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._data = array('d', [math.nan]) * size
+        self._next = 0
+        self._count = 0
+
+    def append(self, value: Optional[float]):
+        self._data[self._next] = math.nan if value is None else value
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def values(self) -> List[Optional[float]]:
+        start = (self._next - self._count) % self.size
+        ordered = self._data[start:] + self._data[:start] if self._count == self.size else self._data[start:self._next]
+        return [None if math.isnan(v) else v for v in ordered]
+
+    def __len__(self):
+        return self._count
+
+
+class ConnectionMetrics:
+    # Series name -> INFO field it is sampled from
+    fields = {
+        'ops_per_sec': 'instantaneous_ops_per_sec',
+        'used_memory': 'used_memory',
+        'connected_clients': 'connected_clients',
+        'keyspace_hits': 'keyspace_hits',
+        'keyspace_misses': 'keyspace_misses',
+        'evicted_keys': 'evicted_keys',
+        'repl_offset': 'master_repl_offset',
+    }
+
+    def __init__(self, size: int):
+        self.timestamps = RingBuffer(size)
+        self.series = {name: RingBuffer(size) for name in self.fields}
+        self.summary = None
+        self.sampled_at = None
+        self._lock = threading.Lock()
+
+    def record(self, info: Dict[str, Any], sampled_at: float):
+        with self._lock:
+            self.timestamps.append(sampled_at)
+            for name, field in self.fields.items():
+                value = info.get(field)
+                self.series[name].append(float(value) if isinstance(value, (int, float)) else None)
+            self.summary = {
+                'cpu_usage': info.get('used_cpu_sys', 'N/A'),
+                'memory_usage': info.get('used_memory_human', 'N/A'),
+                'status': 'Connected'
+            }
+            self.sampled_at = sampled_at
+
+    def record_failure(self, status: str, sampled_at: float):
+        with self._lock:
+            self.timestamps.append(sampled_at)
+            for buffer in self.series.values():
+                buffer.append(None)
+            self.summary = {'cpu_usage': 'N/A', 'memory_usage': 'N/A', 'status': status}
+            self.sampled_at = sampled_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'timestamps': self.timestamps.values(),
+                'series': {name: buffer.values() for name, buffer in self.series.items()},
+                'summary': self.summary,
+                'sampled_at': self.sampled_at,
+            }
+
+
+def _flatten_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    # RedisCluster answers INFO with one section per node, add the numbers up
+    if info and all(isinstance(v, dict) for v in info.values()):
+        merged = {}
+        for node_info in info.values():
+            for field, value in node_info.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    merged[field] = merged.get(field, 0) + value
+                else:
+                    merged.setdefault(field, value)
+        return merged
+    return info
+
+
+class MetricsPoller:
+    def __init__(self, redis_manager, interval: float = 10, history_size: int = 360, timeout: float = 5):
+        self.redis_manager = redis_manager
+        self.interval = interval
+        self.history_size = history_size
+        self.timeout = timeout
+        self.metrics = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, app):
+        if self._thread and self._thread.is_alive():
+            return
+        self.interval = app.config.get('METRICS_POLL_INTERVAL', self.interval)
+        self.history_size = app.config.get('METRICS_HISTORY_SIZE', self.history_size)
+        self.timeout = app.config.get('METRICS_POLL_TIMEOUT', self.timeout)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(app,), name='metrics-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, app):
+        from app import db
+
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                with app.app_context():
+                    try:
+                        connections = db.session.query(RedisConnection).all()
+                        self.poll(connections)
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                # The fan-out pool refuses work for good once the interpreter is shutting down
+                if isinstance(e, RuntimeError) and (self._stop.is_set() or self._fanout_closed()):
+                    break
+                log.exception("Metrics poll failed")
+            self._stop.wait(max(0, self.interval - (time.monotonic() - started)))
+
+    def _fanout_closed(self) -> bool:
+        try:
+            self.redis_manager.executor.submit(int)
+        except RuntimeError:
+            return True
+        return False
+
+    def poll(self, connections):
+        sampled_at = time.time()
+        futures = {connection.id: self.redis_manager.executor.submit(self.redis_manager.fetch_info, connection)
+                   for connection in connections}
+        done, _ = wait(futures.values(), timeout=self.timeout)
+
+        for connection_id in list(self.metrics):
+            if connection_id not in futures:
+                del self.metrics[connection_id]
+
+        for connection_id, future in futures.items():
+            metrics = self.metrics.get(connection_id)
+            if metrics is None:
+                metrics = self.metrics[connection_id] = ConnectionMetrics(self.history_size)
+            if future not in done:
+                future.cancel()
+                metrics.record_failure('Timed out', sampled_at)
+            elif future.exception() is not None:
+                metrics.record_failure(f'Disconnected: {future.exception()}', sampled_at)
+            else:
+                metrics.record(_flatten_info(future.result()), sampled_at)
+
+    def get_history(self, connection_id: int) -> Optional[Dict[str, Any]]:
+        metrics = self.metrics.get(connection_id)
+        return metrics.to_dict() if metrics else None
+
+    def get_summary(self, connection_id: int) -> Optional[Dict[str, Any]]:
+        # Samples older than two poll intervals are treated as missing
+        metrics = self.metrics.get(connection_id)
+        if metrics is None or metrics.sampled_at is None or time.time() - metrics.sampled_at > 2 * self.interval:
+            return None
+        return metrics.summary
+
+
+metrics_poller = MetricsPoller(redis_manager)
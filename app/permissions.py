@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.enums import TeamRedisPermission
+
+
+class PermissionCache:
+    """Per-user {connection_id: permissions} maps, dropped whenever team membership or roles change.
+
+    Entries also expire after ttl seconds, which bounds how long another worker process
+    can keep serving a map after a change it did not see.
+    """
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Dict[int, Set[TeamRedisPermission]]]:
+        with self._lock:
+            entry = self._maps.get(user_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def set(self, user_id: int, permissions: Dict[int, Set[TeamRedisPermission]]):
+        with self._lock:
+            self._maps[user_id] = (permissions, time.monotonic())
+
+    def invalidate(self):
+        with self._lock:
+            self._maps.clear()
+
+
+permission_cache = PermissionCache()
+
+
+def create_permission_indexes(engine):
+    # create_all skips tables that already exist, so the lookup indexes are added here for older databases
+    from app.models import TeamRedisRole, user_team
+
+    for index in list(TeamRedisRole.__table__.indexes) + list(user_team.indexes):
+        index.create(engine, checkfirst=True)
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_permission_changes(session, flush_context, instances):
+    from app.models import ExtendUser, Team, TeamRedisRole
+
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(instance, (ExtendUser, Team, TeamRedisRole)) for instance in changed):
+        session.info['permissions_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_permissions(session):
+    if session.info.pop('permissions_changed', False):
+        permission_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_permission_changes(session):
+    session.info.pop('permissions_changed', None)
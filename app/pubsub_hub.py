@@ -0,0 +1,258 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+from app.serializers import dumps, encode_reply
+
+log = logging.getLogger(__name__)
+
+# What a subscriber's buffer does with a new message when it is full
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+SAMPLE = 'sample'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, SAMPLE)
+
+
+def keyspace_pattern(key_pattern: str, db: Any = '*') -> str:
+    # Keyspace notifications are only sent when the server has notify-keyspace-events enabled
+    return f'__keyspace@{db}__:{key_pattern}'
+
+
+class Subscriber:
+    """One client's bounded buffer between an upstream reader thread and its response.
+
+    When buffer_size messages are waiting, drop_oldest makes room by discarding the oldest one,
+    drop_newest discards the new one and sample keeps only every sample_every-th new message
+    (replacing the oldest) until the client catches up. Discarded messages are counted in dropped.
+    """
+
+    def __init__(self, connection_id: int, channels: Iterable[str] = (), patterns: Iterable[str] = (),
+                 buffer_size: int = 1000, policy: str = DROP_OLDEST, sample_every: int = 10):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown buffer policy {policy}, expected one of {', '.join(POLICIES)}")
+        self.connection_id = connection_id
+        self.channels = set(channels)
+        self.patterns = set(patterns)
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.sample_every = sample_every
+        self.buffer = deque()
+        self.dropped = 0
+        self.closed = False
+        self._overflow = 0
+        self._condition = threading.Condition()
+
+    def put(self, message: bytes):
+        with self._condition:
+            if len(self.buffer) >= self.buffer_size:
+                self._overflow += 1
+                if self.policy == DROP_NEWEST or (self.policy == SAMPLE and self._overflow % self.sample_every):
+                    self.dropped += 1
+                    return
+                self.buffer.popleft()
+                self.dropped += 1
+            else:
+                self._overflow = 0
+            self.buffer.append(message)
+            self._condition.notify()
+
+    def get(self, timeout: float = None) -> Tuple[List[bytes], int]:
+        """Everything buffered, waiting up to timeout for the first message, and the number dropped since the last call."""
+        with self._condition:
+            if not self.buffer and not self.closed:
+                self._condition.wait(timeout)
+            messages = list(self.buffer)
+            self.buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+            return messages, dropped
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class Upstream:
+    """The one PubSub connection a process keeps per Redis connection, read by its own thread.
+
+    Only the reader thread touches the PubSub object. Subscribers change the wanted channels and
+    patterns under the hub's lock, the thread catches up with them between two reads and closes
+    the PubSub once nobody is left.
+    """
+
+    def __init__(self, hub: 'PubSubHub', connection_id: int, pubsub):
+        self.hub = hub
+        self.connection_id = connection_id
+        self.pubsub = pubsub
+        # Wanted channels and patterns, each with the subscribers that asked for it
+        self.channels = {}
+        self.patterns = {}
+        self._active_channels = set()
+        self._active_patterns = set()
+        self._thread = threading.Thread(target=self._run, name=f'pubsub-{connection_id}', daemon=True)
+
+    def add(self, subscriber: Subscriber):
+        for channel in subscriber.channels:
+            self.channels.setdefault(channel, set()).add(subscriber)
+        for pattern in subscriber.patterns:
+            self.patterns.setdefault(pattern, set()).add(subscriber)
+
+    def remove(self, subscriber: Subscriber):
+        for wanted, names in ((self.channels, subscriber.channels), (self.patterns, subscriber.patterns)):
+            for name in names:
+                subscribers = wanted.get(name)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del wanted[name]
+
+    @property
+    def subscribers(self) -> set:
+        return set().union(*self.channels.values(), *self.patterns.values())
+
+    def start(self):
+        self._thread.start()
+
+    def _sync_subscriptions(self) -> bool:
+        # Returns False once nothing is wanted any more, the upstream is then taken out of the hub
+        with self.hub._lock:
+            if not self.channels and not self.patterns:
+                if self.hub._upstreams.get(self.connection_id) is self:
+                    del self.hub._upstreams[self.connection_id]
+                return False
+            wanted_channels, wanted_patterns = set(self.channels), set(self.patterns)
+
+        if wanted_channels - self._active_channels:
+            self.pubsub.subscribe(*(wanted_channels - self._active_channels))
+        if self._active_channels - wanted_channels:
+            self.pubsub.unsubscribe(*(self._active_channels - wanted_channels))
+        if wanted_patterns - self._active_patterns:
+            self.pubsub.psubscribe(*(wanted_patterns - self._active_patterns))
+        if self._active_patterns - wanted_patterns:
+            self.pubsub.punsubscribe(*(self._active_patterns - wanted_patterns))
+        self._active_channels, self._active_patterns = wanted_channels, wanted_patterns
+        return True
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    if not self._sync_subscriptions():
+                        break
+                    message = self.pubsub.get_message(ignore_subscribe_messages=True,
+                                                      timeout=self.hub.poll_interval)
+                except Exception as e:
+                    # The PubSub reconnects and subscribes again on the next call
+                    log.warning("Pub/Sub failed for connection %s: %s", self.connection_id, e)
+                    self._broadcast(dumps({'error': str(e)}))
+                    time.sleep(self.hub.poll_interval)
+                    continue
+                if message is not None:
+                    self._dispatch(message)
+        finally:
+            try:
+                self.pubsub.close()
+            except Exception:
+                log.exception("Failed to close Pub/Sub for connection %s", self.connection_id)
+
+    def _dispatch(self, message: Dict[str, Any]):
+        if message['type'] == 'pmessage':
+            pattern = message['pattern'].decode('utf-8', 'replace') if isinstance(message['pattern'], bytes) \
+                else message['pattern']
+            with self.hub._lock:
+                subscribers = list(self.patterns.get(pattern, ()))
+        elif message['type'] == 'message':
+            channel = message['channel'].decode('utf-8', 'replace') if isinstance(message['channel'], bytes) \
+                else message['channel']
+            with self.hub._lock:
+                subscribers = list(self.channels.get(channel, ()))
+        else:
+            return
+        if not subscribers:
+            return
+
+        # Encoded once, every subscriber gets the same bytes
+        payload = dumps({
+            'channel': encode_reply(message['channel']),
+            'pattern': encode_reply(message['pattern']),
+            'data': encode_reply(message['data']),
+            'time': time.time(),
+        })
+        for subscriber in subscribers:
+            subscriber.put(payload)
+
+    def _broadcast(self, payload: bytes):
+        with self.hub._lock:
+            subscribers = self.subscribers
+        for subscriber in subscribers:
+            subscriber.put(payload)
+
+
+class PubSubHub:
+    """Shares one upstream subscription per Redis connection and channel between all clients of a process.
+
+    Fifty operators watching the same busy channel cost one Redis subscription and one reader
+    thread; each of them only adds a bounded buffer.
+    """
+
+    def __init__(self, buffer_size: int = 1000, policy: str = DROP_OLDEST, sample_every: int = 10,
+                 poll_interval: float = 0.5, max_subscribers: int = 100):
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.sample_every = sample_every
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._upstreams = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.buffer_size = app.config.get('PUBSUB_BUFFER_SIZE', self.buffer_size)
+        self.policy = app.config.get('PUBSUB_BUFFER_POLICY', self.policy)
+        self.sample_every = app.config.get('PUBSUB_SAMPLE_EVERY', self.sample_every)
+        # gunicorn.conf.py exports the limit it worked out from the worker threads
+        max_subscribers = os.getenv('PUBSUB_MAX_SUBSCRIBERS') or app.config.get('PUBSUB_MAX_SUBSCRIBERS')
+        if max_subscribers is not None:
+            self.max_subscribers = int(max_subscribers)
+
+    def subscribe(self, redis_manager, connection_id: int, channels: Iterable[str] = (),
+                  patterns: Iterable[str] = (), policy: str = None, buffer_size: int = None) -> Subscriber:
+        subscriber = Subscriber(connection_id, channels, patterns, buffer_size=buffer_size or self.buffer_size,
+                                policy=policy or self.policy, sample_every=self.sample_every)
+        if not subscriber.channels and not subscriber.patterns:
+            raise ValueError("At least one channel or pattern is required")
+
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise RuntimeError("Too many Pub/Sub subscribers, try again later")
+            upstream = self._upstreams.get(connection_id)
+            if upstream is None:
+                # Creating the PubSub does not connect yet, the reader thread does on its first subscribe
+                upstream = self._upstreams[connection_id] = Upstream(self, connection_id,
+                                                                     redis_manager.pubsub(connection_id))
+                upstream.add(subscriber)
+                upstream.start()
+            else:
+                upstream.add(subscriber)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            upstream = self._upstreams.get(subscriber.connection_id)
+            if upstream is not None:
+                upstream.remove(subscriber)
+            self._subscribers.discard(subscriber)
+        subscriber.close()
+
+    def stats(self) -> Dict[int, Dict[str, int]]:
+        with self._lock:
+            return {connection_id: {'channels': len(upstream.channels), 'patterns': len(upstream.patterns),
+                                    'subscribers': len(upstream.subscribers)}
+                    for connection_id, upstream in self._upstreams.items()}
+
+
+pubsub_hub = PubSubHub()
@@ -1,17 +1,248 @@
 import redis
 from redis.sentinel import Sentinel
-from redis.cluster import RedisCluster
+from redis.cluster import RedisCluster, ClusterNode
 from app.enums import RedisDeploymentType
 from app.models import RedisConnection
+from app.client_registry import ClientRegistry
+from app.replicas import ReplicaPool
+from app.command_parser import split_command
+from app.command_table import CommandTable, CommandSpec, check_same_slot
+from app.result_stream import stream_command
+from app.serializers import utf8_boundary
+from app.metrics import (timed_call, command_errors, command_latency, redis_call_errors, redis_call_latency,
+                         redis_info_errors, redis_info_latency)
 from app import db
 import json
-from typing import Any, List, Dict, Union, Set, Tuple
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, List, Dict, Union, Set, Tuple, Iterator, Optional
 import shlex
 
 
+def _parse_hosts(hosts: str) -> List[Tuple[str, int]]:
+    # "host:port,host:port" as stored on RedisConnection
+    parsed = []
+    for host in hosts.split(','):
+        name, port = host.strip().rsplit(':', 1)
+        parsed.append((name, int(port)))
+    return parsed
+
+
+def _encode_cluster_cursor(cursors: Dict[str, int]) -> str:
+    # "0" keeps the SCAN convention for a finished iteration
+    if not cursors:
+        return '0'
+    return base64.urlsafe_b64encode(json.dumps(cursors).encode('utf-8')).decode('ascii')
+
+
+def _decode_cluster_cursor(cursor: str) -> Dict[str, int]:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cluster scan cursor: {cursor}")
+
+
+def _split_read_cursor(cursor: Union[int, str]) -> Tuple[Optional[int], Union[int, str]]:
+    # "<node>:<cursor>" pins a SCAN to the replica that issued the cursor
+    text = str(cursor)
+    if ':' not in text:
+        return None, cursor
+    node, _, position = text.partition(':')
+    try:
+        return int(node), int(position)
+    except ValueError:
+        raise ValueError(f"Invalid scan cursor: {cursor}")
+
+
+def _join_read_cursor(node: Optional[int], cursor: Union[int, str]) -> Union[int, str]:
+    if node is None or str(cursor) == '0':
+        return cursor
+    return f'{node}:{cursor}'
+
+
+# Latency and errors of every RedisManager call against a managed Redis, labelled by method and connection
+_timed = timed_call(redis_call_latency, redis_call_errors)
+
+
+def _node_name(client: redis.Redis, default: str) -> str:
+    # Sentinel pools resolve the master on connect, so their kwargs have no host
+    kwargs = client.connection_pool.connection_kwargs
+    if 'host' not in kwargs:
+        return default
+    return f"{kwargs['host']}:{kwargs.get('port', 6379)}"
+
+
+def _has_replicas(connection) -> bool:
+    # Standalone and cluster connections have no replicas for get_read_connection to pick from
+    if connection.deployment_type == RedisDeploymentType.MASTER_SLAVE:
+        return bool(connection.slave_hosts)
+    return connection.deployment_type == RedisDeploymentType.SENTINEL
+
+
+def _server_version(info: Dict[str, Any]) -> str:
+    # A cluster answers INFO once per node
+    if 'redis_version' not in info:
+        info = next(iter(info.values()), {})
+    return str(info.get('redis_version', 'unknown'))
+
+
 class RedisManager:
+    fanout_workers = 16
+    value_length_commands = {
+        'string': 'STRLEN',
+        'list': 'LLEN',
+        'set': 'SCARD',
+        'zset': 'ZCARD',
+        'hash': 'HLEN',
+        'stream': 'XLEN',
+    }
+    # Types paged with SSCAN, ZSCAN and HSCAN, whose cursors only work on the node that issued them
+    scanned_types = ('set', 'zset', 'hash')
+
     def __init__(self):
-        self.connections = {}
+        self.connections = ClientRegistry()
+        # INFO for the connection list and the metrics poller goes through small clients of its
+        # own, walking every connection would otherwise churn the LRU of the working clients
+        self.info_connections = ClientRegistry(max_clients=1024)
+        self.info_pool_size = 2
+        self.pool_options = {
+            'max_connections': 20,
+            'socket_timeout': 5,
+            'socket_connect_timeout': 3,
+            'health_check_interval': 30,
+        }
+        self.read_from_replicas = True
+        self.replica_max_lag = 10
+        self.replica_check_interval = 5
+        self.string_window = 64 * 1024
+        self._async_backend = None
+        self._executor = None
+        self._lock = threading.Lock()
+        # COMMAND replies per server version, and the version each connection runs
+        self._command_tables = {}
+        self._server_versions = {}
+        # Deployment type and whether it has replicas, noted when a connection's row is loaded
+        self._deployment_types = {}
+        self._replicated = {}
+
+    def init_app(self, app):
+        self.connections.max_clients = app.config.get('REDIS_MAX_CLIENTS', self.connections.max_clients)
+        self.connections.idle_timeout = app.config.get('REDIS_CLIENT_IDLE_TIMEOUT', self.connections.idle_timeout)
+        self.info_connections.max_clients = app.config.get('REDIS_INFO_MAX_CLIENTS', self.info_connections.max_clients)
+        self.info_connections.idle_timeout = self.connections.idle_timeout
+        self.pool_options = {
+            'max_connections': app.config.get('REDIS_POOL_MAX_CONNECTIONS', self.pool_options['max_connections']),
+            'socket_timeout': app.config.get('REDIS_SOCKET_TIMEOUT', self.pool_options['socket_timeout']),
+            'socket_connect_timeout': app.config.get('REDIS_SOCKET_CONNECT_TIMEOUT',
+                                                     self.pool_options['socket_connect_timeout']),
+            'health_check_interval': app.config.get('REDIS_HEALTH_CHECK_INTERVAL',
+                                                    self.pool_options['health_check_interval']),
+        }
+        self.read_from_replicas = app.config.get('REDIS_READ_FROM_REPLICAS', self.read_from_replicas)
+        self.replica_max_lag = app.config.get('REDIS_REPLICA_MAX_LAG', self.replica_max_lag)
+        self.replica_check_interval = app.config.get('REDIS_REPLICA_CHECK_INTERVAL', self.replica_check_interval)
+        self.string_window = app.config.get('STRING_WINDOW_BYTES', self.string_window)
+
+    def reset(self):
+        # After a fork the inherited clients share sockets with the parent process. They are
+        # dropped without closing them, closing would shut the sockets down for the parent too.
+        self.connections = ClientRegistry(max_clients=self.connections.max_clients,
+                                          idle_timeout=self.connections.idle_timeout)
+        self.info_connections = ClientRegistry(max_clients=self.info_connections.max_clients,
+                                               idle_timeout=self.info_connections.idle_timeout)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._server_versions = {}
+        self._deployment_types = {}
+        self._replicated = {}
+        if self.async_backend is not None:
+            self.async_backend.reset_after_fork()
+            self.async_backend.share_registries(self.connections, self.info_connections)
+
+    @property
+    def async_backend(self):
+        """An AsyncRedisManager that takes over INFO and cluster SCAN fan-out when set."""
+        return self._async_backend
+
+    @async_backend.setter
+    def async_backend(self, backend):
+        # Its clients go into the same registries, under the same client limit and idle timeout
+        self._async_backend = backend
+        if backend is not None:
+            backend.share_registries(self.connections, self.info_connections)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.fanout_workers,
+                                                    thread_name_prefix='redis-fanout')
+            return self._executor
+
+    def invalidate(self, connection_id: int):
+        self.connections.invalidate(connection_id)
+        self.connections.invalidate(('replicas', connection_id))
+        self.info_connections.invalidate(connection_id)
+        with self._lock:
+            self._server_versions.pop(connection_id, None)
+            for key in [key for key in self._command_tables if key[0] == connection_id]:
+                del self._command_tables[key]
+            self._deployment_types.pop(connection_id, None)
+            self._replicated.pop(connection_id, None)
+        if self.async_backend is not None:
+            self.async_backend.invalidate(connection_id)
+
+    def get_command_table(self, connection_id: int) -> Optional[CommandTable]:
+        # COMMAND is read once per connection and server version. Servers of the same version can
+        # still differ in modules, rename-command and ACLs, so tables are not shared between connections.
+        # None when the server refuses COMMAND (ACLs, renamed commands), that answer is cached too.
+        with self._lock:
+            if connection_id in self._server_versions:
+                key = (connection_id, self._server_versions[connection_id])
+                if key in self._command_tables:
+                    return self._command_tables[key]
+
+        conn = self.get_connection(connection_id)
+        try:
+            version = _server_version(conn.info('server'))
+        except redis.ResponseError:
+            version = 'unknown'
+        key = (connection_id, version)
+        with self._lock:
+            self._server_versions[connection_id] = version
+            if key in self._command_tables:
+                return self._command_tables[key]
+
+        try:
+            table = CommandTable.from_reply(version, conn.execute_command('COMMAND'))
+        except redis.ResponseError:
+            table = None
+        with self._lock:
+            self._command_tables[key] = table
+        return table
+
+    def check_command(self, connection_id: int, argv: List[Any], check_slots: bool = True) -> Optional[CommandSpec]:
+        """Validate a command against the server's COMMAND table before it is sent.
+
+        Unknown commands, wrong argument counts and, on a cluster, keys in different slots are
+        rejected locally. check_slots=False leaves the slots to callers that split keys per slot
+        themselves. Returns the command's spec, or None when the table is not available.
+        """
+        table = self.get_command_table(connection_id)
+        if table is None:
+            return None
+        spec = table.lookup(argv)
+        if spec is None:
+            raise ValueError(f"ERR unknown command '{argv[0]}'")
+        spec.check_arity(argv)
+        if check_slots and isinstance(self.get_connection(connection_id), RedisCluster):
+            keys = spec.keys(argv)
+            if keys:
+                check_same_slot(keys)
+        return spec
 
     def test_connection(self, connection) -> bool:
         try:
@@ -22,44 +253,151 @@ class RedisManager:
             return False
 
     def get_connection(self, connection_id):
-        if connection_id not in self.connections:
+        def create():
+            return self._create_client(self._load_connection(connection_id))
+
+        return self.connections.get_or_create(connection_id, create)
+
+    def _note_deployment(self, connection):
+        self._deployment_types[connection.id] = connection.deployment_type
+        self._replicated[connection.id] = _has_replicas(connection)
+
+    def _load_connection(self, connection_id) -> RedisConnection:
+        connection = db.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            raise ValueError(f"Redis connection with id {connection_id} not found")
+        self._note_deployment(connection)
+        return connection
+
+    def _deployment_type(self, connection_id) -> RedisDeploymentType:
+        deployment_type = self._deployment_types.get(connection_id)
+        if deployment_type is None:
+            deployment_type = self._load_connection(connection_id).deployment_type
+        return deployment_type
+
+    def get_read_connection(self, connection_id):
+        return self.get_read_node(connection_id)[1]
+
+    def pick_read_node(self, connection_id) -> Optional[int]:
+        # For loops that keep reading from one server, pass it back as node=
+        return self.get_read_node(connection_id)[0]
+
+    def get_read_node(self, connection_id, node: int = None) -> Tuple[Optional[int], Any]:
+        """The node read-only traffic goes to and its client, node being None when it is always the master.
+
+        A healthy replica is picked where the deployment has them, or the given node is used again.
+        Deployments without replicas get the master directly, a ReplicaPool would only take a registry slot.
+        """
+        client = self.get_connection(connection_id)
+        if not self.read_from_replicas or not self._replicated.get(connection_id, False):
+            return None, client
+        pool = self._get_replica_pool(connection_id)
+        if node is None:
+            node = pool.pick()
+        return node, pool.node(node)
+
+    def _get_replica_pool(self, connection_id) -> ReplicaPool:
+        def create():
             connection = db.session.query(RedisConnection).get(connection_id)
             if not connection:
                 raise ValueError(f"Redis connection with id {connection_id} not found")
-
-            if connection.deployment_type == RedisDeploymentType.STANDALONE:
-                self.connections[connection_id] = redis.Redis(
-                    host=connection.host,
-                    port=connection.port,
-                    db=connection.db
-                )
-                if connection.password:
-                    self.connections[connection_id].password = connection.password
-
-            elif connection.deployment_type == RedisDeploymentType.SENTINEL:
-                sentinel_hosts = [tuple(h.split(':')) for h in connection.sentinel_hosts.split(',')]
-                sentinel = Sentinel(sentinel_hosts, password=connection.password)
-                self.connections[connection_id] = sentinel.master_for(connection.sentinel_master)
-            elif connection.deployment_type == RedisDeploymentType.MASTER_SLAVE:
-                self.connections[connection_id] = redis.Redis(
-                    host=connection.master_host,
-                    port=connection.master_port,
-                    password=connection.password
-                )
-            elif connection.deployment_type == RedisDeploymentType.CLUSTER:
-                cluster_nodes = [n.split(':') for n in connection.cluster_nodes.split(',')]
-                self.connections[connection_id] = RedisCluster(
-                    startup_nodes=cluster_nodes,
-                    password=connection.password
-                )
-
-        return self.connections[connection_id]
+            return self._create_replica_pool(connection)
+
+        return self.connections.get_or_create(('replicas', connection_id), create)
+
+    def get_nodes(self, connection_id) -> Dict[str, redis.Redis]:
+        """A client per server behind a connection, keyed by "host:port".
+
+        Cluster primaries and replicas, or the master and its replicas from slave_hosts or Sentinel.
+        """
+        client = self.get_connection(connection_id)
+        if isinstance(client, RedisCluster):
+            return {node.name: node.redis_connection for node in client.get_nodes()
+                    if node.redis_connection is not None}
+        nodes = {_node_name(client, 'master'): client}
+        if not self._replicated.get(connection_id, False):
+            return nodes
+        for replica in self._get_replica_pool(connection_id).replicas:
+            nodes[_node_name(replica, f'replica{len(nodes)}')] = replica
+        return nodes
+
+    def map_nodes(self, connection_id, func: Callable[[str, redis.Redis], Any]) -> Dict[str, Any]:
+        """func(name, client) for every node of get_nodes at the same time, keyed like get_nodes."""
+        return self._fan_out({name: partial(func, name, client)
+                              for name, client in self.get_nodes(connection_id).items()})
+
+    def _fan_out(self, calls: Dict[Any, Callable[[], Any]]) -> Dict[Any, Any]:
+        # Every call runs on the fan-out pool, one that raised has its exception as its result
+        futures = {name: self.executor.submit(call) for name, call in calls.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+        return results
+
+    def _create_replica_pool(self, connection):
+        master = self.get_connection(connection.id)
+        pool_options = dict(self.pool_options)
+        if connection.deployment_type == RedisDeploymentType.MASTER_SLAVE and connection.slave_hosts:
+            replica_hosts = _parse_hosts(connection.slave_hosts)
+        elif connection.deployment_type == RedisDeploymentType.SENTINEL:
+            replica_hosts = self._sentinel(connection).discover_slaves(connection.sentinel_master)
+        else:
+            replica_hosts = []
+
+        replicas = [redis.Redis(connection_pool=redis.BlockingConnectionPool(
+            host=host,
+            port=port,
+            password=connection.password,
+            **pool_options
+        )) for host, port in replica_hosts]
+        return ReplicaPool(master, replicas, max_lag=self.replica_max_lag,
+                           check_interval=self.replica_check_interval)
+
+    def _sentinel(self, connection) -> Sentinel:
+        return Sentinel(_parse_hosts(connection.sentinel_hosts), password=connection.password,
+                        socket_timeout=self.pool_options['socket_timeout'])
+
+    def _create_client(self, connection, **pool_overrides):
+        pool_options = dict(self.pool_options, **pool_overrides)
+        if connection.deployment_type == RedisDeploymentType.STANDALONE:
+            return redis.Redis(connection_pool=redis.BlockingConnectionPool(
+                host=connection.host,
+                port=connection.port,
+                db=connection.db,
+                password=connection.password,
+                **pool_options
+            ))
+        elif connection.deployment_type == RedisDeploymentType.SENTINEL:
+            return self._sentinel(connection).master_for(connection.sentinel_master, **pool_options)
+        elif connection.deployment_type == RedisDeploymentType.MASTER_SLAVE:
+            return redis.Redis(connection_pool=redis.BlockingConnectionPool(
+                host=connection.master_host,
+                port=connection.master_port,
+                password=connection.password,
+                **pool_options
+            ))
+        elif connection.deployment_type == RedisDeploymentType.CLUSTER:
+            cluster_nodes = [ClusterNode(host, port) for host, port in _parse_hosts(connection.cluster_nodes)]
+            return RedisCluster(
+                startup_nodes=cluster_nodes,
+                password=connection.password,
+                **pool_options
+            )
+        raise ValueError(f"Unsupported deployment type: {connection.deployment_type}")
+
+    def fetch_info(self, connection) -> Dict[str, Any]:
+        # Timed here, the connection list and the metrics poller both come through
+        with redis_info_latency.time(connection.id, errors=redis_info_errors):
+            client = self.info_connections.get_or_create(
+                connection.id, lambda: self._create_client(connection, max_connections=self.info_pool_size))
+            return client.info()
 
     def get_redis_info(self, connection):
         try:
-            self.test_connection(connection)
-            client = self.connections[connection.id]
-            info = client.info()
+            info = self.fetch_info(connection)
             return {
                 'cpu_usage': info.get('used_cpu_sys', 'N/A'),
                 'memory_usage': info.get('used_memory_human', 'N/A'),
@@ -72,126 +410,419 @@ class RedisManager:
                 'status': f'Disconnected: {str(e)}'
             }
 
+    def get_redis_info_many(self, connections, timeout: float = None) -> Dict[int, Dict[str, Any]]:
+        # INFO for every connection runs on the fan-out pool, hosts that miss the deadline are
+        # reported as timed out instead of holding up the caller. A call that already started
+        # cannot be cancelled, it keeps its worker until the client's socket_timeout ends it.
+        if self.async_backend is not None:
+            return self.async_backend.run(self.async_backend.get_redis_info_many(connections, timeout))
+        futures = {connection.id: self.executor.submit(self.get_redis_info, connection) for connection in connections}
+        done, _ = wait(futures.values(), timeout=timeout)
+
+        infos = {}
+        for connection_id, future in futures.items():
+            if future in done:
+                infos[connection_id] = future.result()
+            else:
+                infos[connection_id] = {
+                    'cpu_usage': 'N/A',
+                    'memory_usage': 'N/A',
+                    'status': 'Timed out'
+                }
+        return infos
+
     # String operations
+    @_timed
     def set(self, connection_id: int, key: str, value: str, ex: int = None, px: int = None, nx: bool = False,
             xx: bool = False) -> bool:
         conn = self.get_connection(connection_id)
         return conn.set(key, value, ex=ex, px=px, nx=nx, xx=xx)
 
+    @_timed
     def get(self, connection_id: int, key: str) -> str:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.get(key)
 
+    @_timed
     def mset(self, connection_id: int, mapping: Dict[str, str]) -> bool:
         conn = self.get_connection(connection_id)
         return conn.mset(mapping)
 
+    @_timed
     def mget(self, connection_id: int, keys: List[str]) -> List[str]:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.mget(keys)
 
     # List operations
+    @_timed
     def lpush(self, connection_id: int, name: str, *values: Any) -> int:
         conn = self.get_connection(connection_id)
         return conn.lpush(name, *values)
 
+    @_timed
     def rpush(self, connection_id: int, name: str, *values: Any) -> int:
         conn = self.get_connection(connection_id)
         return conn.rpush(name, *values)
 
+    @_timed
     def lpop(self, connection_id: int, name: str) -> str:
         conn = self.get_connection(connection_id)
         return conn.lpop(name)
 
+    @_timed
     def rpop(self, connection_id: int, name: str) -> str:
         conn = self.get_connection(connection_id)
         return conn.rpop(name)
 
+    @_timed
     def lrange(self, connection_id: int, name: str, start: int, end: int) -> List[str]:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.lrange(name, start, end)
 
     # Set operations
+    @_timed
     def sadd(self, connection_id: int, name: str, *values: Any) -> int:
         conn = self.get_connection(connection_id)
         return conn.sadd(name, *values)
 
+    @_timed
     def srem(self, connection_id: int, name: str, *values: Any) -> int:
         conn = self.get_connection(connection_id)
         return conn.srem(name, *values)
 
+    @_timed
     def smembers(self, connection_id: int, name: str) -> Set[str]:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.smembers(name)
 
     # Hash operations
+    @_timed
     def hset(self, connection_id: int, name: str, key: str, value: str) -> int:
         conn = self.get_connection(connection_id)
         return conn.hset(name, key, value)
 
+    @_timed
     def hget(self, connection_id: int, name: str, key: str) -> str:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.hget(name, key)
 
+    @_timed
     def hmset(self, connection_id: int, name: str, mapping: Dict[str, str]) -> bool:
         conn = self.get_connection(connection_id)
         return conn.hmset(name, mapping)
 
+    @_timed
     def hgetall(self, connection_id: int, name: str) -> Dict[str, str]:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.hgetall(name)
 
     # Sorted Set operations
+    @_timed
     def zadd(self, connection_id: int, name: str, mapping: Dict[str, float]) -> int:
         conn = self.get_connection(connection_id)
         return conn.zadd(name, mapping)
 
+    @_timed
     def zrange(self, connection_id: int, name: str, start: int, end: int, desc: bool = False,
                withscores: bool = False) -> List[Union[str, Tuple[str, float]]]:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.zrange(name, start, end, desc=desc, withscores=withscores)
 
     # Key operations
+    @_timed
     def delete(self, connection_id: int, *names: str) -> int:
         conn = self.get_connection(connection_id)
         return conn.delete(*names)
 
+    @_timed
     def exists(self, connection_id: int, *names: str) -> int:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         return conn.exists(*names)
 
+    @_timed
+    def unlink(self, connection_id: int, *names: str) -> int:
+        conn = self.get_connection(connection_id)
+        return conn.unlink(*names)
+
+    @_timed
+    def touch(self, connection_id: int, *names: str) -> int:
+        conn = self.get_connection(connection_id)
+        return conn.touch(*names)
+
+    @_timed
     def expire(self, connection_id: int, name: str, time: int) -> bool:
         conn = self.get_connection(connection_id)
         return conn.expire(name, time)
 
+    @_timed
+    def scan_keys(self, connection_id: int, cursor: Union[int, str] = 0, match: str = None, count: int = None,
+                  _type: str = None, node: int = None) -> Tuple[Union[int, str], List[str]]:
+        """One SCAN page. With replicas the returned cursor names the node it belongs to, and node
+        pins a whole loop to one server."""
+        if self.async_backend is not None and self._deployment_type(connection_id) == RedisDeploymentType.CLUSTER:
+            # Cluster scans on the async backend never need the blocking cluster client
+            connection = self._load_connection(connection_id)
+            return self.async_backend.run(self.async_backend.scan_keys(connection, cursor=cursor, match=match,
+                                                                       count=count, _type=_type))
+        cursor_node, position = _split_read_cursor(cursor)
+        node, conn = self.get_read_node(connection_id, cursor_node if node is None else node)
+        if isinstance(conn, RedisCluster):
+            return self._scan_cluster(conn, str(cursor), match, count, _type)
+        next_cursor, keys = conn.scan(cursor=int(position), match=match, count=count, _type=_type)
+        return _join_read_cursor(node, next_cursor), keys
+
+    def scan_iter_keys(self, connection_id: int, match: str = None, count: int = None,
+                       _type: str = None) -> Iterator[str]:
+        cursor = 0
+        node = self.pick_read_node(connection_id)
+        while True:
+            cursor, keys = self.scan_keys(connection_id, cursor=cursor, match=match, count=count, _type=_type,
+                                          node=node)
+            yield from keys
+            if str(cursor) == '0':
+                break
+
+    # Export / import
+    @_timed
+    def dump_keys(self, connection_id: int, keys: List[str], node: int = None) -> List[Tuple[bytes, int]]:
+        conn = self.get_read_node(connection_id, node)[1]
+        pipe = conn.pipeline(transaction=False)
+        for key in keys:
+            pipe.dump(key)
+            pipe.pttl(key)
+        results = pipe.execute()
+        return list(zip(results[0::2], results[1::2]))
+
+    @_timed
+    def restore_keys(self, connection_id: int, entries: List[Tuple[bytes, int, bytes]], replace: bool = True) -> List[Any]:
+        conn = self.get_connection(connection_id)
+        pipe = conn.pipeline(transaction=False)
+        for key, ttl, payload in entries:
+            pipe.restore(key, ttl, payload, replace=replace)
+        return pipe.execute(raise_on_error=False)
+
+    @_timed
+    def memory_usage_and_type(self, connection_id: int, keys: List[str], node: int = None) -> List[Tuple[int, str]]:
+        conn = self.get_read_node(connection_id, node)[1]
+        pipe = conn.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key)
+            pipe.type(key)
+        results = pipe.execute()
+        return list(zip(results[0::2], results[1::2]))
+
+    # Value inspection
+    @_timed
+    def inspect_key(self, connection_id: int, key: str, count: int = None) -> Dict[str, Any]:
+        node, conn = self.get_read_node(connection_id)
+        pipe = conn.pipeline(transaction=False)
+        pipe.type(key)
+        pipe.pttl(key)
+        pipe.memory_usage(key)
+        key_type, ttl, memory = pipe.execute(raise_on_error=False)
+        if isinstance(key_type, Exception):
+            raise key_type
+
+        key_type = key_type.decode('utf-8') if isinstance(key_type, bytes) else key_type
+        if key_type == 'none':
+            raise ValueError(f"Key {key} does not exist")
+        if key_type not in self.value_length_commands:
+            raise ValueError(f"Unsupported key type: {key_type}")
+
+        # Length and the first page of the value go out in a single round trip
+        pipe = conn.pipeline(transaction=False)
+        pipe.execute_command(self.value_length_commands[key_type], key)
+        self._queue_value_page(pipe, key, key_type, 0, count)
+        length, page = pipe.execute()
+        cursor, value = self._parse_value_page(key_type, 0, count, page)
+        if key_type in self.scanned_types:
+            cursor = _join_read_cursor(node, cursor)
+
+        return {
+            'key': key,
+            'type': key_type,
+            'ttl': ttl,
+            'memory': None if isinstance(memory, Exception) else memory,
+            'length': length,
+            'cursor': cursor,
+            'value': value,
+        }
+
+    @_timed
+    def get_value_page(self, connection_id: int, key: str, key_type: str, cursor: Union[int, str] = 0,
+                       count: int = None) -> Tuple[Union[int, str], Any]:
+        if key_type not in self.value_length_commands:
+            raise ValueError(f"Unsupported key type: {key_type}")
+        node = None
+        if key_type in self.scanned_types:
+            # SSCAN, HSCAN and ZSCAN cursors go back to the node that issued them
+            node, cursor = _split_read_cursor(cursor)
+        node, conn = self.get_read_node(connection_id, node)
+        pipe = conn.pipeline(transaction=False)
+        self._queue_value_page(pipe, key, key_type, cursor, count)
+        page, = pipe.execute()
+        next_cursor, value = self._parse_value_page(key_type, cursor, count, page)
+        if key_type in self.scanned_types:
+            next_cursor = _join_read_cursor(node, next_cursor)
+        return next_cursor, value
+
+    def _queue_value_page(self, pipe, key: str, key_type: str, cursor: Union[int, str], count: int):
+        # A cursor of 0 starts the value, the page parser returns 0 once it is exhausted.
+        # Strings use the byte offset as cursor, lists the index and streams the last entry id that was read.
+        count = count or 100
+        if key_type == 'string':
+            # Strings are read in string_window sized GETRANGE windows, never whole
+            start = int(cursor)
+            pipe.getrange(key, start, start + self.string_window - 1)
+        elif key_type == 'list':
+            start = int(cursor)
+            pipe.lrange(key, start, start + count - 1)
+        elif key_type == 'set':
+            pipe.sscan(key, int(cursor), count=count)
+        elif key_type == 'zset':
+            pipe.zscan(key, int(cursor), count=count)
+        elif key_type == 'hash':
+            pipe.hscan(key, int(cursor), count=count)
+        elif key_type == 'stream':
+            start = '-' if str(cursor) == '0' else f'({cursor}'
+            pipe.xrange(key, min=start, max='+', count=count)
+
+    def _parse_value_page(self, key_type: str, cursor: Union[int, str], count: int,
+                          page: Any) -> Tuple[Union[int, str], Any]:
+        count = count or 100
+        if key_type == 'string':
+            return self._string_window_page(int(cursor), page)
+        if key_type == 'list':
+            next_cursor = int(cursor) + len(page) if len(page) == count else 0
+            return next_cursor, page
+        if key_type == 'stream':
+            if len(page) < count:
+                return 0, page
+            last_id = page[-1][0]
+            return last_id.decode('utf-8') if isinstance(last_id, bytes) else last_id, page
+        return page
+
+    def _string_window_page(self, start: int, data: bytes) -> Tuple[int, memoryview]:
+        # A window that ends inside a UTF-8 character stops before it, the next window starts there
+        if len(data) < self.string_window:
+            return 0, memoryview(data)
+        view = memoryview(data)
+        end = utf8_boundary(view) or len(view)
+        return start + end, view[:end]
+
+    @_timed
+    def get_string_range(self, connection_id: int, key: str, offset: int = 0,
+                         length: int = None) -> Tuple[int, int, memoryview]:
+        """Read one window of a string with GETRANGE.
+
+        Returns the string's total length, the offset of the next window (0 at the end) and the window.
+        """
+        length = min(length or self.string_window, self.string_window)
+        conn = self.get_read_connection(connection_id)
+        pipe = conn.pipeline(transaction=False)
+        pipe.strlen(key)
+        pipe.getrange(key, offset, offset + length - 1)
+        total, data = pipe.execute()
+        view = memoryview(data)
+        if offset + len(view) >= total:
+            return total, 0, view
+        end = utf8_boundary(view) or len(view)
+        return total, offset + end, view[:end]
+
+    def _scan_cluster(self, cluster: RedisCluster, cursor: str, match: str, count: int,
+                      _type: str) -> Tuple[str, List[str]]:
+        # Every primary is scanned at the same time, each with its own cursor. The
+        # per-node cursors are folded into one opaque cursor so the caller can resume.
+        if cursor == '0':
+            cursors = {node.name: 0 for node in cluster.get_primaries()}
+        else:
+            cursors = _decode_cluster_cursor(cursor)
+
+        nodes = []
+        for node_name, node_cursor in cursors.items():
+            node = cluster.get_node(node_name=node_name)
+            if node is None:
+                raise ValueError(f"Cluster node {node_name} is gone, restart the scan")
+            nodes.append((node, node_cursor))
+
+        results = self._fan_out({node.name: partial(cluster.get_redis_connection(node).scan, cursor=node_cursor,
+                                                    match=match, count=count, _type=_type)
+                                 for node, node_cursor in nodes})
+
+        next_cursors = {}
+        keys = []
+        for node, _ in nodes:
+            result = results[node.name]
+            if isinstance(result, Exception):
+                raise result
+            node_cursor, node_keys = result
+            keys.extend(node_keys)
+            if node_cursor != 0:
+                next_cursors[node.name] = node_cursor
+        return _encode_cluster_cursor(next_cursors), keys
+
     # Pub/Sub operations
+    @_timed
     def publish(self, connection_id: int, channel: str, message: str) -> int:
         conn = self.get_connection(connection_id)
         return conn.publish(channel, message)
 
-    def subscribe(self, connection_id: int, *channels: str):
-        conn = self.get_connection(connection_id)
-        pubsub = conn.pubsub()
-        pubsub.subscribe(*channels)
-        return pubsub
+    def pubsub(self, connection_id: int):
+        # A PubSub holds a connection of its own while it is subscribed, PubSubHub shares one per connection
+        return self.get_connection(connection_id).pubsub(ignore_subscribe_messages=True)
 
     # JSON operations (assuming redis-json module is installed)
+    @_timed
     def json_set(self, connection_id: int, name: str, path: str, obj: Any) -> bool:
         conn = self.get_connection(connection_id)
         return conn.execute_command('JSON.SET', name, path, json.dumps(obj))
 
+    @_timed
     def json_get(self, connection_id: int, name: str, path: str = '.') -> Any:
-        conn = self.get_connection(connection_id)
+        conn = self.get_read_connection(connection_id)
         result = conn.execute_command('JSON.GET', name, path)
         return json.loads(result) if result else None
 
     # Generic command execution (for commands not covered by specific methods)
+    @_timed
     def execute_command(self, connection_id: int, command: str, *args: Any) -> Any:
         conn = self.get_connection(connection_id)
         return conn.execute_command(command, *args)
 
+    @_timed
+    def execute_read_command(self, connection_id: int, command: str, *args: Any) -> Any:
+        conn = self.get_read_connection(connection_id)
+        return conn.execute_command(command, *args)
+
+    @_timed
+    def execute_pipeline(self, connection_id: int, commands: List[List[str]], transaction: bool = False,
+                         batch_size: int = 1000) -> List[Any]:
+        # Failed commands come back as exception objects in their slot instead of aborting the batch.
+        # A transaction is sent as one MULTI/EXEC block, otherwise the commands go out in chunks.
+        conn = self.get_connection(connection_id)
+        if transaction:
+            batch_size = len(commands) or 1
+        results = []
+        for start in range(0, len(commands), batch_size):
+            pipe = conn.pipeline(transaction=transaction)
+            for parts in commands[start:start + batch_size]:
+                pipe.execute_command(*parts)
+            results.extend(pipe.execute(raise_on_error=False))
+        return results
+
 
 class RedisCommandRouter:
+    # Commands that never write, used to pick replicas when the server's COMMAND table is not available
+    read_only_commands = {
+        'DBSIZE', 'DUMP', 'EXISTS', 'GETRANGE', 'HEXISTS', 'HKEYS', 'HLEN', 'HMGET', 'HSCAN', 'HSTRLEN', 'HVALS',
+        'LINDEX', 'LLEN', 'LPOS', 'MEMORY', 'OBJECT', 'PTTL', 'RANDOMKEY', 'SCAN', 'SCARD', 'SDIFF', 'SINTER',
+        'SISMEMBER', 'SMISMEMBER', 'SRANDMEMBER', 'SSCAN', 'STRLEN', 'SUNION', 'TTL', 'TYPE', 'XLEN', 'XRANGE',
+        'XREVRANGE', 'ZCARD', 'ZCOUNT', 'ZLEXCOUNT', 'ZRANGEBYLEX', 'ZRANGEBYSCORE', 'ZRANK', 'ZREVRANGE',
+        'ZREVRANGEBYLEX', 'ZREVRANGEBYSCORE', 'ZREVRANK', 'ZSCAN', 'ZSCORE', 'ZMSCORE',
+    }
+    # These would leave a pooled connection in subscriber mode, channels are watched through PubSubHub
+    subscription_commands = {'SUBSCRIBE', 'PSUBSCRIBE', 'SSUBSCRIBE', 'UNSUBSCRIBE', 'PUNSUBSCRIBE', 'SUNSUBSCRIBE'}
+
     def __init__(self, redis_manager):
         self.redis_manager = redis_manager
         self.command_map = {
@@ -215,6 +846,8 @@ class RedisCommandRouter:
             'ZRANGE': self._handle_zrange,
             'DEL': self._handle_delete,
             'EXISTS': self._handle_exists,
+            'UNLINK': self._handle_unlink,
+            'TOUCH': self._handle_touch,
             'EXPIRE': self._handle_expire,
             'PUBLISH': self._handle_publish,
             'JSON.SET': self._handle_json_set,
@@ -222,48 +855,86 @@ class RedisCommandRouter:
             'KEYS': self._handle_keys,
         }
 
-    def route_command(self, connection_id: int, command_string: str) -> Any:
+    def route_command(self, connection_id: int, command_string: str, raise_errors: bool = False) -> Any:
+        start = time.perf_counter()
+        verb = 'UNKNOWN'
         try:
             parts = self._parse_command(command_string)
             if not parts:
                 raise ValueError("Empty command")
+            self._check_not_subscription(parts)
             command = parts[0].upper()
             args = parts[1:]
+            # Handlers go through redis-py's own methods, which split DEL, EXISTS, UNLINK and TOUCH
+            # into one command per slot on a cluster, so their keys may hash to different slots
+            spec = self.redis_manager.check_command(connection_id, parts,
+                                                    check_slots=command not in self.command_map)
+            # Only known commands get their own metric label, typos would grow the label set without bound
+            if spec is not None or command in self.command_map or command in self.read_only_commands:
+                verb = command
+            else:
+                verb = 'OTHER'
 
             if command in self.command_map:
                 return self.command_map[command](connection_id, *args)
+            elif spec.read_only if spec is not None else command in self.read_only_commands:
+                return self.redis_manager.execute_read_command(connection_id, command, *args)
             else:
                 return self.redis_manager.execute_command(connection_id, command, *args)
         except Exception as e:
+            command_errors.inc(verb, connection_id)
+            if raise_errors:
+                raise
             return f"Error: {str(e)}"
+        finally:
+            command_latency.observe(time.perf_counter() - start, verb, connection_id)
+
+    def route_stream(self, connection_id: int, command_string: str, window: int = 1000) -> Optional[Iterator[List[Any]]]:
+        # The reply in windows for commands that can be read with cursors, None for everything else
+        parts = self._parse_command(command_string)
+        if not parts:
+            raise ValueError("Empty command")
+        self.redis_manager.check_command(connection_id, parts)
+        return stream_command(self.redis_manager, connection_id, parts, window=window)
+
+    def route_batch(self, connection_id: int, script: str, transaction: bool = False) -> List[Dict[str, Any]]:
+        lines = [line.strip() for line in script.splitlines()]
+        lines = [line for line in lines if line and not line.startswith('#')]
+        commands = [self._parse_command(line) for line in lines]
+
+        # A script wrapped in MULTI ... EXEC is run as a transaction
+        if len(commands) >= 2 and commands[0][0].upper() == 'MULTI' and commands[-1][0].upper() == 'EXEC':
+            lines, commands, transaction = lines[1:-1], commands[1:-1], True
+        if not commands:
+            raise ValueError("Empty batch")
+
+        # Malformed commands are answered locally and never reach the pipeline
+        results = [None] * len(commands)
+        for i, parts in enumerate(commands):
+            try:
+                self._check_not_subscription(parts)
+                self.redis_manager.check_command(connection_id, parts)
+            except ValueError as e:
+                if transaction:
+                    raise ValueError(f"Transaction discarded, {lines[i]}: {e}")
+                results[i] = e
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            replies = self.redis_manager.execute_pipeline(connection_id, [commands[i] for i in pending],
+                                                          transaction=transaction)
+            for i, reply in zip(pending, replies):
+                results[i] = reply
+
+        return [{'command': line, 'error': str(result)} if isinstance(result, Exception)
+                else {'command': line, 'result': result}
+                for line, result in zip(lines, results)]
+
+    def _check_not_subscription(self, parts: List[str]):
+        if parts[0].upper() in self.subscription_commands:
+            raise ValueError(f"{parts[0].upper()} is not available in the console, use the Pub/Sub panel")
 
     def _parse_command(self, command_string: str) -> List[str]:
-        parts = []
-        current_part = ""
-        in_quotes = False
-        in_braces = 0
-
-        for char in command_string:
-            if char == '"' and not in_braces:
-                in_quotes = not in_quotes
-                current_part += char
-            elif char == '{':
-                in_braces += 1
-                current_part += char
-            elif char == '}':
-                in_braces -= 1
-                current_part += char
-            elif char.isspace() and not in_quotes and not in_braces:
-                if current_part:
-                    parts.append(current_part)
-                    current_part = ""
-            else:
-                current_part += char
-
-        if current_part:
-            parts.append(current_part)
-
-        return parts
+        return split_command(command_string)
 
     def _parse_json_arg(self, arg: str) -> Any:
         try:
@@ -271,15 +942,10 @@ class RedisCommandRouter:
         except json.JSONDecodeError:
             return arg
 
-    def _serialize(self, value: Any) -> str:
-        if isinstance(value, (dict, list)):
-            return json.dumps(value)
-        return str(value)
-
     def _handle_set(self, connection_id: int, *args) -> Any:
         if len(args) < 2:
             raise ValueError("SET command requires at least key and value arguments")
-        key, value = args[0], self._serialize(self._parse_json_arg(args[1]))
+        key, value = args[0], args[1]
         options = {}
         if len(args) > 2:
             for i in range(2, len(args), 2):
@@ -297,7 +963,7 @@ class RedisCommandRouter:
     def _handle_mset(self, connection_id: int, *args) -> Any:
         if len(args) % 2 != 0:
             raise ValueError("MSET command requires an even number of arguments")
-        mapping = {args[i]: self._serialize(self._parse_json_arg(args[i + 1])) for i in range(0, len(args), 2)}
+        mapping = {args[i]: args[i + 1] for i in range(0, len(args), 2)}
         return self.redis_manager.mset(connection_id, mapping)
 
     def _handle_mget(self, connection_id: int, *args) -> Any:
@@ -306,14 +972,12 @@ class RedisCommandRouter:
     def _handle_lpush(self, connection_id: int, *args) -> Any:
         if len(args) < 2:
             raise ValueError("LPUSH command requires at least two arguments")
-        return self.redis_manager.lpush(connection_id, args[0],
-                                        *[self._serialize(self._parse_json_arg(arg)) for arg in args[1:]])
+        return self.redis_manager.lpush(connection_id, args[0], *args[1:])
 
     def _handle_rpush(self, connection_id: int, *args) -> Any:
         if len(args) < 2:
             raise ValueError("RPUSH command requires at least two arguments")
-        return self.redis_manager.rpush(connection_id, args[0],
-                                        *[self._serialize(self._parse_json_arg(arg)) for arg in args[1:]])
+        return self.redis_manager.rpush(connection_id, args[0], *args[1:])
 
     def _handle_lpop(self, connection_id: int, *args) -> Any:
         if len(args) != 1:
@@ -333,14 +997,12 @@ class RedisCommandRouter:
     def _handle_sadd(self, connection_id: int, *args) -> Any:
         if len(args) < 2:
             raise ValueError("SADD command requires at least two arguments")
-        return self.redis_manager.sadd(connection_id, args[0],
-                                       *[self._serialize(self._parse_json_arg(arg)) for arg in args[1:]])
+        return self.redis_manager.sadd(connection_id, args[0], *args[1:])
 
     def _handle_srem(self, connection_id: int, *args) -> Any:
         if len(args) < 2:
             raise ValueError("SREM command requires at least two arguments")
-        return self.redis_manager.srem(connection_id, args[0],
-                                       *[self._serialize(self._parse_json_arg(arg)) for arg in args[1:]])
+        return self.redis_manager.srem(connection_id, args[0], *args[1:])
 
     def _handle_smembers(self, connection_id: int, *args) -> Any:
         if len(args) != 1:
@@ -350,7 +1012,7 @@ class RedisCommandRouter:
     def _handle_hset(self, connection_id: int, *args) -> Any:
         if len(args) != 3:
             raise ValueError("HSET command requires exactly three arguments")
-        return self.redis_manager.hset(connection_id, args[0], args[1], self._serialize(self._parse_json_arg(args[2])))
+        return self.redis_manager.hset(connection_id, args[0], args[1], args[2])
 
     def _handle_hget(self, connection_id: int, *args) -> Any:
         if len(args) != 2:
@@ -360,7 +1022,7 @@ class RedisCommandRouter:
     def _handle_hmset(self, connection_id: int, *args) -> Any:
         if len(args) < 3 or len(args) % 2 == 0:
             raise ValueError("HMSET command requires at least three arguments, with an odd number of arguments")
-        mapping = {args[i]: self._serialize(self._parse_json_arg(args[i + 1])) for i in range(1, len(args), 2)}
+        mapping = {args[i]: args[i + 1] for i in range(1, len(args), 2)}
         return self.redis_manager.hmset(connection_id, args[0], mapping)
 
     def _handle_hgetall(self, connection_id: int, *args) -> Any:
@@ -371,7 +1033,7 @@ class RedisCommandRouter:
     def _handle_zadd(self, connection_id: int, *args) -> Any:
         if len(args) < 3 or len(args) % 2 == 0:
             raise ValueError("ZADD command requires at least three arguments, with an odd number of arguments")
-        mapping = {self._serialize(self._parse_json_arg(args[i + 1])): float(args[i]) for i in range(1, len(args), 2)}
+        mapping = {args[i + 1]: float(args[i]) for i in range(1, len(args), 2)}
         return self.redis_manager.zadd(connection_id, args[0], mapping)
 
     def _handle_zrange(self, connection_id: int, *args) -> Any:
@@ -393,6 +1055,16 @@ class RedisCommandRouter:
             raise ValueError("EXISTS command requires at least one argument")
         return self.redis_manager.exists(connection_id, *args)
 
+    def _handle_unlink(self, connection_id: int, *args) -> Any:
+        if not args:
+            raise ValueError("UNLINK command requires at least one argument")
+        return self.redis_manager.unlink(connection_id, *args)
+
+    def _handle_touch(self, connection_id: int, *args) -> Any:
+        if not args:
+            raise ValueError("TOUCH command requires at least one argument")
+        return self.redis_manager.touch(connection_id, *args)
+
     def _handle_expire(self, connection_id: int, *args) -> Any:
         if len(args) != 2:
             raise ValueError("EXPIRE command requires exactly two arguments")
@@ -401,7 +1073,7 @@ class RedisCommandRouter:
     def _handle_publish(self, connection_id: int, *args) -> Any:
         if len(args) != 2:
             raise ValueError("PUBLISH command requires exactly two arguments")
-        return self.redis_manager.publish(connection_id, args[0], self._serialize(self._parse_json_arg(args[1])))
+        return self.redis_manager.publish(connection_id, args[0], args[1])
 
     def _handle_json_set(self, connection_id: int, *args) -> Any:
         if len(args) != 3:
@@ -418,7 +1090,7 @@ class RedisCommandRouter:
     def _handle_keys(self, connection_id: int, *args) -> Any:
         if len(args) != 1:
             raise ValueError("KEYS command requires exactly one argument (pattern)")
-        return self.redis_manager.execute_command(connection_id, 'KEYS', args[0])
+        return self.redis_manager.execute_read_command(connection_id, 'KEYS', args[0])
 
 
 # Usage example
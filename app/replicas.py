@@ -0,0 +1,68 @@
+import itertools
+import threading
+import time
+
+import redis
+
+from app.client_registry import close_client
+
+
+class ReplicaPool:
+    """Hands out replicas round-robin, skipping the ones that lag behind the master.
+
+    Falls back to the master when no replica is configured or none is healthy. Cursor loops
+    pick() a node once and keep reading from node(index).
+    """
+
+    def __init__(self, master, replicas, max_lag: float = 10, check_interval: float = 5):
+        self.master = master
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._health = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def get(self):
+        return self.node(self.pick())
+
+    def pick(self) -> int:
+        """Index of the next healthy node, 0 is the master and replicas count from 1."""
+        if not self.replicas:
+            return 0
+        start = next(self._counter)
+        for offset in range(len(self.replicas)):
+            index = (start + offset) % len(self.replicas)
+            if self.is_healthy(self.replicas[index]):
+                return index + 1
+        return 0
+
+    def node(self, index: int):
+        # SCAN cursors only mean something on the node that issued them, so a pinned node is used as is
+        if index == 0:
+            return self.master
+        if not 0 < index <= len(self.replicas):
+            raise ValueError(f"Replica {index} is gone, restart the scan")
+        return self.replicas[index - 1]
+
+    def is_healthy(self, replica) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._health.get(id(replica), (False, None))
+        if checked_at is not None and now - checked_at < self.check_interval:
+            return healthy
+
+        try:
+            info = replica.info('replication')
+            healthy = (info.get('master_link_status') == 'up' and
+                       info.get('master_last_io_seconds_ago', 0) <= self.max_lag)
+        except redis.RedisError:
+            healthy = False
+        with self._lock:
+            self._health[id(replica)] = (healthy, now)
+        return healthy
+
+    def close(self):
+        # The master belongs to the client registry, only the replica pools are ours
+        for replica in self.replicas:
+            close_client(replica)
@@ -0,0 +1,76 @@
+from typing import Any, Iterator, List, Optional
+
+# Commands whose reply can be read in windows instead of as one reply
+STREAMABLE_COMMANDS = {'LRANGE', 'SMEMBERS', 'HGETALL', 'HKEYS', 'HVALS', 'ZRANGE', 'KEYS'}
+
+
+def stream_command(redis_manager, connection_id: int, argv: List[str],
+                   window: int = 1000) -> Optional[Iterator[List[Any]]]:
+    """Read the reply of a large read command window by window.
+
+    Returns an iterator of reply chunks, or None when the command cannot be streamed and has
+    to be executed normally. Sets and hashes are walked with SSCAN/HSCAN, lists and sorted
+    sets by index ranges and KEYS with SCAN, so at most one window is held at a time. Like
+    any cursor, the result may miss or repeat elements changed while it is read.
+    """
+    command, args = argv[0].upper(), argv[1:]
+    if command not in STREAMABLE_COMMANDS:
+        return None
+    if command == 'KEYS' and len(args) == 1:
+        return _chunks(redis_manager.scan_iter_keys(connection_id, match=args[0], count=window), window)
+    if command == 'LRANGE' and len(args) == 3:
+        return _index_windows(redis_manager, connection_id, 'LLEN', args[0], int(args[1]), int(args[2]), window,
+                              lambda start, stop: redis_manager.lrange(connection_id, args[0], start, stop))
+    if command == 'ZRANGE' and len(args) in (3, 4):
+        # Only plain index ranges, BYSCORE, BYLEX, REV and LIMIT are executed normally
+        withscores = len(args) == 4
+        if withscores and args[3].upper() != 'WITHSCORES':
+            return None
+        return _index_windows(redis_manager, connection_id, 'ZCARD', args[0], int(args[1]), int(args[2]), window,
+                              lambda start, stop: redis_manager.zrange(connection_id, args[0], start, stop,
+                                                                       withscores=withscores))
+    if command == 'SMEMBERS' and len(args) == 1:
+        return _scan_windows(redis_manager, connection_id, 'set', args[0], window, lambda page: page)
+    if command in ('HGETALL', 'HKEYS', 'HVALS') and len(args) == 1:
+        pick = {'HGETALL': lambda page: [[field, value] for field, value in page.items()],
+                'HKEYS': lambda page: list(page),
+                'HVALS': lambda page: list(page.values())}[command]
+        return _scan_windows(redis_manager, connection_id, 'hash', args[0], window, pick)
+    return None
+
+
+def _chunks(items: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _index_windows(redis_manager, connection_id: int, length_command: str, key: str, start: int, stop: int,
+                   window: int, read) -> Iterator[List[Any]]:
+    # Negative indexes count from the end, so they are resolved against the length once
+    if start < 0 or stop < 0:
+        length = redis_manager.execute_read_command(connection_id, length_command, key)
+        start = max(start + length, 0) if start < 0 else start
+        stop = stop + length if stop < 0 else stop
+    while start <= stop:
+        chunk = read(start, min(start + window - 1, stop))
+        if not chunk:
+            break
+        yield chunk
+        start += len(chunk)
+
+
+def _scan_windows(redis_manager, connection_id: int, key_type: str, key: str, window: int,
+                  pick) -> Iterator[List[Any]]:
+    cursor = 0
+    while True:
+        cursor, page = redis_manager.get_value_page(connection_id, key, key_type, cursor=cursor, count=window)
+        if page:
+            yield pick(page)
+        if str(cursor) == '0':
+            break
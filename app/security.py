@@ -17,6 +17,10 @@ class PyMyRedisSecurityManager(SecurityManager):
     def create_custom_roles(self):
         read_values = ['can_list',
                        'can_show', 'can_redis_detail', 'menu_access', 'view_details', 'can_execute_command',
+                       'can_browse_keys', 'can_inspect_key', 'can_load_value_page',
+                       'can_metrics_history', 'can_execute_batch', 'can_export_keyspace', 'can_import_keyspace',
+                       'can_analyze_keyspace', 'can_execute_stream', 'can_read_string_range', 'can_slowlog',
+                       'can_subscribe',
                        ]
 
         values = {
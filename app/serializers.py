@@ -0,0 +1,140 @@
+import base64
+import codecs
+import json
+import math
+from typing import Any, Dict
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Values that are not valid UTF-8 are sent as {"base64": "..."}
+BINARY_KEY = 'base64'
+
+_REPLY_TYPES = {
+    bytes: 'string',
+    str: 'string',
+    int: 'integer',
+    bool: 'boolean',
+    float: 'double',
+    type(None): 'null',
+    list: 'array',
+    tuple: 'array',
+    dict: 'map',
+    set: 'set',
+    frozenset: 'set',
+}
+
+
+class ReplyEncoder:
+    """Turns any RESP2/RESP3 reply redis-py returns into JSON compatible values.
+
+    Bytes become text when they are UTF-8 and {"base64": ...} otherwise, which sets binary.
+    Tuples and sets become arrays, error replies inside arrays become {"error": ...}, and maps
+    whose keys are not all text become arrays of [key, value] pairs.
+    """
+
+    def __init__(self):
+        self.binary = False
+
+    def encode(self, value: Any) -> Any:
+        kind = type(value)
+        if kind is bytes:
+            try:
+                return value.decode('utf-8')
+            except UnicodeDecodeError:
+                self.binary = True
+                return {BINARY_KEY: base64.b64encode(value).decode('ascii')}
+        if kind is memoryview:
+            # Windows of large strings are decoded straight from the buffer, without a bytes copy
+            try:
+                return codecs.utf_8_decode(value, 'strict', True)[0]
+            except UnicodeDecodeError:
+                self.binary = True
+                return {BINARY_KEY: base64.b64encode(value).decode('ascii')}
+        if kind is str or kind is int or kind is bool or value is None:
+            return value
+        if kind is float:
+            # ZSCORE and friends may return +inf/-inf, which JSON cannot hold
+            return value if math.isfinite(value) else str(value)
+        if kind is list or kind is tuple or kind is set or kind is frozenset:
+            return self._encode_array(value)
+        if isinstance(value, dict):
+            return self._encode_map(value)
+        if isinstance(value, Exception):
+            return {'error': str(value)}
+        # Subclasses, e.g. RESP3 verbatim strings, are encoded like their base type
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return self.encode(bytes(value))
+        for base in (str, int, float):
+            if isinstance(value, base):
+                return self.encode(base(value))
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return [self.encode(item) for item in value]
+        return str(value)
+
+    def _encode_array(self, value) -> list:
+        try:
+            # Most arrays hold UTF-8 bulk strings, decoding them inline skips a call per element
+            return [item.decode('utf-8') if type(item) is bytes else self.encode(item) for item in value]
+        except UnicodeDecodeError:
+            return [self.encode(item) for item in value]
+
+    def _encode_map(self, value: Dict[Any, Any]) -> Any:
+        if all(type(key) is bytes or type(key) is str for key in value):
+            try:
+                return {key.decode('utf-8') if type(key) is bytes else key:
+                        item.decode('utf-8') if type(item) is bytes else self.encode(item)
+                        for key, item in value.items()}
+            except UnicodeDecodeError:
+                pass
+        pairs = [(self.encode(key), self.encode(item)) for key, item in value.items()]
+        if all(type(key) is str for key, _ in pairs):
+            return dict(pairs)
+        return [[key, item] for key, item in pairs]
+
+
+def utf8_boundary(view: memoryview) -> int:
+    """Length of view without a multi-byte UTF-8 character cut off at its end."""
+    length = len(view)
+    for back in range(1, min(length, 4) + 1):
+        byte = view[length - back]
+        if byte & 0xC0 == 0x80:
+            continue
+        if 0xC0 <= byte < 0xF8:
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return length - back if needed > back else length
+        return length
+    return length
+
+
+def encode_reply(value: Any) -> Any:
+    return ReplyEncoder().encode(value)
+
+
+def reply_type(value: Any) -> str:
+    for kind in type(value).__mro__:
+        if kind in _REPLY_TYPES:
+            return _REPLY_TYPES[kind]
+    return 'error' if isinstance(value, Exception) else 'unknown'
+
+
+def describe_reply(value: Any) -> Dict[str, Any]:
+    """The encoded reply with its RESP type, size (bytes or elements) and whether binary data was encoded."""
+    encoder = ReplyEncoder()
+    result = encoder.encode(value)
+    size = len(value) if isinstance(value, (bytes, str, list, tuple, set, frozenset, dict)) else None
+    return {'result': result, 'type': reply_type(value), 'size': size, 'binary': encoder.binary}
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(value: Any, status: int = 200):
+    return current_app.response_class(dumps(value), status=status, mimetype='application/json')
@@ -0,0 +1,187 @@
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Commands whose first argument picks what they do, CONFIG GET and CONFIG SET are different fingerprints
+SUBCOMMAND_VERBS = {
+    'ACL', 'CLIENT', 'CLUSTER', 'COMMAND', 'CONFIG', 'DEBUG', 'FUNCTION', 'LATENCY', 'MEMORY', 'MODULE',
+    'OBJECT', 'PUBSUB', 'SCRIPT', 'SLOWLOG', 'XGROUP', 'XINFO',
+}
+# Option keywords kept in fingerprints, they change what a command costs (ZRANGE ? WITHSCORES, SCAN ? MATCH ?)
+KEYWORDS = {
+    'ABSTTL', 'AGGREGATE', 'ALPHA', 'ASC', 'BLOCK', 'BY', 'BYLEX', 'BYSCORE', 'CH', 'COPY', 'COUNT', 'DESC',
+    'EX', 'EXAT', 'FREQ', 'GET', 'GROUP', 'GT', 'IDLETIME', 'INCR', 'KEEPTTL', 'LIMIT', 'LT', 'MATCH', 'MAXLEN',
+    'MINID', 'NOACK', 'NOVALUES', 'NX', 'PX', 'PXAT', 'REPLACE', 'REV', 'STORE', 'STREAMS', 'TYPE', 'WEIGHTS',
+    'WITHSCORE', 'WITHSCORES', 'WITHVALUES', 'XX',
+}
+
+
+def _shape(command: Any, collapse: bool) -> str:
+    if isinstance(command, bytes):
+        command = command.decode('utf-8', 'replace')
+    args = command.split() if isinstance(command, str) else [
+        arg.decode('utf-8', 'replace') if isinstance(arg, bytes) else str(arg) for arg in command]
+    if not args:
+        return '?'
+    parts = [args[0].upper()]
+    rest = args[1:]
+    if parts[0] in SUBCOMMAND_VERBS and rest:
+        parts.append(rest[0].upper())
+        rest = rest[1:]
+    for arg in rest:
+        word = arg.upper()
+        if word in KEYWORDS:
+            parts.append(word)
+        elif not collapse or parts[-1] != '?':
+            parts.append('?')
+    return ' '.join(parts)
+
+
+def fingerprint(command: Any) -> str:
+    """The shape of a slow command with its keys and values replaced by "?".
+
+    Runs of arguments collapse into one "?", so MGET with 3 or 300 keys is the same fingerprint.
+    """
+    return _shape(command, collapse=True)
+
+
+def redact(command: Any) -> str:
+    """A slow command with every key and value replaced by "?", one per argument so its size shows."""
+    return _shape(command, collapse=False)
+
+
+def read_new_entries(client, last_id: Optional[int], page_size: int = 32,
+                     max_entries: int = 1024) -> List[Dict[str, Any]]:
+    """SLOWLOG entries of one node newer than last_id, newest first.
+
+    Pages grow until they reach last_id, so a refresh downloads roughly the entries that are new.
+    Ids only grow, unless the log was reset or the server restarted, then everything is new again.
+    """
+    count = page_size
+    while True:
+        entries = client.slowlog_get(count)
+        if len(entries) < count or count >= max_entries:
+            break
+        if last_id is not None and entries[-1]['id'] <= last_id:
+            break
+        count = min(count * 2, max_entries)
+    if last_id is None or not entries or entries[0]['id'] < last_id:
+        return entries
+    return [entry for entry in entries if entry['id'] > last_id]
+
+
+class FingerprintStats:
+    def __init__(self, example: str, samples: int):
+        self.example = example
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.last_seen = 0
+        self.nodes = set()
+        # The most recent durations, p99 over all of them would need every duration kept
+        self.durations = deque(maxlen=samples)
+
+    def add(self, node: str, duration: int, start_time: int):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.last_seen = max(self.last_seen, start_time)
+        self.nodes.add(node)
+        self.durations.append(duration)
+
+    def p99(self) -> int:
+        ordered = sorted(self.durations)
+        return ordered[max(math.ceil(0.99 * len(ordered)) - 1, 0)] if ordered else 0
+
+    def to_dict(self, name: str) -> Dict[str, Any]:
+        # Redis reports microseconds
+        return {
+            'fingerprint': name,
+            'count': self.count,
+            'total_ms': round(self.total / 1000, 3),
+            'avg_ms': round(self.total / self.count / 1000, 3),
+            'p99_ms': round(self.p99() / 1000, 3),
+            'max_ms': round(self.max / 1000, 3),
+            'last_seen': self.last_seen,
+            'nodes': sorted(self.nodes),
+            'example': self.example,
+        }
+
+
+class SlowlogAggregator:
+    """SLOWLOG of every node of a connection, grouped by command fingerprint.
+
+    Nodes are read in parallel with RedisManager.map_nodes. The highest entry id seen per
+    node is kept, so every refresh only adds entries the aggregate has not counted yet.
+    """
+
+    other_fingerprint = '<other>'
+
+    def __init__(self, page_size: int = 32, max_entries: int = 1024, max_fingerprints: int = 1000,
+                 samples: int = 1000, example_length: int = 200):
+        self.page_size = page_size
+        self.max_entries = max_entries
+        self.max_fingerprints = max_fingerprints
+        self.samples = samples
+        self.example_length = example_length
+        self._marks = {}
+        self._stats = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.page_size = app.config.get('SLOWLOG_PAGE_SIZE', self.page_size)
+        self.max_entries = app.config.get('SLOWLOG_MAX_ENTRIES', self.max_entries)
+        self.max_fingerprints = app.config.get('SLOWLOG_MAX_FINGERPRINTS', self.max_fingerprints)
+
+    def _connection_lock(self, connection_id: int) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(connection_id, threading.Lock())
+
+    def refresh(self, redis_manager, connection_id: int, top_n: int = 50) -> Dict[str, Any]:
+        # One refresh per connection at a time, two would count the same new entries twice
+        with self._connection_lock(connection_id):
+            marks = self._marks.setdefault(connection_id, {})
+            results = redis_manager.map_nodes(connection_id, lambda name, client: read_new_entries(
+                client, marks.get(name), self.page_size, self.max_entries))
+
+            node_report = {}
+            for name, entries in results.items():
+                if isinstance(entries, Exception):
+                    node_report[name] = {'last_id': marks.get(name), 'new_entries': 0, 'error': str(entries)}
+                    continue
+                self._add(connection_id, name, entries)
+                if entries:
+                    marks[name] = entries[0]['id']
+                node_report[name] = {'last_id': marks.get(name), 'new_entries': len(entries)}
+
+            report = self.report(connection_id, top_n=top_n)
+            report['nodes'] = node_report
+            return report
+
+    def _add(self, connection_id: int, node: str, entries: List[Dict[str, Any]]):
+        stats = self._stats.setdefault(connection_id, {})
+        for entry in entries:
+            name = fingerprint(entry['command'])
+            if name not in stats and len(stats) >= self.max_fingerprints:
+                name = self.other_fingerprint
+            if name not in stats:
+                stats[name] = FingerprintStats(redact(entry['command'])[:self.example_length], self.samples)
+            stats[name].add(node, entry['duration'], entry['start_time'])
+
+    def report(self, connection_id: int, top_n: int = 50) -> Dict[str, Any]:
+        stats = self._stats.get(connection_id, {})
+        ranked = sorted(stats.items(), key=lambda item: item[1].total, reverse=True)[:top_n]
+        return {
+            'entries': sum(item.count for item in stats.values()),
+            'fingerprints': [item.to_dict(name) for name, item in ranked],
+        }
+
+    def reset(self, connection_id: int):
+        # Marks are kept, entries counted before the reset are not read again
+        with self._connection_lock(connection_id):
+            self._stats.pop(connection_id, None)
+
+
+slowlog_aggregator = SlowlogAggregator()
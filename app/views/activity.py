@@ -1,5 +1,9 @@
+from flask import jsonify, request, current_app
 from app.views.base import BaseModelView
-from flask_appbuilder import action
+from flask_appbuilder import action, expose, has_access
+from app.activity_writer import activity_writer
+from app.activity_storage import activity_page
+from app.enums import ActivityOutcome
 
 from flask_appbuilder.models.sqla.interface import SQLAInterface
 from app.models import Activity
@@ -9,4 +13,35 @@ class ActivityView(BaseModelView):
     datamodel = SQLAInterface(Activity)
     list_columns = ['created_by', 'created_on', 'message']
     search_columns = ['created_by', 'created_on', 'message']
-    base_permissions = ['can_list']
+    base_permissions = ['can_list', 'can_queue_status', 'can_feed']
+    base_order = ('id', 'desc')
+
+    @expose('/feed/', methods=['GET'])
+    @has_access
+    def feed(self):
+        # Seek pagination on the primary key, cheap no matter how deep the user pages
+        outcome = request.args.get('outcome')
+        filters = {
+            'search': request.args.get('q', ''),
+            'connection_id': request.args.get('connection_id', type=int),
+            'command': request.args.get('command') or None,
+            'outcome': ActivityOutcome[outcome] if outcome in ActivityOutcome.__members__ else None,
+        }
+        activities, next_before = activity_page(
+            self.datamodel.session,
+            before_id=request.args.get('before', type=int),
+            limit=current_app.config.get('ACTIVITY_PAGE_SIZE', 50),
+            **filters
+        )
+        return self.render_template('activity_feed.html', activities=activities, next_before=next_before,
+                                    filters=filters)
+
+    @expose('/queue/', methods=['GET'])
+    @has_access
+    def queue_status(self):
+        return jsonify({
+            'depth': activity_writer.depth,
+            'written': activity_writer.written,
+            'failed': activity_writer.failed,
+            'running': activity_writer.running,
+        })
@@ -1,13 +1,12 @@
 from flask_appbuilder import ModelView, BaseView, expose, has_access
-from app.models import Activity
+from app.activity_writer import activity_writer
+from app.metrics import activity_log_latency
 
 
 class CustomBaseView(BaseView):
-    def save_activity_log(self, log_message):
-        activity = Activity()
-        activity.message = log_message
-        self.appbuilder.session.add(activity)
-        self.appbuilder.session.commit()
+    def save_activity_log(self, log_message, connection_id=None, command=None, outcome=None):
+        with activity_log_latency.time():
+            activity_writer.write(log_message, connection_id=connection_id, command=command, outcome=outcome)
 
 
 class BaseModelView(ModelView):
@@ -16,10 +15,8 @@ class BaseModelView(ModelView):
     show_exclude_columns = ['created_by', 'changed_by', 'created_on', 'changed_on']
 
     def save_activity_log(self, log_message):
-        activity = Activity()
-        activity.message = log_message
-        self.appbuilder.session.add(activity)
-        self.appbuilder.session.commit()
+        with activity_log_latency.time():
+            activity_writer.write(log_message)
 
     def post_update(self, item):
         self.save_activity_log(item.updated_activity)
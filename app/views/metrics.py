@@ -0,0 +1,26 @@
+import hmac
+
+from flask import current_app, request
+from flask_appbuilder import BaseView, expose
+
+from app.metrics import CONTENT_TYPE, multiprocess_store
+
+
+class MetricsView(BaseView):
+    """Prometheus scrape endpoint at /metrics.
+
+    Scrapers have no login session, so the endpoint is not behind has_access. Requests must send
+    METRICS_ENDPOINT_TOKEN as "Authorization: Bearer <token>", without a token the endpoint is off.
+    The samples cover every gunicorn worker sharing METRICS_MULTIPROCESS_DIR.
+    """
+    route_base = "/"
+    default_view = 'metrics'
+
+    @expose('/metrics')
+    def metrics(self):
+        token = current_app.config.get('METRICS_ENDPOINT_TOKEN')
+        if not current_app.config.get('METRICS_ENDPOINT_ENABLED', True) or not token:
+            return current_app.response_class('Not found', status=404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return current_app.response_class('Unauthorized', status=401)
+        return current_app.response_class(multiprocess_store.render(), mimetype=None, content_type=CONTENT_TYPE)
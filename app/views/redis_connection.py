@@ -1,14 +1,35 @@
-from flask import redirect, url_for, flash, g
+from flask import redirect, url_for, flash, g, current_app
 from app.views.base import BaseModelView
 from flask_appbuilder import action
 from flask_appbuilder.models.sqla.interface import SQLAInterface
 from app.models import RedisConnection
 from app.redis_manager import redis_manager
+from app.monitoring import metrics_poller
 from app.filters import CanListConnectionFilter
 
 
+class RedisConnectionInterface(SQLAInterface):
+    def get_values(self, lst, list_columns):
+        # Use the poller's latest sample where it is fresh and fetch INFO for the remaining
+        # visible rows at once, the info column reads it back from g
+        if 'info' in list_columns:
+            infos = {}
+            missing = []
+            for item in lst:
+                summary = metrics_poller.get_summary(item.id)
+                if summary is None:
+                    missing.append(item)
+                else:
+                    infos[item.id] = summary
+            if missing:
+                infos.update(redis_manager.get_redis_info_many(
+                    missing, timeout=current_app.config.get('REDIS_INFO_TIMEOUT', 2)))
+            g.redis_info = infos
+        return super().get_values(lst, list_columns)
+
+
 class RedisConnectionView(BaseModelView):
-    datamodel = SQLAInterface(RedisConnection)
+    datamodel = RedisConnectionInterface(RedisConnection)
     # list_template = 'list_redis_cards.html'
     base_permissions = ['can_list', 'can_show', 'can_add', 'can_edit', 'can_delete']
     list_columns = ['name', 'deployment_type', 'description', 'info', 'details']
@@ -24,24 +45,13 @@ class RedisConnectionView(BaseModelView):
 
     base_filters = [('id', CanListConnectionFilter, ())]
 
-    def _list(self):
-        # widgets = self._list()
-        query = self.datamodel.session.query(self.datamodel.obj)
-
-        # Apply base filters
-        query = self._base_filters.apply_all(query)
+    def post_update(self, item):
+        redis_manager.invalidate(item.id)
+        super().post_update(item)
 
-        # Apply any additional filters (if needed)
-        # query = self.apply_additional_filters(query)  # Uncomment if you have additional filters
-
-        # Get the items
-        items = query.all()
-
-        redis_info = []
-        for item in items:
-            info = redis_manager.get_redis_info(item)
-            redis_info.append(info)
-        return super()._list()
+    def post_delete(self, item):
+        redis_manager.invalidate(item.id)
+        super().post_delete(item)
 
     # @expose('/list/')
     # @has_access
@@ -1,16 +1,30 @@
-from flask import g, jsonify, request, redirect, url_for, flash
+from flask import g, jsonify, request, redirect, url_for, flash, current_app, Response, stream_with_context
 from flask_appbuilder import expose, has_access
+import json
 from app.models import RedisConnection
+from app.enums import ActivityOutcome
 from flask import g
-# from app.redis_manager import redis_manager
 from app.views.base import CustomBaseView
-from app.redis_manager import command_router
+from app.redis_manager import command_router, redis_manager
+from app.monitoring import metrics_poller
+from app.keyspace_transfer import export_keys, import_keys, read_trailer
+from app.keyspace_analyzer import KeyspaceAnalyzer
+from app.slowlog import slowlog_aggregator
+from app.pubsub_hub import pubsub_hub, keyspace_pattern
+from app.result_stream import STREAMABLE_COMMANDS
+from app.serializers import describe_reply, dumps, encode_reply, json_response
 
 
 class RedisDetailView(CustomBaseView):
     route_base = "/redisdetailview"
     default_view = 'redis_detail'
 
+    def log_command(self, connection, command, result, succeeded=True, verb=None):
+        verb = verb or (command.split(None, 1)[0].upper()[:64] if command and command.strip() else None)
+        self.save_activity_log(connection.execute_activity(command, result), connection_id=connection.id,
+                               command=verb,
+                               outcome=ActivityOutcome.SUCCESS if succeeded else ActivityOutcome.FAILURE)
+
     @expose('/<int:connection_id>')
     @has_access
     def redis_detail(self, connection_id):
@@ -20,13 +34,14 @@ class RedisDetailView(CustomBaseView):
             flash("Redis connection not found", "error")
             return redirect(url_for('RedisConnectionView.list'))
 
-        self.save_activity_log(connection.show_activity)
+        self.save_activity_log(connection.show_activity, connection_id=connection.id)
 
         is_writable = g.user.can_cluster_admin(connection_id) or g.user.can_write(connection_id)
         return self.render_template(
             'redis_detail.html',
             connection=connection,
-            can_write=is_writable
+            can_write=is_writable,
+            streamable_commands=sorted(STREAMABLE_COMMANDS)
         )
 
     @expose('/<int:connection_id>/execute', methods=['POST'])
@@ -39,16 +54,301 @@ class RedisDetailView(CustomBaseView):
         command = request.json.get('command')
 
         try:
-            print(command)
-            result = command_router.route_command(connection.id, command, g.user, connection_id)
-            if isinstance(result, list):
-                result = [r.decode('utf-8') if isinstance(r, bytes) else r for r in result]
-            else:
-                result = result.decode('utf-8') if isinstance(result, bytes) else result
+            result = command_router.route_command(connection.id, command, raise_errors=True)
+            self.log_command(connection, command, "Authorized. Executed successfully")
+            return json_response(describe_reply(result))
+        except Exception as e:
+            err = str(e)
+            self.log_command(connection, command, f"Authorized. Failed to execute: {err}", succeeded=False)
+            return jsonify({'error': err}), 500
+
+    @expose('/<int:connection_id>/execute_stream', methods=['POST'])
+    @has_access
+    def execute_stream(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        command = request.json.get('command')
+        window = current_app.config.get('STREAM_WINDOW_SIZE', 1000)
+        try:
+            chunks = command_router.route_stream(connection.id, command, window=window)
+            if chunks is None:
+                # Not a cursor friendly form of the command, it is answered in one piece
+                chunks = iter([command_router.route_command(connection.id, command, raise_errors=True)])
+        except Exception as e:
+            err = str(e)
+            self.log_command(connection, command, f"Authorized. Failed to execute: {err}", succeeded=False)
+            return jsonify({'error': err}), 500
+        self.log_command(connection, command, "Authorized. Streaming started")
+
+        def generate():
+            count = 0
+            try:
+                for chunk in chunks:
+                    chunk = encode_reply(chunk)
+                    count += len(chunk) if isinstance(chunk, list) else 1
+                    yield dumps({'items': chunk if isinstance(chunk, list) else [chunk]}) + b'\n'
+                yield dumps({'done': True, 'count': count}) + b'\n'
+            except Exception as e:
+                yield dumps({'error': str(e)}) + b'\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @expose('/<int:connection_id>/execute_batch', methods=['POST'])
+    @has_access
+    def execute_batch(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+        # A batch can hold any command, so it needs the same write access as an import
+        if not (g.user.can_cluster_admin(connection_id) or g.user.can_write(connection_id)):
+            return jsonify({'error': 'Unauthorized to write to this connection'}), 403
+
+        script = request.json.get('script', '')
+        transaction = bool(request.json.get('transaction', False))
+
+        try:
+            results = command_router.route_batch(connection.id, script, transaction=transaction)
+        except Exception as e:
+            err = str(e)
+            self.log_command(connection, script, f"Authorized. Failed to execute batch: {err}", succeeded=False,
+                             verb='BATCH')
+            return jsonify({'error': err}), 500
+
+        failed = sum(1 for r in results if 'error' in r)
+        self.log_command(connection, script, f"Authorized. Executed batch of {len(results)} commands, {failed} failed",
+                         succeeded=not failed, verb='BATCH')
+        return json_response({'results': encode_reply(results)})
+
+    @expose('/<int:connection_id>/keys', methods=['GET'])
+    @has_access
+    def browse_keys(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        cursor = request.args.get('cursor', '0')
+        match = request.args.get('match') or '*'
+        count = request.args.get('count', current_app.config.get('KEY_SCAN_COUNT', 500), type=int)
+        key_type = request.args.get('type') or None
+
+        try:
+            cursor, keys = redis_manager.scan_keys(connection.id, cursor=cursor, match=match, count=count,
+                                                   _type=key_type)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+        keys = [k.decode('utf-8', errors='replace') if isinstance(k, bytes) else k for k in keys]
+        return jsonify({'cursor': cursor, 'keys': keys})
+
+    @expose('/<int:connection_id>/key', methods=['GET'])
+    @has_access
+    def inspect_key(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
 
-            self.save_activity_log(connection.execute_activity(command, "Authorized. Executed successfully"))
-            return jsonify({'result': result})
+        key = request.args.get('key')
+        if not key:
+            return jsonify({'error': 'Key is required'}), 400
+        count = request.args.get('count', current_app.config.get('VALUE_PAGE_SIZE', 100), type=int)
+
+        try:
+            result = redis_manager.inspect_key(connection.id, key, count=count)
         except Exception as e:
             err = str(e)
-            self.save_activity_log(connection.execute_activity(command, f"Authorized. Failed to execute: {err}"))
+            self.log_command(connection, f"INSPECT {key}", f"Authorized. Failed to execute: {err}", succeeded=False)
             return jsonify({'error': err}), 500
+
+        self.log_command(connection, f"INSPECT {key}", "Authorized. Executed successfully")
+        return json_response(encode_reply(result))
+
+    @expose('/<int:connection_id>/key/page', methods=['GET'])
+    @has_access
+    def load_value_page(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        key = request.args.get('key')
+        key_type = request.args.get('type')
+        if not key or not key_type:
+            return jsonify({'error': 'Key and type are required'}), 400
+        cursor = request.args.get('cursor', '0')
+        count = request.args.get('count', current_app.config.get('VALUE_PAGE_SIZE', 100), type=int)
+
+        try:
+            cursor, value = redis_manager.get_value_page(connection.id, key, key_type, cursor=cursor, count=count)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+        return json_response({'key': key, 'type': key_type, 'cursor': encode_reply(cursor), 'value': encode_reply(value)})
+
+    @expose('/<int:connection_id>/key/range', methods=['GET'])
+    @has_access
+    def read_string_range(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        key = request.args.get('key')
+        if not key:
+            return jsonify({'error': 'Key is required'}), 400
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        length = request.args.get('length', type=int)
+
+        try:
+            total, next_offset, value = redis_manager.get_string_range(connection.id, key, offset=offset,
+                                                                       length=length)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+        return json_response({'key': key, 'offset': offset, 'length': total, 'cursor': next_offset,
+                              'value': encode_reply(value)})
+
+    @expose('/<int:connection_id>/metrics', methods=['GET'])
+    @has_access
+    def metrics_history(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        history = metrics_poller.get_history(connection.id)
+        if history is None:
+            return jsonify({'error': 'No metrics collected yet'}), 404
+        history['interval'] = metrics_poller.interval
+        return jsonify(history)
+
+    @expose('/<int:connection_id>/export', methods=['GET'])
+    @has_access
+    def export_keyspace(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        match = request.args.get('match') or '*'
+        count = request.args.get('count', current_app.config.get('KEY_SCAN_COUNT', 500), type=int)
+        self.log_command(connection, f"EXPORT {match}", "Authorized. Export started")
+
+        return Response(stream_with_context(export_keys(redis_manager, connection.id, match=match, count=count)),
+                        mimetype='application/x-ndjson',
+                        headers={'Content-Disposition': f'attachment; filename={connection.name}-export.jsonl'})
+
+    @expose('/<int:connection_id>/import', methods=['POST'])
+    @has_access
+    def import_keyspace(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+        if not (g.user.can_cluster_admin(connection_id) or g.user.can_write(connection_id)):
+            return jsonify({'error': 'Unauthorized to write to this connection'}), 403
+
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'error': 'File is required'}), 400
+        try:
+            read_trailer(upload.stream)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        batch_size = request.form.get('batch_size', current_app.config.get('TRANSFER_BATCH_SIZE', 500), type=int)
+        replace = request.form.get('replace', 'true').lower() == 'true'
+
+        def generate():
+            progress = {}
+            for progress in import_keys(redis_manager, connection.id, upload.stream, batch_size=batch_size,
+                                        replace=replace):
+                yield json.dumps(progress) + '\n'
+            self.log_command(connection, f"IMPORT {upload.filename}",
+                             f"Authorized. Imported {progress.get('imported', 0)} keys, "
+                             f"{progress.get('failed', 0)} failed",
+                             succeeded=not progress.get('failed'), verb='IMPORT')
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @expose('/<int:connection_id>/analyze', methods=['GET'])
+    @has_access
+    def analyze_keyspace(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        config = current_app.config
+        analyzer = KeyspaceAnalyzer(
+            redis_manager, connection.id,
+            match=request.args.get('match') or '*',
+            top_n=request.args.get('top', config.get('ANALYZER_TOP_N', 50), type=int),
+            delimiters=request.args.get('delimiters', config.get('ANALYZER_DELIMITERS', ':')),
+            prefix_depth=request.args.get('depth', 1, type=int),
+            batch_size=config.get('KEY_SCAN_COUNT', 500),
+            max_keys_per_sec=config.get('ANALYZER_MAX_KEYS_PER_SEC', 5000),
+        )
+        self.log_command(connection, f"ANALYZE {analyzer.match}", "Authorized. Analysis started")
+
+        def generate():
+            try:
+                for snapshot in analyzer.run():
+                    yield json.dumps(snapshot) + '\n'
+            except Exception as e:
+                yield json.dumps({'error': str(e)}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @expose('/<int:connection_id>/slowlog', methods=['GET'])
+    @has_access
+    def slowlog(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        if request.args.get('reset', 'false').lower() == 'true':
+            slowlog_aggregator.reset(connection.id)
+        top_n = request.args.get('top', current_app.config.get('SLOWLOG_TOP_N', 50), type=int)
+        try:
+            report = slowlog_aggregator.refresh(redis_manager, connection.id, top_n=top_n)
+        except Exception as e:
+            self.log_command(connection, 'SLOWLOG GET', f"Authorized. Failed to read slowlog: {e}",
+                             succeeded=False, verb='SLOWLOG')
+            return jsonify({'error': str(e)}), 500
+        self.log_command(connection, 'SLOWLOG GET', "Authorized. Slowlog read from "
+                                                    f"{len(report['nodes'])} nodes", verb='SLOWLOG')
+        return json_response(report)
+
+    @expose('/<int:connection_id>/subscribe', methods=['GET'])
+    @has_access
+    def subscribe(self, connection_id):
+        connection = self.appbuilder.session.query(RedisConnection).get(connection_id)
+        if not connection:
+            return jsonify({'error': 'Connection not found'}), 404
+
+        channels = [channel for channel in request.args.getlist('channel') if channel]
+        patterns = [pattern for pattern in request.args.getlist('pattern') if pattern]
+        patterns += [keyspace_pattern(key) for key in request.args.getlist('keyspace') if key]
+        if len(channels) + len(patterns) > current_app.config.get('PUBSUB_MAX_CHANNELS', 20):
+            return jsonify({'error': 'Too many channels'}), 400
+        try:
+            subscriber = pubsub_hub.subscribe(redis_manager, connection.id, channels=channels, patterns=patterns,
+                                              policy=request.args.get('policy'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 503
+        self.log_command(connection, ' '.join(['SUBSCRIBE', *channels, *patterns]), "Authorized. Subscribed",
+                         verb='SUBSCRIBE')
+        keepalive = current_app.config.get('PUBSUB_KEEPALIVE', 15)
+
+        def generate():
+            # A comment line every keepalive seconds is how a closed browser tab is noticed
+            try:
+                yield b'retry: 3000\n\n'
+                while True:
+                    messages, dropped = subscriber.get(timeout=keepalive)
+                    chunk = [b'data: ' + message + b'\n\n' for message in messages]
+                    if dropped:
+                        chunk.append(b'event: dropped\ndata: ' + dumps({'count': dropped}) + b'\n\n')
+                    yield b''.join(chunk) or b': keepalive\n\n'
+            finally:
+                pubsub_hub.unsubscribe(subscriber)
+
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -10,6 +10,119 @@ APP_THEME = "yeti.css"
 SQLALCHEMY_DATABASE_URI = 'sqlite:///app.db'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Number of keys requested per SCAN call by the key browser
+KEY_SCAN_COUNT = 500
+# Number of elements loaded per page when inspecting hashes, sets, lists, ...
+VALUE_PAGE_SIZE = 100
+# Bytes of a string value read per window, big strings are previewed and paged with GETRANGE
+STRING_WINDOW_BYTES = 65536
+# Keys restored per pipeline when importing an export file
+TRANSFER_BATCH_SIZE = 500
+# Memory analyzer: number of biggest keys and prefixes reported
+ANALYZER_TOP_N = 50
+# Characters that end a key prefix, "user:1:profile" is grouped under "user:"
+ANALYZER_DELIMITERS = ':'
+# Upper bound on keys SCAN examines per second, matching or not, so an analysis is safe on a production master
+ANALYZER_MAX_KEYS_PER_SEC = 5000
+# Elements read per window when the console streams LRANGE, SMEMBERS, HGETALL, KEYS and similar replies
+STREAM_WINDOW_SIZE = 1000
+
+# Seconds the connection list waits for INFO before showing a host as timed out
+REDIS_INFO_TIMEOUT = 2
+
+# Seconds a user's resolved connection permissions are cached. Changes made in this process
+# invalidate the cache right away, other worker processes pick them up after this long.
+PERMISSION_CACHE_TTL = 60
+
+# Run INFO for the connection list and cluster-wide SCAN on an asyncio event loop thread
+REDIS_ASYNC_FANOUT = True
+# Upper bound on Redis commands the asyncio fan-out keeps in flight at once
+REDIS_ASYNC_MAX_CONCURRENCY = 32
+
+# Redis client registry, clients are kept per connection and evicted least recently used first
+REDIS_MAX_CLIENTS = 64
+# Seconds a client may stay unused before it is closed
+REDIS_CLIENT_IDLE_TIMEOUT = 600
+# Clients kept for INFO (connection list, metrics poller), separate from the ones above
+REDIS_INFO_MAX_CLIENTS = 1024
+# Connection pool settings applied to every connection's pool
+REDIS_POOL_MAX_CONNECTIONS = 20
+REDIS_SOCKET_TIMEOUT = 5
+REDIS_SOCKET_CONNECT_TIMEOUT = 3
+REDIS_HEALTH_CHECK_INTERVAL = 30
+# Serve read-only commands from replicas (slave_hosts or Sentinel replicas), writes always go to the master
+REDIS_READ_FROM_REPLICAS = True
+# Replicas that have not heard from their master for longer than this many seconds are skipped
+REDIS_REPLICA_MAX_LAG = 10
+# Seconds a replica health check result is reused
+REDIS_REPLICA_CHECK_INTERVAL = 5
+
+# Activity records are queued and written in bulk by a background thread
+ACTIVITY_ASYNC = True
+# A batch is written once this many records are queued ...
+ACTIVITY_BATCH_SIZE = 100
+# ... or this many seconds after the first one was queued
+ACTIVITY_FLUSH_INTERVAL = 1.0
+# A batch the database refused with a transient error (locked SQLite file, dropped connection) is
+# retried this many times, waiting ACTIVITY_RETRY_BACKOFF seconds first and twice as long each time
+ACTIVITY_WRITE_RETRIES = 3
+ACTIVITY_RETRY_BACKOFF = 0.1
+# Days activities stay in the activity table, "flask activity archive" moves older ones to activity_archive
+ACTIVITY_RETENTION_DAYS = 90
+# Rows per page in the activity feed
+ACTIVITY_PAGE_SIZE = 50
+
+# Background INFO sampling for every connection
+METRICS_POLL_ENABLED = True
+# Seconds between two samples
+METRICS_POLL_INTERVAL = 10
+# Samples kept per connection, 360 samples at 10 seconds is one hour of history
+METRICS_HISTORY_SIZE = 360
+# Seconds a poll waits for INFO before a host is recorded as timed out
+METRICS_POLL_TIMEOUT = 5
+
+# SLOWLOG entries requested from a node in the first page, pages double until they reach entries already read ...
+SLOWLOG_PAGE_SIZE = 32
+# ... up to this many per node and refresh
+SLOWLOG_MAX_ENTRIES = 1024
+# Fingerprints tracked per connection, later ones are counted as <other>
+SLOWLOG_MAX_FINGERPRINTS = 1000
+# Fingerprints shown in the slowlog view, slowest total first
+SLOWLOG_TOP_N = 50
+
+# Messages buffered per Pub/Sub viewer before its policy kicks in: drop_oldest, drop_newest or sample
+PUBSUB_BUFFER_SIZE = 1000
+PUBSUB_BUFFER_POLICY = 'drop_oldest'
+# With the sample policy a full buffer keeps one message in this many
+PUBSUB_SAMPLE_EVERY = 10
+# Viewers per process, each one holds a worker thread for as long as it watches. When unset gunicorn.conf.py
+# keeps PUBSUB_RESERVED_THREADS of every gthread worker for other requests, gevent workers allow 100
+PUBSUB_MAX_SUBSCRIBERS = None
+PUBSUB_RESERVED_THREADS = 4
+# Channels and patterns one viewer may watch at once
+PUBSUB_MAX_CHANNELS = 20
+# Seconds between keepalive comments on an idle stream
+PUBSUB_KEEPALIVE = 15
+
+# Prometheus metrics on /metrics, scrapers send METRICS_ENDPOINT_TOKEN as a bearer token. The endpoint answers 404 until a token is set
+METRICS_ENDPOINT_ENABLED = True
+METRICS_ENDPOINT_TOKEN = None
+# Workers write their metrics here every METRICS_FLUSH_INTERVAL seconds so a scrape adds up all of them.
+# gunicorn.conf.py creates a fresh directory per master when neither this nor the environment variable is set
+METRICS_MULTIPROCESS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
+# gunicorn settings used by gunicorn.conf.py, each can be overridden by the environment variable of the same name
+WSGI_BIND = '0.0.0.0:8080'
+WSGI_WORKERS = 2
+# Threads per worker, requests waiting on Redis do not block the other threads of the worker
+WSGI_THREADS = 8
+# gthread by default, gevent works too when it is installed and suits many Pub/Sub viewers
+WSGI_WORKER_CLASS = 'gthread'
+WSGI_TIMEOUT = 60
+# Import the app once in the master, workers reset their Redis clients and database engine after the fork
+WSGI_PRELOAD = True
+
 # Google OAuth 2.0 configuration (if needed)
 # GOOGLE_CLIENT_ID = "your-google-client-id"
 # GOOGLE_CLIENT_SECRET = "your-google-client-secret"
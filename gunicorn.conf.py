@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+from werkzeug.utils import import_string
+
+# Defaults come from the WSGI_* settings of the config module, the environment overrides them
+_config = import_string(os.getenv('FLASK_CONFIG', 'config'))
+
+
+def _setting(name, default, cast=str):
+    value = os.getenv(name)
+    if value is None:
+        return getattr(_config, name, default)
+    if cast is bool:
+        return value.lower() in ('1', 'true', 'yes')
+    return cast(value)
+
+
+bind = _setting('WSGI_BIND', '0.0.0.0:8080')
+workers = _setting('WSGI_WORKERS', 2, int)
+threads = _setting('WSGI_THREADS', 8, int)
+worker_class = _setting('WSGI_WORKER_CLASS', 'gthread')
+timeout = _setting('WSGI_TIMEOUT', 60, int)
+preload_app = _setting('WSGI_PRELOAD', True, bool)
+
+# A Pub/Sub stream holds a gthread thread until the viewer leaves, keep some threads for everything else
+pubsub_max_subscribers = _setting('PUBSUB_MAX_SUBSCRIBERS', None)
+if pubsub_max_subscribers is None:
+    if worker_class == 'gthread':
+        pubsub_max_subscribers = max(threads - _setting('PUBSUB_RESERVED_THREADS', 4, int), 0)
+    else:
+        pubsub_max_subscribers = 100
+os.environ['PUBSUB_MAX_SUBSCRIBERS'] = str(pubsub_max_subscribers)
+
+# Every worker keeps its own metrics registry, they meet in this directory so a scrape covers all of them
+metrics_dir = _setting('METRICS_MULTIPROCESS_DIR', None) or tempfile.mkdtemp(prefix='pymyredis-metrics-')
+os.environ['METRICS_MULTIPROCESS_DIR'] = metrics_dir
+
+
+def on_starting(server):
+    # Totals start over with the master, files left by a previous run would be counted again
+    for name in os.listdir(metrics_dir):
+        if name.endswith('.json'):
+            os.remove(os.path.join(metrics_dir, name))
+
+
+def pre_fork(server, worker):
+    # Threads do not survive a fork, stop them in the master so no lock is inherited while held
+    from app import stop_background_workers
+    stop_background_workers()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    from app import reset_after_fork
+    reset_after_fork(server.app.wsgi())
+
+
+def worker_exit(server, worker):
+    # What the worker counted since its last flush is kept for the scrapes after it is gone
+    from app.metrics import multiprocess_store
+    multiprocess_store.flush()
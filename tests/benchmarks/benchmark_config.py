@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# Config module for the HTTP benchmark, selected with FLASK_CONFIG by tests/benchmarks/conftest.py
+CSRF_ENABLED = True
+WTF_CSRF_ENABLED = False
+SECRET_KEY = "benchmark-secret-key"
+APP_NAME = "PyMyRedis"
+SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='pymyredis-benchmark-'), 'app.db')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Requests are measured with the activity writer running, as in production
+ACTIVITY_ASYNC = True
+# The poller would compete with the measured requests for the same client
+METRICS_POLL_ENABLED = False
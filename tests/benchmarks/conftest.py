@@ -0,0 +1,135 @@
+import json
+import math
+import os
+import platform
+import time
+from typing import Any, Callable, Dict
+
+import pytest
+
+# Benchmarks are slow and machine dependent, they only run when asked for:
+#   BENCHMARK=1 python -m pytest tests/benchmarks -s
+# REDIS_BENCHMARK_URL=redis://localhost:6379/15 runs them against a local redis-server instead of
+# fakeredis, BENCHMARK_SAVE=1 stores the results as the new baseline and BENCHMARK_TOLERANCE sets
+# how much slower than the baseline a benchmark may be before it fails (default 1.5, i.e. 50%).
+if not os.getenv('BENCHMARK'):
+    collect_ignore_glob = ['test_*.py']
+
+BASELINE_PATH = os.getenv('BENCHMARK_BASELINE', os.path.join(os.path.dirname(__file__), 'baseline.json'))
+TOLERANCE = float(os.getenv('BENCHMARK_TOLERANCE', '1.5'))
+
+_results = {}
+
+
+def backend_name() -> str:
+    return 'redis-server' if os.getenv('REDIS_BENCHMARK_URL') else 'fakeredis'
+
+
+def percentile(timings, fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Benchmark:
+    """Times a callable and checks its median against the stored baseline."""
+
+    def __init__(self, baseline: Dict[str, Any]):
+        self.baseline = baseline
+
+    def __call__(self, name: str, func: Callable[[], Any], iterations: int = 1000, warmup: int = 10,
+                 per_call: int = 1, rounds: int = 1) -> Dict[str, float]:
+        # per_call is the number of operations one call performs, e.g. the commands in a pipeline.
+        # Calls of a few microseconds are timed rounds at a time, one call alone is below the timer's noise.
+        for _ in range(warmup * rounds):
+            func()
+        timings = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                func()
+            timings.append((time.perf_counter() - start) / rounds)
+        elapsed = time.perf_counter() - started
+        result = {
+            'iterations': iterations * rounds,
+            'ops_per_sec': round(iterations * rounds * per_call / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 4),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 4),
+        }
+        _results[name] = result
+        self.check(name, result)
+        return result
+
+    def check(self, name: str, result: Dict[str, float]):
+        expected = self.baseline.get(name)
+        if expected is None or os.getenv('BENCHMARK_SAVE'):
+            return
+        # Only the median fails the run, p99 moves with whatever else the machine is doing and is
+        # reported in the summary and the baseline for review instead
+        limit = expected['p50_ms'] * TOLERANCE
+        assert result['p50_ms'] <= limit, (
+            f"{name}: p50 regressed to {result['p50_ms']} ms, baseline {expected['p50_ms']} ms "
+            f"(tolerance {TOLERANCE}x)")
+
+
+@pytest.fixture(scope='session')
+def baseline() -> Dict[str, Any]:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f).get(backend_name(), {}).get('results', {})
+
+
+@pytest.fixture
+def benchmark(baseline) -> Benchmark:
+    return Benchmark(baseline)
+
+
+@pytest.fixture(scope='session')
+def redis_client():
+    url = os.getenv('REDIS_BENCHMARK_URL')
+    if url:
+        import redis
+        client = redis.Redis.from_url(url)
+    else:
+        fakeredis = pytest.importorskip('fakeredis')
+        client = fakeredis.FakeRedis()
+    client.flushdb()
+    yield client
+    client.flushdb()
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section(f'benchmarks ({backend_name()})')
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f).get(backend_name(), {}).get('results', {})
+    terminalreporter.write_line(f"{'name':<32} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'p50 vs baseline':>16}")
+    for name, result in sorted(_results.items()):
+        expected = baseline.get(name)
+        change = f"{result['p50_ms'] / expected['p50_ms'] - 1:+.0%}" if expected and expected['p50_ms'] else '-'
+        terminalreporter.write_line(f"{name:<32} {result['ops_per_sec']:>10} {result['p50_ms']:>10} "
+                                    f"{result['p99_ms']:>10} {change:>16}")
+    if os.getenv('BENCHMARK_SAVE'):
+        save_baseline()
+        terminalreporter.write_line(f'Baseline written to {BASELINE_PATH}')
+
+
+def save_baseline():
+    stored = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            stored = json.load(f)
+    # Benchmarks that did not run this time keep their previous baseline
+    results = stored.get(backend_name(), {}).get('results', {})
+    results.update(_results)
+    stored[backend_name()] = {
+        'machine': f'{platform.python_implementation()} {platform.python_version()} on {platform.machine()}',
+        'results': results,
+    }
+    with open(BASELINE_PATH, 'w') as f:
+        json.dump(stored, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,65 @@
+import pytest
+from app.enums import RedisDeploymentType
+
+
+@pytest.fixture(scope='module')
+def app(redis_client):
+    from app import create_app
+    # Only create_app reads FLASK_CONFIG, the rest of the session keeps its own
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('FLASK_CONFIG', 'tests.benchmarks.benchmark_config')
+        app = create_app()
+    yield app
+
+    from app import stop_background_workers
+    stop_background_workers()
+
+
+@pytest.fixture(scope='module')
+def connection_id(app, redis_client):
+    from app import appbuilder, db
+    from app.models import RedisConnection
+    from app.redis_manager import redis_manager
+
+    with app.app_context():
+        sm = appbuilder.sm
+        admin = sm.add_user('admin', 'Bench', 'Mark', 'admin@example.com', sm.find_role(sm.auth_role_admin),
+                            'password')
+        connection = RedisConnection(name='benchmark', deployment_type=RedisDeploymentType.STANDALONE,
+                                     host='localhost', port=6379, db=0,
+                                     created_by_fk=admin.id, changed_by_fk=admin.id)
+        db.session.add(connection)
+        db.session.commit()
+        connection_id = connection.id
+
+    # Requests reach the benchmark server through the registry instead of the connection's host
+    redis_manager.read_from_replicas = False
+    redis_manager.connections.get_or_create(connection_id, lambda: redis_client)
+    redis_client.set('user:1', 'Jane Doe')
+    return connection_id
+
+
+@pytest.fixture
+def client(app, connection_id):
+    client = app.test_client()
+    client.post('/login/', data={'username': 'admin', 'password': 'password'})
+    return client
+
+
+def test_execute_command_requests(benchmark, app, client, connection_id):
+    from app import db
+    from app.activity_writer import activity_writer
+    from app.models import Activity
+    url = f'/redisdetailview/{connection_id}/execute'
+
+    def execute():
+        response = client.post(url, json={'command': 'GET user:1'})
+        assert response.status_code == 200
+
+    benchmark('HTTP execute GET', execute, iterations=1000)
+
+    # Every request was logged, the writer flushes what is still queued when it stops
+    activity_writer.stop()
+    with app.app_context():
+        assert db.session.query(Activity).filter(Activity.command == 'GET').count() >= 1000
+    activity_writer.start(app)
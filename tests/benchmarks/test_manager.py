@@ -0,0 +1,31 @@
+import pytest
+from app.redis_manager import RedisManager
+
+COMMANDS = [['SET', f'key:{i}', f'value {i}'] for i in range(100)]
+
+
+@pytest.fixture
+def manager(redis_client):
+    manager = RedisManager()
+    manager.read_from_replicas = False
+    manager.connections.get_or_create(1, lambda: redis_client)
+    return manager
+
+
+def test_commands_one_by_one(benchmark, manager):
+    def run():
+        for parts in COMMANDS:
+            manager.execute_command(1, *parts)
+
+    benchmark('100 SET one by one', run, iterations=100, per_call=len(COMMANDS))
+
+
+def test_commands_pipelined(benchmark, manager):
+    benchmark('100 SET pipelined', lambda: manager.execute_pipeline(1, COMMANDS), iterations=100,
+              per_call=len(COMMANDS))
+
+
+def test_inspect_key(benchmark, manager, redis_client):
+    redis_client.hset('hash', mapping={f'field{i}': i for i in range(1000)})
+
+    benchmark('inspect_key hash', lambda: manager.inspect_key(1, 'hash', count=100), iterations=1000)
@@ -0,0 +1,40 @@
+import json
+import pytest
+from unittest.mock import Mock
+from app.command_parser import split_command
+from app.redis_manager import RedisCommandRouter
+
+router = RedisCommandRouter(Mock())
+
+
+def test_parse_small_command(benchmark):
+    benchmark('parse small command', lambda: router._parse_command('SET user:1 "Jane Doe" EX 60'),
+              iterations=500, rounds=100)
+
+
+def test_parse_multi_megabyte_json(benchmark):
+    document = json.dumps({f'field{i}': {'name': f'value {i}', 'tags': ['a b', 'c']} for i in range(50000)})
+    command = f"JSON.SET doc $ {document}"
+    assert len(command) > 2 * 1024 * 1024
+
+    benchmark('parse 2MB+ JSON argument', lambda: router._parse_command(command), iterations=20, warmup=2)
+
+
+def test_parse_multi_megabyte_quoted_value(benchmark):
+    line = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.\\n'
+    command = 'SET text "' + line * (3 * 1024 * 1024 // len(line)) + '"'
+
+    benchmark('parse 3MB quoted text', lambda: router._parse_command(command), iterations=20, warmup=2)
+
+
+@pytest.mark.parametrize('build', [
+    lambda: '"' + 'x' * 5_000_000 + '"',
+    lambda: json.dumps({f'key{i}': {'name': 'x' * 40, 'tags': [1, 2, 3]} for i in range(50_000)}),
+], ids=['quoted-5mb', 'json-5mb'])
+def test_parse_large_payload(benchmark, request, build):
+    payload = build()
+    command = f'SET bigkey {payload} EX 60'
+    parts = split_command(command)
+    assert len(parts) == 5 and len(parts[2]) >= len(payload) - 2
+
+    benchmark(f'split_command {request.node.callspec.id}', lambda: split_command(command), iterations=10, warmup=1)
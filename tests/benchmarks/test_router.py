@@ -0,0 +1,28 @@
+import pytest
+from app.redis_manager import RedisManager, RedisCommandRouter
+
+
+@pytest.fixture
+def manager(redis_client):
+    manager = RedisManager()
+    manager.read_from_replicas = False
+    manager.connections.get_or_create(1, lambda: redis_client)
+    redis_client.set('user:1', 'Jane Doe')
+    return manager
+
+
+def test_direct_client_get(benchmark, redis_client):
+    # What route_command costs on top of this is the router's dispatch overhead
+    benchmark('client GET (no router)', lambda: redis_client.get('user:1'), iterations=500, rounds=10)
+
+
+def test_route_mapped_command(benchmark, manager):
+    router = RedisCommandRouter(manager)
+
+    benchmark('route_command GET', lambda: router.route_command(1, 'GET user:1'), iterations=500, rounds=10)
+
+
+def test_route_generic_command(benchmark, manager):
+    router = RedisCommandRouter(manager)
+
+    benchmark('route_command STRLEN', lambda: router.route_command(1, 'STRLEN user:1'), iterations=500, rounds=10)
@@ -0,0 +1,14 @@
+import json
+from app.serializers import dumps, encode_reply
+
+
+def test_encode_large_nested_reply(benchmark):
+    flat = [b'member:%d' % i for i in range(500_000)]
+    hashed = {b'field:%d' % i: b'x' * 20 for i in range(100_000)}
+    stream = [[b'%d-0' % i, [b'f', b'v', b'g', b'w']] for i in range(100_000)]
+
+    def encode():
+        return dumps({'flat': encode_reply(flat), 'hash': encode_reply(hashed), 'stream': encode_reply(stream)})
+
+    assert len(json.loads(encode())['flat']) == 500_000
+    benchmark('encode 700k element reply', encode, iterations=10, warmup=1)
@@ -0,0 +1,65 @@
+import pytest
+from datetime import datetime, timedelta
+from flask_appbuilder import Model
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import activity_storage
+from app.activity_storage import upgrade_activity_schema, activity_page, archive_activities
+from app.enums import ActivityOutcome
+from app.models import Activity, ActivityArchive
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Model.metadata.create_all(engine)
+    upgrade_activity_schema(engine)
+    session = sessionmaker(bind=engine)()
+    now = datetime.now()
+    for i in range(5):
+        session.add(Activity(message=f'Following command: GET key{i} has been executed', command='GET',
+                             connection_id=i % 2, outcome=ActivityOutcome.SUCCESS,
+                             created_on=now - timedelta(days=i * 50), changed_on=now,
+                             created_by_fk=1, changed_by_fk=1))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_upgrade_creates_the_archive_table_on_an_existing_database():
+    engine = create_engine('sqlite://')
+    Activity.__table__.create(engine)
+    upgrade_activity_schema(engine)
+    session = sessionmaker(bind=engine)()
+
+    assert archive_activities(session, datetime.now()) == 0
+    assert session.query(ActivityArchive).count() == 0
+
+
+def test_keyset_pages_walk_newest_first(session):
+    first, before = activity_page(session, limit=2)
+    second, before = activity_page(session, before_id=before, limit=2)
+    last, before = activity_page(session, before_id=before, limit=2)
+
+    assert [a.id for a in first + second + last] == [5, 4, 3, 2, 1]
+    assert before is None
+
+
+def test_structured_filters_and_message_search(session):
+    assert activity_storage.search_backend == 'fts5'
+    rows, _ = activity_page(session, connection_id=1)
+    assert {a.id for a in rows} == {2, 4}
+    rows, _ = activity_page(session, search='key3')
+    assert [a.id for a in rows] == [4]
+    rows, _ = activity_page(session, search='"unbalanced AND')
+    assert rows == []
+
+
+def test_archive_moves_old_rows(session):
+    archived = archive_activities(session, datetime.now() - timedelta(days=75), batch_size=1)
+
+    assert archived == 3
+    assert session.query(Activity).count() == 2
+    assert sorted(a.id for a in session.query(ActivityArchive)) == [3, 4, 5]
+    rows, _ = activity_page(session, search='key4')
+    assert rows == []
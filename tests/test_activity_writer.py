@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock, Mock, patch
+from sqlalchemy.exc import OperationalError
+import app
+from app.activity_writer import ActivityWriter
+
+
+def _writer(**kwargs):
+    writer = ActivityWriter(**kwargs)
+    writer._insert = Mock()
+    app = MagicMock()
+    app.config = {}
+    return writer, app
+
+
+def test_records_are_written_in_batches_and_drained_on_stop():
+    writer, app = _writer(batch_size=2, flush_interval=0.05)
+    with patch('app.activity_writer.Activity.get_user_id', return_value=7):
+        writer.start(app)
+        for i in range(5):
+            writer.write(f'message {i}')
+        writer.stop()
+
+    written = [record for call in writer._insert.call_args_list for record in call.args[0]]
+    assert [record['message'] for record in written] == [f'message {i}' for i in range(5)]
+    assert all(len(call.args[0]) <= 2 for call in writer._insert.call_args_list)
+    assert written[0]['created_by_fk'] == 7
+    assert writer.depth == 0
+
+
+def test_writes_synchronously_when_not_started():
+    writer, _ = _writer()
+    with patch('app.activity_writer.Activity.get_user_id', return_value=1):
+        writer.write('listed')
+    writer._insert.assert_called_once()
+    assert writer.depth == 0
+
+
+def test_full_queue_falls_back_to_a_synchronous_insert():
+    writer, _ = _writer(max_queue_size=1)
+    writer._thread = Mock(**{'is_alive.return_value': True})
+    with patch('app.activity_writer.Activity.get_user_id', return_value=1):
+        writer.write('queued')
+        writer.write('overflow')
+
+    assert writer.depth == 1
+    assert [call.args[0][0]['message'] for call in writer._insert.call_args_list] == ['overflow']
+    assert writer.overflowed == 1
+
+
+def test_transient_errors_are_retried():
+    writer = ActivityWriter(retries=2, retry_backoff=0)
+    db = MagicMock()
+    locked = OperationalError('INSERT', {}, Exception('database is locked'))
+    db.engine.begin.return_value.__enter__.side_effect = [locked, locked, MagicMock()]
+    with patch.object(app, 'db', db):
+        writer._insert([{'message': 'kept'}])
+    assert (writer.written, writer.failed) == (1, 0)
+
+    db.engine.begin.return_value.__enter__.side_effect = [locked] * 3
+    with patch.object(app, 'db', db):
+        writer._insert([{'message': 'lost'}])
+    assert (writer.written, writer.failed) == (1, 1)
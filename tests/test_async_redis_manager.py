@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+import redis.asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster
+from app.async_redis_manager import AsyncRedisManager, _close_idle
+from app.client_registry import ClientRegistry
+
+
+@pytest.fixture
+def manager():
+    manager = AsyncRedisManager(max_concurrency=2)
+    yield manager
+    manager.reset()
+
+
+def test_fan_out_is_bounded_and_slow_hosts_time_out(manager):
+    running = {'now': 0, 'max': 0}
+
+    async def get_redis_info(connection):
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        await asyncio.sleep(1 if connection.id == 3 else 0.05)
+        running['now'] -= 1
+        return {'status': 'Connected'}
+
+    connections = [SimpleNamespace(id=i) for i in range(1, 6)]
+    with patch.object(manager, 'get_redis_info', side_effect=get_redis_info):
+        infos = manager.run(manager.get_redis_info_many(connections, timeout=0.5))
+
+    assert running['max'] == 2
+    assert infos[3]['status'] == 'Timed out'
+    assert [infos[i]['status'] for i in (1, 2, 4, 5)] == ['Connected'] * 4
+
+
+def test_deadline_includes_the_wait_for_a_slot(manager):
+    async def get_redis_info(connection):
+        await asyncio.sleep(0.3)
+        return {'status': 'Connected'}
+
+    connections = [SimpleNamespace(id=i) for i in range(1, 7)]
+    with patch.object(manager, 'get_redis_info', side_effect=get_redis_info):
+        infos = manager.run(manager.get_redis_info_many(connections, timeout=0.5), timeout=0.9)
+
+    assert [infos[i]['status'] for i in range(1, 7)] == ['Connected'] * 2 + ['Timed out'] * 4
+
+
+def test_cluster_close_leaves_busy_connections_alone():
+    busy, idle = Mock(disconnect=AsyncMock()), Mock(disconnect=AsyncMock())
+    node = SimpleNamespace(_connections=[busy, idle], _free=[idle])
+    cluster = Mock(spec=RedisCluster)
+    cluster.get_nodes.return_value = [node]
+
+    asyncio.run(_close_idle(cluster))
+
+    idle.disconnect.assert_awaited_once()
+    busy.disconnect.assert_not_called()
+    cluster.aclose.assert_not_called()
+
+
+def test_cluster_scan_runs_on_every_primary(manager):
+    nodes = {name: Mock(execute_command=AsyncMock(return_value=reply)) for name, reply in
+             [('a:7000', (5, [b'a1'])), ('b:7001', (0, [b'b1']))]}
+    for name, node in nodes.items():
+        node.name = name
+    cluster = Mock(spec=RedisCluster)
+    cluster.initialize = AsyncMock()
+    cluster.get_primaries.return_value = list(nodes.values())
+    cluster.get_node.side_effect = lambda node_name: nodes.get(node_name)
+
+    with patch.object(manager, 'get_connection', return_value=cluster):
+        cursor, keys = manager.run(manager.scan_keys(SimpleNamespace(id=1), match='*', count=10))
+        assert sorted(keys) == [b'a1', b'b1']
+        nodes['a:7000'].execute_command.assert_awaited_once_with('SCAN', 0, 'MATCH', '*', 'COUNT', 10)
+
+        nodes['a:7000'].execute_command.return_value = (0, [b'a2'])
+        cursor, keys = manager.run(manager.scan_keys(SimpleNamespace(id=1), cursor=cursor, count=10))
+        assert (cursor, keys) == ('0', [b'a2'])
+        assert nodes['b:7001'].execute_command.await_count == 1
+
+
+def test_async_clients_share_the_client_registry_bound(manager):
+    registry = ClientRegistry(max_clients=2)
+    manager.share_registries(registry, ClientRegistry())
+    clients = {i: Mock(spec=aioredis.Redis) for i in (1, 2)}
+    with patch.object(manager, '_create_client', side_effect=lambda connection: clients[connection.id]):
+        registry.get_or_create(1, Mock)
+        manager.get_connection(SimpleNamespace(id=1))
+        manager.get_connection(SimpleNamespace(id=2))
+
+    # The blocking client of connection 1 made room for the async ones
+    assert 1 not in registry and len(registry) == 2
+    assert registry.get(('async', 2)) is clients[2]
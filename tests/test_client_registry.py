@@ -0,0 +1,62 @@
+from unittest.mock import Mock
+import redis
+from app.client_registry import ClientRegistry, close_client
+
+
+def test_least_recently_used_client_is_evicted():
+    registry = ClientRegistry(max_clients=2)
+    first, second, third = Mock(), Mock(), Mock()
+    registry.get_or_create(1, lambda: first)
+    registry.get_or_create(2, lambda: second)
+    registry.get(1)
+    registry.get_or_create(3, lambda: third)
+
+    assert 1 in registry and 3 in registry
+    assert 2 not in registry
+    second.connection_pool.disconnect.assert_called_once_with(inuse_connections=False)
+
+
+def test_idle_clients_are_evicted():
+    registry = ClientRegistry(idle_timeout=0)
+    stale = Mock()
+    registry.get_or_create(1, lambda: stale)
+    registry.get_or_create(2, Mock)
+
+    assert 1 not in registry
+    stale.connection_pool.disconnect.assert_called_once_with(inuse_connections=False)
+
+
+def test_invalidate_closes_and_recreates_client():
+    registry = ClientRegistry()
+    old, new = Mock(), Mock()
+    registry.get_or_create(1, lambda: old)
+    registry.invalidate(1)
+
+    assert registry.get_or_create(1, lambda: new) is new
+    old.connection_pool.disconnect.assert_called_once_with(inuse_connections=False)
+
+
+def test_existing_client_wins_over_factory():
+    registry = ClientRegistry()
+    client = Mock()
+    registry.get_or_create(1, lambda: client)
+    factory = Mock()
+
+    assert registry.get_or_create(1, factory) is client
+    factory.assert_not_called()
+
+
+def test_close_client_leaves_connections_in_use_open():
+    pool = redis.BlockingConnectionPool(max_connections=2)
+    busy, idle = Mock(pid=pool.pid), Mock(pid=pool.pid)
+    # Both slots checked out, then idle handed back
+    pool.pool.get_nowait()
+    pool.pool.get_nowait()
+    pool._connections.extend([busy, idle])
+    pool.release(idle)
+
+    close_client(redis.Redis(connection_pool=pool))
+
+    busy.disconnect.assert_not_called()
+    idle.disconnect.assert_called_once_with()
+    assert list(pool.pool.queue) == [idle]
@@ -0,0 +1,35 @@
+import pytest
+from app.command_parser import split_command
+
+
+def test_plain_arguments():
+    assert split_command('  SET   mykey  value ') == ['SET', 'mykey', 'value']
+    assert split_command('') == []
+
+
+def test_double_quotes_and_escapes():
+    assert split_command(r'SET "my key" "line\nbreak \"quoted\" \x41\x42 back\\slash"') == \
+        ['SET', 'my key', b'line\nbreak "quoted" AB back\\slash']
+    assert split_command('SET k ""') == ['SET', 'k', '']
+
+
+def test_hex_escapes_are_raw_bytes():
+    assert split_command(r'SET k "\xff"') == ['SET', 'k', b'\xff']
+    assert split_command(r'SET k "caf\xc3\xa9 \xff"') == ['SET', 'k', b'caf\xc3\xa9 \xff']
+    assert split_command('SET k "caf\u00e9"') == ['SET', 'k', 'caf\u00e9']
+
+
+def test_single_quotes_only_escape_quote():
+    assert split_command(r"SET k 'it\'s a \n'") == ['SET', 'k', "it's a \\n"]
+
+
+def test_json_arguments_are_kept_verbatim():
+    value = '{"name": "a } b", "tags": [1, 2, {"x": "\\" ]"}]}'
+    assert split_command(f'JSON.SET k . {value} NX') == ['JSON.SET', 'k', '.', value, 'NX']
+    assert split_command('RPUSH k [1, 2] x') == ['RPUSH', 'k', '[1, 2]', 'x']
+
+
+@pytest.mark.parametrize('line', ['SET k "open', "SET k 'open", 'SET k "a"b'])
+def test_malformed_quotes(line):
+    with pytest.raises(ValueError):
+        split_command(line)
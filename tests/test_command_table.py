@@ -0,0 +1,114 @@
+import pytest
+import redis
+from unittest.mock import Mock, patch
+from redis.cluster import RedisCluster
+from app.command_table import CommandTable, check_same_slot
+from app.redis_manager import RedisManager, RedisCommandRouter
+
+
+def command(name, arity, flags, first, last, step, subcommands=None):
+    return {'name': name, 'arity': arity, 'flags': flags, 'first_key_pos': first, 'last_key_pos': last,
+            'step_count': step, 'subcommands': subcommands or []}
+
+
+COMMAND_REPLY = {
+    'get': command('get', 2, ['readonly', 'fast'], 1, 1, 1),
+    'mset': command('mset', -3, ['write', 'denyoom'], 1, -1, 2),
+    'del': command('del', -2, ['write'], 1, -1, 1),
+    'eval': command('eval', -3, ['noscript', 'movablekeys'], 0, 0, 0),
+    'object': command('object', -2, [], 0, 0, 0, [
+        [b'object|encoding', 3, [b'readonly'], 2, 2, 1, [], [], [], []],
+    ]),
+}
+
+
+@pytest.fixture
+def table():
+    return CommandTable.from_reply('7.2.4', COMMAND_REPLY)
+
+
+def test_arity_and_classification(table):
+    get = table.lookup(['GET', 'k'])
+    get.check_arity(['GET', 'k'])
+    with pytest.raises(ValueError, match="wrong number of arguments for 'get'"):
+        get.check_arity(['GET'])
+    table.lookup(['MSET']).check_arity(['MSET', 'a', '1', 'b', '2'])
+
+    assert get.read_only
+    assert not table.lookup(['mset']).read_only
+    assert table.lookup(['OBJECT', 'ENCODING', 'k']).read_only
+    assert table.lookup(['NOPE']) is None
+
+
+def test_key_extraction(table):
+    assert table.lookup(['MSET']).keys(['MSET', 'a', '1', 'b', '2']) == ['a', 'b']
+    assert table.lookup(['DEL']).keys(['DEL', 'a', 'b', 'c']) == ['a', 'b', 'c']
+    assert table.lookup(['OBJECT', 'ENCODING']).keys(['OBJECT', 'ENCODING', 'k']) == ['k']
+    assert table.lookup(['EVAL']).keys(['EVAL', 'return 1', '0']) is None
+
+
+def test_cross_slot_detection():
+    check_same_slot(['{user:1}:name', '{user:1}:email'])
+    with pytest.raises(ValueError, match='CROSSSLOT'):
+        check_same_slot(['a', 'b'])
+
+
+def test_manager_keeps_a_table_per_connection():
+    manager = RedisManager()
+    plain, with_json = Mock(), Mock()
+    for conn in (plain, with_json):
+        conn.info.return_value = {'redis_version': '7.2.4'}
+    plain.execute_command.return_value = COMMAND_REPLY
+    with_json.execute_command.return_value = dict(COMMAND_REPLY, **{
+        'json.set': command('json.set', -4, ['write', 'denyoom'], 1, 1, 1)})
+    connections = {1: plain, 2: with_json}
+    with patch.object(manager, 'get_connection', side_effect=connections.get):
+        assert manager.check_command(1, ['GET', 'k']).read_only
+        with pytest.raises(ValueError, match="unknown command 'JSON.SET'"):
+            manager.check_command(1, ['JSON.SET', 'doc', '$', '{}'])
+        assert not manager.check_command(2, ['JSON.SET', 'doc', '$', '{}']).read_only
+        manager.check_command(1, ['DEL', 'a', 'b'])
+
+        plain.execute_command.assert_called_once_with('COMMAND')
+        with_json.execute_command.assert_called_once_with('COMMAND')
+        assert plain.info.call_count == 1
+
+        manager.invalidate(1)
+        manager.check_command(1, ['GET', 'k'])
+    assert plain.execute_command.call_count == 2
+
+
+def test_manager_without_command_access_skips_validation():
+    manager = RedisManager()
+    conn = Mock()
+    conn.info.side_effect = redis.ResponseError('NOPERM')
+    conn.execute_command.side_effect = redis.ResponseError('NOPERM')
+    with patch.object(manager, 'get_connection', return_value=conn):
+        assert manager.check_command(1, ['FOO']) is None
+        assert manager.check_command(1, ['FOO']) is None
+    conn.execute_command.assert_called_once_with('COMMAND')
+
+
+def test_manager_rejects_cross_slot_commands_on_cluster():
+    manager = RedisManager()
+    conn = Mock(spec=RedisCluster)
+    conn.info.return_value = {'127.0.0.1:7000': {'redis_version': '7.2.4'}}
+    conn.execute_command.return_value = COMMAND_REPLY
+    with patch.object(manager, 'get_connection', return_value=conn):
+        manager.check_command(1, ['MSET', '{u}a', '1', '{u}b', '2'])
+        with pytest.raises(ValueError, match='CROSSSLOT'):
+            manager.check_command(1, ['MSET', 'a', '1', 'b', '2'])
+
+
+def test_cluster_del_across_slots_is_split_by_redis_py():
+    manager = RedisManager()
+    conn = Mock(spec=RedisCluster)
+    conn.info.return_value = {'127.0.0.1:7000': {'redis_version': '7.2.4'}}
+    conn.execute_command.return_value = COMMAND_REPLY
+    conn.delete.return_value = 2
+    router = RedisCommandRouter(manager)
+    with patch.object(manager, 'get_connection', return_value=conn):
+        assert router.route_command(1, 'DEL a b') == 2
+        assert 'CROSSSLOT' in router.route_batch(1, 'DEL a b')[0]['error']
+
+    conn.delete.assert_called_once_with('a', 'b')
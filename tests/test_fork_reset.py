@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock, Mock, patch
+from app.async_redis_manager import AsyncRedisManager
+from app.redis_manager import RedisManager
+
+
+def test_reset_drops_inherited_clients_without_closing_them():
+    manager = RedisManager()
+    manager.connections.max_clients = 8
+    inherited = Mock()
+    manager.connections.get_or_create(1, lambda: inherited)
+    manager._server_versions[1] = '7.2.4'
+    old_lock = manager._lock
+    manager._executor = Mock()
+
+    manager.reset()
+
+    assert 1 not in manager.connections
+    assert manager.connections.max_clients == 8
+    assert manager._executor is None and manager._lock is not old_lock
+    assert manager._server_versions == {}
+    inherited.connection_pool.disconnect.assert_not_called()
+    inherited.close.assert_not_called()
+
+
+def test_reset_gives_the_async_backend_a_new_loop():
+    manager = RedisManager()
+    backend = manager.async_backend = AsyncRedisManager()
+    inherited = Mock()
+    backend.connections.get_or_create(('async', 1), lambda: inherited)
+    old_runner = backend.runner
+
+    manager.reset()
+
+    assert backend.connections is manager.connections and ('async', 1) not in backend.connections
+    assert backend.runner is not old_runner and backend.runner.loop is None
+    inherited.aclose.assert_not_called()
+
+
+def test_reset_after_fork_disposes_engine_and_restarts_workers():
+    from app import reset_after_fork
+    app = MagicMock()
+    with patch('app.redis_manager.redis_manager') as redis_manager, patch('app.db') as db, \
+            patch('app.start_background_workers') as start_background_workers:
+        reset_after_fork(app)
+
+    redis_manager.reset.assert_called_once_with()
+    db.engine.dispose.assert_called_once_with(close=False)
+    start_background_workers.assert_called_once_with(app)
@@ -0,0 +1,46 @@
+from unittest.mock import Mock
+from app.keyspace_analyzer import KeyspaceAnalyzer
+from app.redis_manager import RedisManager
+
+
+def test_analyzer_keeps_top_keys_and_prefix_totals():
+    manager = Mock(spec=RedisManager)
+    manager.scan_keys.side_effect = [(3, [b'user:1', b'user:2', b'session:9']), (0, [b'plain', b'gone'])]
+    manager.memory_usage_and_type.side_effect = [[(100, b'hash'), (300, b'string'), (50, b'string')],
+                                                 [(500, b'list'), (None, b'none')]]
+
+    snapshots = list(KeyspaceAnalyzer(manager, 1, top_n=2, report_interval=0).run())
+    final = snapshots[-1]
+
+    assert final['done'] and final['scanned'] == 4 and final['total_bytes'] == 950
+    assert final['top_keys'] == [{'key': 'plain', 'type': 'list', 'bytes': 500},
+                                 {'key': 'user:2', 'type': 'string', 'bytes': 300}]
+    assert final['prefixes'] == [{'prefix': 'plain', 'keys': 1, 'bytes': 500},
+                                 {'prefix': 'user:', 'keys': 2, 'bytes': 400}]
+    assert not snapshots[0]['done']
+
+
+def test_prefix_depth_and_multiple_delimiters():
+    analyzer = KeyspaceAnalyzer(Mock(), 1, delimiters=':/', prefix_depth=2)
+    assert analyzer.prefix_of('app/user:1:x') == 'app/user:'
+    assert analyzer.prefix_of('app/1') == 'app/'
+    assert analyzer.prefix_of('flat') == 'flat'
+
+
+def test_prefixes_are_bounded():
+    analyzer = KeyspaceAnalyzer(Mock(), 1, delimiters='', max_prefixes=2)
+    for key in ('a', 'b', 'c', 'd'):
+        analyzer.add(key, 10, 'string')
+    assert analyzer.prefixes == {'a': [1, 10], 'b': [1, 10], '<other>': [2, 20]}
+
+
+def test_throttle_counts_keys_scan_examined_not_matches(monkeypatch):
+    manager = Mock(spec=RedisManager)
+    # A selective MATCH: every page comes back empty, SCAN still walked batch_size keys each time
+    manager.scan_keys.side_effect = [(1, []), (2, []), (0, [])]
+    sleeps = []
+    monkeypatch.setattr('app.keyspace_analyzer.time.sleep', sleeps.append)
+
+    list(KeyspaceAnalyzer(manager, 1, match='rare:*', batch_size=1000, max_keys_per_sec=1000).run())
+
+    assert len(sleeps) == 2 and sleeps[-1] > 1
@@ -0,0 +1,59 @@
+import io
+import json
+from unittest.mock import Mock
+import pytest
+from app.keyspace_transfer import export_keys, import_keys, read_trailer
+from app.redis_manager import RedisManager
+
+
+def test_export_streams_every_scan_page():
+    manager = Mock(spec=RedisManager)
+    manager.scan_keys.side_effect = [(7, [b'a', b'gone', b'expiring']), (0, [b'b'])]
+    manager.dump_keys.side_effect = [[(b'\x00dump-a', -1), (None, -2), (b'\x00dump-e', -2)],
+                                     [(b'\x00dump-b', 5000)]]
+
+    lines = [json.loads(line) for line in export_keys(manager, 1, match='*', count=2)]
+
+    assert [line['ttl'] for line in lines[:-1]] == [0, 5000]
+    assert lines[-1] == {'done': True, 'count': 2}
+    assert manager.scan_keys.call_args_list[1].kwargs['cursor'] == 7
+
+
+def test_export_that_fails_half_way_ends_with_an_error():
+    manager = Mock(spec=RedisManager)
+    manager.scan_keys.side_effect = [(7, [b'a']), ConnectionError('Connection reset by peer')]
+    manager.dump_keys.return_value = [(b'\x00dump-a', -1)]
+
+    exported = ''.join(export_keys(manager, 1)).encode('utf-8')
+
+    assert json.loads(exported.splitlines()[-1]) == {'error': 'Connection reset by peer', 'count': 1}
+    with pytest.raises(ValueError, match='failed after 1 keys'):
+        read_trailer(io.BytesIO(exported))
+
+
+def test_files_without_the_trailer_are_rejected():
+    record = b'{"key": "YQ==", "ttl": 0, "dump": "AGR1bXA="}\n'
+    with pytest.raises(ValueError, match='incomplete'):
+        read_trailer(io.BytesIO(record * 3))
+    with pytest.raises(ValueError, match='incomplete'):
+        read_trailer(io.BytesIO(b''))
+
+    stream = io.BytesIO(record + b'{"done": true, "count": 1}\n')
+    assert read_trailer(stream, tail_size=40) == {'done': True, 'count': 1}
+    assert stream.tell() == 0
+
+
+def test_import_restores_in_batches_and_reports_progress():
+    manager = Mock(spec=RedisManager)
+    exported = [b'{"key": "YQ==", "ttl": 0, "dump": "AGR1bXA="}',
+                b'not json',
+                b'{"key": "Yg==", "ttl": 100, "dump": "AGR1bXA="}',
+                b'{"key": "Yw==", "ttl": 0, "dump": "AGR1bXA="}',
+                b'{"done": true, "count": 3}']
+    manager.restore_keys.side_effect = [[True, Exception('BUSYKEY')], [True]]
+
+    progress = list(import_keys(manager, 1, io.BytesIO(b'\n'.join(exported)), batch_size=2))
+
+    assert manager.restore_keys.call_args_list[0].args[1] == [(b'a', 0, b'\x00dump'), (b'b', 100, b'\x00dump')]
+    assert progress[0] == {'imported': 1, 'failed': 2, 'errors': progress[0]['errors']}
+    assert progress[-1]['done'] and progress[-1]['imported'] == 2 and progress[-1]['failed'] == 2
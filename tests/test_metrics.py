@@ -0,0 +1,103 @@
+import json
+import pytest
+import redis
+from unittest.mock import Mock
+from app import metrics
+from app.metrics import (MetricsRegistry, MultiProcessStore, command_errors, command_latency, pool_usage,
+                         timed_call)
+from app.redis_manager import RedisCommandRouter, RedisManager
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency.', ('command',), buckets=(0.1, 1))
+    latency.observe(0.05, 'GET')
+    latency.observe(0.1, 'GET')
+    latency.observe(5, 'GET')
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{command="GET",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{command="GET",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{command="GET",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{command="GET"} 3' in lines
+    assert 'latency_seconds_sum{command="GET"} 5.15' in lines
+
+
+def test_timer_counts_errors_and_escapes_labels():
+    registry = MetricsRegistry()
+    latency = registry.histogram('calls_seconds', 'Calls.', ('method',))
+    errors = registry.counter('call_errors_total', 'Errors.', ('method',))
+
+    with pytest.raises(KeyError):
+        with latency.time('say "hi"', errors=errors):
+            raise KeyError('boom')
+
+    assert 'call_errors_total{method="say \\"hi\\""} 1' in registry.render().splitlines()
+    assert list(latency.samples()) == [('say "hi"',)]
+
+
+def test_timed_call_labels_method_and_connection():
+    registry = MetricsRegistry()
+    latency = registry.histogram('calls_seconds', 'Calls.', ('method', 'connection'))
+    errors = registry.counter('call_errors_total', 'Errors.', ('method', 'connection'))
+
+    class Manager:
+        @timed_call(latency, errors)
+        def get(self, connection_id, key):
+            return key.upper()
+
+    assert Manager().get(3, 'k') == 'K'
+    assert latency.samples()[('get', '3')][-1] > 0
+    assert errors.samples() == {}
+
+
+def test_route_command_records_known_verbs_only():
+    manager = Mock(spec=RedisManager)
+    manager.check_command.return_value = None
+    manager.execute_command.side_effect = ValueError("ERR unknown command")
+    router = RedisCommandRouter(manager)
+    command_latency.clear()
+    command_errors.clear()
+
+    router.route_command(7, 'GET key')
+    router.route_command(7, 'NOSUCHCOMMAND key')
+
+    assert set(command_latency.samples()) == {('GET', '7'), ('OTHER', '7')}
+    assert command_errors.samples() == {('OTHER', '7'): 1}
+
+
+def test_pool_usage_of_blocking_pool():
+    pool = redis.BlockingConnectionPool(max_connections=5)
+    pool.make_connection()
+    # A released connection takes the place of one of the empty slots in the queue
+    pool.pool.get_nowait()
+    pool.pool.put_nowait(pool.make_connection())
+
+    assert pool_usage(redis.Redis(connection_pool=pool)) == (1, 1, 5)
+
+
+def test_multiprocess_store_adds_up_workers(tmp_path, monkeypatch):
+    registry = MetricsRegistry()
+    calls = registry.counter('calls_total', 'Calls.', ('method',))
+    latency = registry.histogram('calls_seconds', 'Calls.', buckets=(1,))
+    queue = registry.gauge('queue_depth', 'Queue.')
+    calls.inc('get', amount=2)
+    latency.observe(0.5)
+    queue.set(3)
+    store = MultiProcessStore(registry, directory=str(tmp_path))
+    store.flush()
+    # Another worker that has exited since its last flush
+    (tmp_path / '1000001.json').write_text(json.dumps({
+        'calls_total': [[['get'], 5]],
+        'calls_seconds': [[[], [0, 1, 2.0]]],
+        'queue_depth': [[[], 7]],
+    }))
+    monkeypatch.setattr(metrics, '_pid_alive', lambda pid: False)
+
+    lines = store.render().splitlines()
+
+    assert 'calls_total{method="get"} 7' in lines
+    assert 'calls_seconds_count 2' in lines
+    assert 'calls_seconds_sum 2.5' in lines
+    assert 'queue_depth 3' in lines
@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, Mock, patch
+import app
+from app.metrics import redis_info_latency
+from app.monitoring import RingBuffer, MetricsPoller
+from app.redis_manager import RedisManager
+
+
+def test_ring_buffer_keeps_latest_samples_in_order():
+    buffer = RingBuffer(3)
+    for value in (1, 2, None, 4):
+        buffer.append(value)
+    assert len(buffer) == 3
+    assert buffer.values() == [2.0, None, 4.0]
+
+
+def test_ring_buffer_partially_filled():
+    buffer = RingBuffer(5)
+    buffer.append(1)
+    buffer.append(2)
+    assert buffer.values() == [1.0, 2.0]
+
+
+def test_poller_records_samples_and_failures():
+    def fetch_info(connection):
+        if connection.id == 2:
+            raise ConnectionError('refused')
+        return {'instantaneous_ops_per_sec': 120, 'used_memory': 2048, 'used_memory_human': '2K',
+                'used_cpu_sys': 0.5}
+
+    manager = RedisManager()
+    manager.fetch_info = Mock(side_effect=fetch_info)
+    poller = MetricsPoller(manager, history_size=4)
+
+    poller.poll([Mock(id=1), Mock(id=2)])
+
+    history = poller.get_history(1)
+    assert history['series']['ops_per_sec'] == [120.0]
+    assert history['series']['evicted_keys'] == [None]
+    assert poller.get_summary(1) == {'cpu_usage': 0.5, 'memory_usage': '2K', 'status': 'Connected'}
+    assert poller.get_summary(2)['status'] == 'Disconnected: refused'
+
+
+def test_poller_info_requests_are_timed():
+    manager = RedisManager()
+    client = Mock()
+    client.info.return_value = {'used_memory': 2048}
+    manager.info_connections.get_or_create(41, lambda: client)
+    redis_info_latency.clear()
+
+    MetricsPoller(manager).poll([Mock(id=41)])
+
+    counts = redis_info_latency.samples()[('41',)]
+    assert sum(counts[:-1]) == 1
+
+
+def _run_poller(executor, error):
+    poller = MetricsPoller(Mock(executor=executor), interval=0.01)
+    poller.poll = Mock(side_effect=error)
+    with patch.object(app, 'db', MagicMock()):
+        poller.start(MagicMock(config={}))
+        deadline = time.monotonic() + 2
+        while poller.poll.call_count < 3 and poller._thread.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        alive = poller._thread.is_alive()
+        poller.stop()
+    return alive, poller.poll.call_count
+
+
+def test_poller_survives_unrelated_runtime_errors():
+    executor = ThreadPoolExecutor(max_workers=1)
+    alive, polls = _run_poller(executor, RuntimeError('dictionary changed size during iteration'))
+    executor.shutdown()
+    assert alive and polls >= 3
+
+
+def test_poller_stops_once_the_fanout_pool_is_shut_down():
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.shutdown()
+    alive, polls = _run_poller(executor, RuntimeError('cannot schedule new futures after shutdown'))
+    assert not alive and polls == 1
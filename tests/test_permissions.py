@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import Mock
+from flask_appbuilder import Model
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.enums import TeamRedisPermission, RedisDeploymentType
+from app.models import ExtendUser, Team, TeamRedisRole
+from app.permissions import permission_cache
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Model.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    user = ExtendUser(id=1, first_name='a', last_name='b', username='user', email='user@example.com')
+    readers = Team(id=1, name='readers', created_by_fk=1, changed_by_fk=1)
+    writers = Team(id=2, name='writers', created_by_fk=1, changed_by_fk=1)
+    user.teams = [readers, writers]
+    readers.redis_roles = [TeamRedisRole(connection_id=1, permission=TeamRedisPermission.READ,
+                                         created_by_fk=1, changed_by_fk=1)]
+    writers.redis_roles = [TeamRedisRole(connection_id=2, permission=TeamRedisPermission.READ_WRITE,
+                                         created_by_fk=1, changed_by_fk=1)]
+    session.add(user)
+    session.commit()
+    permission_cache.invalidate()
+    yield session
+    session.close()
+
+
+def test_permissions_are_scoped_to_the_connection(session):
+    user = session.get(ExtendUser, 1)
+
+    assert sorted(user.get_allowed_connection_ids()) == [1, 2]
+    assert user.can_read(1) and not user.can_write(1)
+    assert user.can_read(2) and user.can_write(2)
+    assert not user.can_read(3)
+    assert not user.can_cluster_admin(2)
+
+
+def test_map_is_cached_until_roles_change(session):
+    user = session.get(ExtendUser, 1)
+    permissions = user.get_permission_map()
+    assert user.get_permission_map() is permissions
+
+    session.add(TeamRedisRole(team_id=1, connection_id=3, permission=TeamRedisPermission.CLUSTER_ADMIN,
+                              created_by_fk=1, changed_by_fk=1))
+    session.commit()
+
+    assert user.can_cluster_admin(3)
+    assert user.can_write(3)
+
+
+def test_filter_lists_shared_connections_once(session):
+    from flask import Flask, g
+    from app.filters import CanListConnectionFilter
+    from app.models import RedisConnection
+
+    session.add(TeamRedisRole(team_id=1, connection_id=2, permission=TeamRedisPermission.READ,
+                              created_by_fk=1, changed_by_fk=1))
+    for i in (1, 2, 3):
+        session.add(RedisConnection(id=i, name=f'redis{i}', deployment_type=RedisDeploymentType.STANDALONE,
+                                    created_by_fk=1, changed_by_fk=1))
+    session.commit()
+
+    with Flask(__name__).app_context():
+        g.user = session.get(ExtendUser, 1)
+        query = CanListConnectionFilter('id', Mock()).apply(session.query(RedisConnection), None)
+
+        assert sorted(c.id for c in query) == [1, 2]
+        assert query.count() == 2
@@ -0,0 +1,120 @@
+import json
+import queue
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+from app.pubsub_hub import DROP_NEWEST, DROP_OLDEST, SAMPLE, PubSubHub, Subscriber
+from app.redis_manager import RedisCommandRouter, RedisManager
+
+
+class FakePubSub:
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.channels = set()
+        self.subscribe_calls = []
+        self.closed = False
+
+    def subscribe(self, *channels):
+        self.subscribe_calls.append(channels)
+        self.channels.update(channels)
+
+    def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    def psubscribe(self, *patterns):
+        self.channels.update(patterns)
+
+    def punsubscribe(self, *patterns):
+        self.channels.difference_update(patterns)
+
+    def get_message(self, ignore_subscribe_messages=False, timeout=0):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish(self, channel, data):
+        self.messages.put({'type': 'message', 'pattern': None, 'channel': channel, 'data': data})
+
+    def close(self):
+        self.closed = True
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('policy, expected, dropped', [
+    (DROP_OLDEST, [b'7', b'8', b'9'], 7),
+    (DROP_NEWEST, [b'0', b'1', b'2'], 7),
+    # One in four messages after the buffer filled up replaces the oldest one
+    (SAMPLE, [b'1', b'2', b'6'], 7),
+])
+def test_full_buffers_follow_their_policy(policy, expected, dropped):
+    subscriber = Subscriber(1, channels=['news'], buffer_size=3, policy=policy, sample_every=4)
+    for i in range(10):
+        subscriber.put(str(i).encode())
+
+    assert subscriber.get(timeout=0) == (expected, dropped)
+    assert subscriber.get(timeout=0) == ([], 0)
+
+
+def test_clients_of_one_channel_share_one_upstream_subscription():
+    pubsub = FakePubSub()
+    manager = Mock(spec=RedisManager)
+    manager.pubsub.return_value = pubsub
+    hub = PubSubHub(poll_interval=0.05)
+
+    first = hub.subscribe(manager, 1, channels=['news'])
+    second = hub.subscribe(manager, 1, channels=['news'])
+    wait_for(lambda: pubsub.channels == {'news'})
+    pubsub.publish(b'news', b'hello')
+
+    for subscriber in (first, second):
+        messages, dropped = subscriber.get(timeout=2)
+        assert [json.loads(message)['data'] for message in messages] == ['hello']
+    manager.pubsub.assert_called_once_with(1)
+    assert pubsub.subscribe_calls == [('news',)]
+    assert hub.stats() == {1: {'channels': 1, 'patterns': 0, 'subscribers': 2}}
+
+    hub.unsubscribe(first)
+    hub.unsubscribe(second)
+    wait_for(lambda: pubsub.closed)
+    assert hub.stats() == {}
+
+
+def test_subscriber_limit():
+    manager = Mock(spec=RedisManager)
+    manager.pubsub.return_value = FakePubSub()
+    hub = PubSubHub(poll_interval=0.05, max_subscribers=1)
+    subscriber = hub.subscribe(manager, 1, channels=['news'])
+
+    with pytest.raises(RuntimeError):
+        hub.subscribe(manager, 1, channels=['news'])
+    with pytest.raises(ValueError):
+        hub.subscribe(manager, 1)
+    hub.unsubscribe(subscriber)
+
+
+def test_subscriber_limit_comes_from_gunicorn(monkeypatch):
+    hub = PubSubHub()
+    monkeypatch.setenv('PUBSUB_MAX_SUBSCRIBERS', '4')
+    hub.init_app(SimpleNamespace(config={'PUBSUB_MAX_SUBSCRIBERS': None}))
+    assert hub.max_subscribers == 4
+
+    monkeypatch.delenv('PUBSUB_MAX_SUBSCRIBERS')
+    hub.init_app(SimpleNamespace(config={'PUBSUB_MAX_SUBSCRIBERS': None}))
+    assert hub.max_subscribers == 4
+
+
+def test_console_rejects_subscribe():
+    manager = Mock(spec=RedisManager)
+    manager.check_command.return_value = None
+    router = RedisCommandRouter(manager)
+
+    assert router.route_command(1, 'SUBSCRIBE news').startswith('Error: SUBSCRIBE is not available')
+    manager.execute_command.assert_not_called()
@@ -1,11 +1,16 @@
 import pytest
+import threading
 from unittest.mock import Mock
+from redis.cluster import RedisCluster
 from app.redis_manager import RedisCommandRouter, RedisManager
 
 
 @pytest.fixture
 def redis_manager_mock():
-    return Mock(spec=RedisManager)
+    redis_manager_mock = Mock(spec=RedisManager)
+    # No COMMAND table, commands are sent without local validation
+    redis_manager_mock.check_command.return_value = None
+    return redis_manager_mock
 
 
 @pytest.fixture
@@ -138,6 +143,12 @@ def test_route_command_unknown(command_router, redis_manager_mock):
     redis_manager_mock.execute_command.assert_called_once_with(1, 'UNKNOWN_COMMAND', 'arg1', 'arg2')
 
 
+def test_route_command_read_only_goes_to_replica(command_router, redis_manager_mock):
+    command_router.route_command(1, 'TTL mykey')
+    redis_manager_mock.execute_read_command.assert_called_once_with(1, 'TTL', 'mykey')
+    redis_manager_mock.execute_command.assert_not_called()
+
+
 def test_route_command_set_with_options(command_router, redis_manager_mock):
     command_router.route_command(1, 'SET mykey value EX 60 NX')
     redis_manager_mock.set.assert_called_once_with(1, 'mykey', 'value', EX='60', NX=True)
@@ -163,15 +174,177 @@ def test_route_command_missing_args(command_router):
     assert "Error: SET command requires at least key and value arguments" in result
 
 
+def test_route_command_raise_errors(command_router):
+    with pytest.raises(ValueError, match="SET command requires at least key and value arguments"):
+        command_router.route_command(1, 'SET', raise_errors=True)
+
+
 def test_route_command_too_many_args(command_router):
     result = command_router.route_command(1, 'GET key1 key2')
     assert "Error: GET command requires exactly one argument (key)" in result
 
 
+def test_route_batch_pipelines_all_lines(command_router, redis_manager_mock):
+    redis_manager_mock.execute_pipeline.return_value = [True, Exception('WRONGTYPE'), 2]
+    results = command_router.route_batch(1, 'SET a 1\n\n# comment\nLPUSH a x\nDEL a b\n')
+
+    redis_manager_mock.execute_pipeline.assert_called_once_with(
+        1, [['SET', 'a', '1'], ['LPUSH', 'a', 'x'], ['DEL', 'a', 'b']], transaction=False)
+    assert results == [{'command': 'SET a 1', 'result': True},
+                       {'command': 'LPUSH a x', 'error': 'WRONGTYPE'},
+                       {'command': 'DEL a b', 'result': 2}]
+
+
+def test_route_batch_multi_exec_runs_as_transaction(command_router, redis_manager_mock):
+    redis_manager_mock.execute_pipeline.return_value = [True]
+    command_router.route_batch(1, 'MULTI\nINCR counter\nEXEC')
+    redis_manager_mock.execute_pipeline.assert_called_once_with(1, [['INCR', 'counter']], transaction=True)
+
+
 def test_parse_json_arg(command_router):
     assert command_router._parse_json_arg('{"name": "John"}') == {"name": "John"}
     assert command_router._parse_json_arg('not_json') == 'not_json'
 
 
+def test_scan_keys_passes_cursor_and_filters():
+    manager = RedisManager()
+    conn = Mock()
+    conn.scan.return_value = (42, [b'user:1', b'user:2'])
+    manager.get_read_node = Mock(return_value=(None, conn))
+
+    assert manager.scan_keys(1, cursor=7, match='user:*', count=100, _type='hash') == (42, [b'user:1', b'user:2'])
+    conn.scan.assert_called_once_with(cursor=7, match='user:*', count=100, _type='hash')
+
+
+def test_scan_keys_cluster_resumes_per_node_cursors():
+    nodes = {}
+    for name, pages in (('a:7000', [(5, [b'a1']), (0, [b'a2'])]), ('b:7001', [(0, [b'b1'])])):
+        node = Mock()
+        node.name = name
+        node.client = Mock()
+        node.client.scan.side_effect = pages
+        nodes[name] = node
+
+    cluster = Mock(spec=RedisCluster)
+    cluster.get_primaries.return_value = list(nodes.values())
+    cluster.get_node.side_effect = lambda node_name: nodes.get(node_name)
+    cluster.get_redis_connection.side_effect = lambda node: node.client
+
+    manager = RedisManager()
+    manager.get_read_node = Mock(return_value=(None, cluster))
+
+    cursor, keys = manager.scan_keys(1, cursor='0', match='*', count=10)
+    assert sorted(keys) == [b'a1', b'b1']
+    assert cursor != '0'
+
+    cursor, keys = manager.scan_keys(1, cursor=cursor, match='*', count=10)
+    assert keys == [b'a2']
+    assert cursor == '0'
+    nodes['a:7000'].client.scan.assert_called_with(cursor=5, match='*', count=10, _type=None)
+    assert nodes['b:7001'].client.scan.call_count == 1
+
+
+def test_inspect_key_pipelines_metadata_and_first_page():
+    conn = Mock()
+    first, second = Mock(), Mock()
+    first.execute.return_value = [b'hash', -1, 1024]
+    second.execute.return_value = [2000000, (17, {b'f1': b'v1'})]
+    conn.pipeline.side_effect = [first, second]
+    manager = RedisManager()
+    manager.get_read_node = Mock(return_value=(None, conn))
+
+    result = manager.inspect_key(1, 'big', count=50)
+
+    second.execute_command.assert_called_once_with('HLEN', 'big')
+    second.hscan.assert_called_once_with('big', 0, count=50)
+    assert result == {'key': 'big', 'type': 'hash', 'ttl': -1, 'memory': 1024, 'length': 2000000,
+                      'cursor': 17, 'value': {b'f1': b'v1'}}
+
+
+def test_get_value_page_list_window():
+    conn = Mock()
+    pipe = Mock()
+    pipe.execute.return_value = [[b'a', b'b']]
+    conn.pipeline.return_value = pipe
+    manager = RedisManager()
+    manager.get_read_node = Mock(return_value=(None, conn))
+
+    assert manager.get_value_page(1, 'mylist', 'list', cursor='4', count=2) == (6, [b'a', b'b'])
+    pipe.lrange.assert_called_once_with('mylist', 4, 5)
+
+
+def test_inspect_key_previews_strings_with_getrange():
+    conn = Mock()
+    first, second = Mock(), Mock()
+    first.execute.return_value = [b'string', -1, 200000000]
+    # The window ends in the middle of a two byte character
+    second.execute.return_value = [200000000, b'abc\xc3']
+    conn.pipeline.side_effect = [first, second]
+    manager = RedisManager()
+    manager.string_window = 4
+    manager.get_read_node = Mock(return_value=(None, conn))
+
+    result = manager.inspect_key(1, 'blob')
+
+    second.get.assert_not_called()
+    second.getrange.assert_called_once_with('blob', 0, 3)
+    assert result['cursor'] == 3
+    assert bytes(result['value']) == b'abc'
+
+
+def test_get_string_range_reads_one_window():
+    conn = Mock()
+    pipe = Mock()
+    pipe.execute.return_value = [10, b'6789']
+    conn.pipeline.return_value = pipe
+    manager = RedisManager()
+    manager.get_read_connection = Mock(return_value=conn)
+
+    total, next_offset, value = manager.get_string_range(1, 'blob', offset=6, length=100)
+
+    pipe.getrange.assert_called_once_with('blob', 6, 105)
+    assert (total, next_offset, bytes(value)) == (10, 0, b'6789')
+
+
+def test_get_redis_info_many_reports_slow_hosts_as_timed_out():
+    release = threading.Event()
+    fast, slow = Mock(), Mock()
+    fast.info.return_value = {'used_cpu_sys': 1.5, 'used_memory_human': '1M'}
+    slow.info.side_effect = lambda: release.wait(5) and {}
+    manager = RedisManager()
+    manager.info_connections.get_or_create(1, lambda: fast)
+    manager.info_connections.get_or_create(2, lambda: slow)
+
+    infos = manager.get_redis_info_many([Mock(id=1), Mock(id=2)], timeout=0.1)
+    release.set()
+
+    assert infos[1] == {'cpu_usage': 1.5, 'memory_usage': '1M', 'status': 'Connected'}
+    assert infos[2]['status'] == 'Timed out'
+
+
+def test_route_command_values_are_passed_verbatim(command_router, redis_manager_mock):
+    command_router.route_command(1, 'SET mykey "hello world" EX 10')
+    redis_manager_mock.set.assert_called_once_with(1, 'mykey', 'hello world', EX='10')
+    command_router.route_command(1, 'RPUSH mylist 1e3 {"a":  1}')
+    redis_manager_mock.rpush.assert_called_once_with(1, 'mylist', '1e3', '{"a":  1}')
+
+
+def test_route_command_uses_command_table_for_replica_reads(command_router, redis_manager_mock):
+    redis_manager_mock.check_command.return_value = Mock(read_only=True)
+    command_router.route_command(1, 'GEOPOS places a')
+    redis_manager_mock.execute_read_command.assert_called_once_with(1, 'GEOPOS', 'places', 'a')
+
+
+def test_route_batch_rejects_malformed_lines_locally(command_router, redis_manager_mock):
+    redis_manager_mock.check_command.side_effect = [None, ValueError('ERR wrong number of arguments'), None]
+    redis_manager_mock.execute_pipeline.return_value = [True, b'1']
+    results = command_router.route_batch(1, 'SET a 1\nGET\nGET a')
+
+    redis_manager_mock.execute_pipeline.assert_called_once_with(1, [['SET', 'a', '1'], ['GET', 'a']],
+                                                                transaction=False)
+    assert results[1] == {'command': 'GET', 'error': 'ERR wrong number of arguments'}
+    assert results[2] == {'command': 'GET a', 'result': b'1'}
+
+
 if __name__ == '__main__':
     pytest.main()
@@ -0,0 +1,82 @@
+import redis
+from types import SimpleNamespace
+from unittest.mock import Mock
+from app import redis_manager as module
+from app.enums import RedisDeploymentType
+from app.replicas import ReplicaPool
+
+
+def _replica(lag=0, link='up'):
+    replica = Mock()
+    replica.info.return_value = {'master_link_status': link, 'master_last_io_seconds_ago': lag}
+    return replica
+
+
+def test_round_robin_over_healthy_replicas():
+    first, second = _replica(), _replica()
+    pool = ReplicaPool(Mock(), [first, second])
+    assert [pool.get() for _ in range(4)] == [first, second, first, second]
+
+
+def test_lagging_and_unreachable_replicas_are_skipped():
+    lagging, down, healthy = _replica(lag=60), _replica(link='down'), _replica()
+    broken = Mock()
+    broken.info.side_effect = redis.ConnectionError('refused')
+    pool = ReplicaPool(Mock(), [lagging, down, broken, healthy], max_lag=10)
+    assert {pool.get() for _ in range(4)} == {healthy}
+
+
+def test_master_is_used_without_healthy_replicas():
+    master = Mock()
+    assert ReplicaPool(master, []).get() is master
+    assert ReplicaPool(master, [_replica(lag=60)], max_lag=10).get() is master
+
+
+def test_deployments_without_replicas_read_from_the_master(monkeypatch):
+    rows = {1: SimpleNamespace(id=1, deployment_type=RedisDeploymentType.STANDALONE, slave_hosts=None),
+            2: SimpleNamespace(id=2, deployment_type=RedisDeploymentType.MASTER_SLAVE, slave_hosts='replica:6379')}
+    monkeypatch.setattr(module, 'db', Mock(**{'session.query.return_value.get.side_effect': rows.get}))
+    manager = module.RedisManager()
+    manager._create_client = Mock(side_effect=lambda connection: Mock(name=f'master{connection.id}'))
+    manager._create_replica_pool = Mock(return_value=ReplicaPool(Mock(), [_replica()]))
+
+    assert manager.get_read_connection(1) is manager.get_connection(1)
+    assert ('replicas', 1) not in manager.connections
+    manager.get_read_connection(2)
+    assert ('replicas', 2) in manager.connections
+
+
+class FakeScanReplica:
+    """SCAN over its own ordering of the keys, the cursor is a position only this node understands."""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def info(self, section):
+        return {'master_link_status': 'up', 'master_last_io_seconds_ago': 0}
+
+    def scan(self, cursor=0, match=None, count=None, _type=None):
+        page = self.keys[cursor:cursor + count]
+        next_cursor = cursor + count
+        return (next_cursor if next_cursor < len(self.keys) else 0), page
+
+
+def test_scans_stay_on_the_replica_that_issued_the_cursor(monkeypatch):
+    row = SimpleNamespace(id=1, deployment_type=RedisDeploymentType.MASTER_SLAVE, slave_hosts='a:6379,b:6379')
+    monkeypatch.setattr(module, 'db', Mock(**{'session.query.return_value.get.return_value': row}))
+    keys = [f'key:{i}' for i in range(10)]
+    manager = module.RedisManager()
+    manager._create_client = Mock(return_value=Mock())
+    manager._create_replica_pool = Mock(return_value=ReplicaPool(
+        Mock(), [FakeScanReplica(keys), FakeScanReplica(keys[::-1])]))
+
+    assert sorted(manager.scan_iter_keys(1, count=3)) == keys
+
+    # The browser only sends back the cursor it was given
+    seen, cursor = [], 0
+    while True:
+        cursor, page = manager.scan_keys(1, cursor=cursor, count=3)
+        seen.extend(page)
+        if str(cursor) == '0':
+            break
+    assert sorted(seen) == keys
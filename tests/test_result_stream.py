@@ -0,0 +1,37 @@
+from unittest.mock import Mock
+from app.redis_manager import RedisManager
+from app.result_stream import stream_command
+
+
+def test_lrange_is_read_in_windows_with_negative_indexes_resolved():
+    manager = Mock(spec=RedisManager)
+    manager.execute_read_command.return_value = 5
+    manager.lrange.side_effect = lambda cid, key, start, stop: [f'item{i}' for i in range(start, min(stop, 4) + 1)]
+
+    chunks = list(stream_command(manager, 1, ['LRANGE', 'big', '0', '-1'], window=2))
+
+    assert chunks == [['item0', 'item1'], ['item2', 'item3'], ['item4']]
+    manager.execute_read_command.assert_called_once_with(1, 'LLEN', 'big')
+
+
+def test_smembers_and_hgetall_follow_the_scan_cursor():
+    manager = Mock(spec=RedisManager)
+    manager.get_value_page.side_effect = [(3, [b'a', b'b']), (0, [b'c'])]
+    assert list(stream_command(manager, 1, ['smembers', 's'], window=2)) == [[b'a', b'b'], [b'c']]
+    assert manager.get_value_page.call_args_list[1].kwargs['cursor'] == 3
+
+    manager.get_value_page.side_effect = [(0, {b'f': b'v'})]
+    assert list(stream_command(manager, 1, ['HGETALL', 'h'])) == [[[b'f', b'v']]]
+
+
+def test_keys_uses_scan():
+    manager = Mock(spec=RedisManager)
+    manager.scan_iter_keys.return_value = iter([b'a', b'b', b'c'])
+    assert list(stream_command(manager, 1, ['KEYS', 'user:*'], window=2)) == [[b'a', b'b'], [b'c']]
+    manager.scan_iter_keys.assert_called_once_with(1, match='user:*', count=2)
+
+
+def test_other_commands_are_not_streamed():
+    manager = Mock(spec=RedisManager)
+    assert stream_command(manager, 1, ['GET', 'k']) is None
+    assert stream_command(manager, 1, ['ZRANGE', 'z', '0', '10', 'BYSCORE']) is None
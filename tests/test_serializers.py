@@ -0,0 +1,27 @@
+from redis.exceptions import ResponseError
+from app.serializers import describe_reply, dumps, encode_reply, utf8_boundary
+
+
+def test_nested_reply_shapes():
+    assert encode_reply({b'field': b'value', b'n': 1}) == {'field': 'value', 'n': 1}
+    assert encode_reply([(b'member', 2.5), (b'top', float('inf'))]) == [['member', 2.5], ['top', 'inf']]
+    assert encode_reply({b'a'}) == ['a']
+    assert encode_reply([[b'1-0', [b'f', b'v']], None]) == [['1-0', ['f', 'v']], None]
+    assert encode_reply([True, ResponseError('WRONGTYPE')]) == [True, {'error': 'WRONGTYPE'}]
+
+
+def test_binary_values_are_base64_and_flagged():
+    reply = describe_reply([b'text', b'\xff\x00'])
+    assert reply == {'result': ['text', {'base64': '/wA='}], 'type': 'array', 'size': 2, 'binary': True}
+
+    # A map with a binary field name cannot be a JSON object, it becomes pairs
+    assert encode_reply({b'\xff': b'v'}) == [[{'base64': '/w=='}, 'v']]
+    assert describe_reply(b'abc') == {'result': 'abc', 'type': 'string', 'size': 3, 'binary': False}
+    assert describe_reply(None)['type'] == 'null'
+
+
+def test_string_windows_stop_before_cut_characters():
+    assert utf8_boundary(memoryview('ab€'.encode('utf-8'))) == 5
+    assert utf8_boundary(memoryview('ab€'.encode('utf-8')[:4])) == 2
+    assert utf8_boundary(memoryview(b'\xff\xfe')) == 2
+    assert encode_reply(memoryview(b'plain')) == 'plain'
@@ -0,0 +1,102 @@
+import pytest
+from unittest.mock import Mock
+from redis.cluster import RedisCluster
+from app.redis_manager import RedisManager
+from app.slowlog import SlowlogAggregator, fingerprint, read_new_entries, redact
+
+
+class FakeSlowlog:
+    """A node's SLOWLOG: ids grow, SLOWLOG GET returns the newest entries first."""
+
+    def __init__(self):
+        self.entries = []
+        self.requested = []
+
+    def log(self, command, duration):
+        self.entries.append({'id': len(self.entries), 'start_time': 1700000000 + len(self.entries),
+                             'duration': duration, 'command': command})
+
+    def slowlog_get(self, count):
+        self.requested.append(count)
+        return list(reversed(self.entries))[:count]
+
+
+@pytest.mark.parametrize('command, expected', [
+    (b'GET user:1', 'GET ?'),
+    (b'MGET a b c d', 'MGET ?'),
+    (b'SET session:9 payload EX 60 NX', 'SET ? EX ? NX'),
+    (b'ZRANGE board 0 -1 WITHSCORES', 'ZRANGE ? WITHSCORES'),
+    (b'CONFIG SET maxmemory 1gb', 'CONFIG SET ?'),
+    (b'HSET h ' + b'f v ' * 40 + b'... (48 more arguments)', 'HSET ?'),
+    ([b'KEYS', b'*'], 'KEYS ?'),
+])
+def test_fingerprint_strips_arguments(command, expected):
+    assert fingerprint(command) == expected
+
+
+def test_examples_keep_the_shape_but_not_the_arguments():
+    assert redact(b'SET session:9 secret-token EX 60 NX') == 'SET ? ? EX ? NX'
+    assert redact([b'MGET', b'a', b'b', b'c']) == 'MGET ? ? ?'
+
+
+def test_only_entries_after_the_high_water_mark_are_read():
+    node = FakeSlowlog()
+    for i in range(100):
+        node.log(b'GET k%d' % i, 10)
+
+    assert len(read_new_entries(node, None, page_size=8, max_entries=1024)) == 100
+    node.requested.clear()
+    for i in range(3):
+        node.log(b'SET k v', 20)
+
+    new = read_new_entries(node, 99, page_size=8, max_entries=1024)
+
+    assert [entry['id'] for entry in new] == [102, 101, 100]
+    assert node.requested == [8]
+
+
+def test_a_reset_slowlog_is_read_again():
+    node = FakeSlowlog()
+    node.log(b'GET a', 10)
+
+    assert len(read_new_entries(node, 57)) == 1
+
+
+def test_refresh_aggregates_every_node_once():
+    primary, replica = FakeSlowlog(), FakeSlowlog()
+    for duration in range(1, 101):
+        primary.log(b'HGETALL user:%d' % duration, duration * 1000)
+    replica.log(b'KEYS *', 9000000)
+    broken = Mock()
+    broken.slowlog_get.side_effect = ConnectionError('connection refused')
+    manager = RedisManager()
+    manager.get_nodes = Mock()
+    manager.get_nodes.return_value = {'10.0.0.1:6379': primary, '10.0.0.2:6379': replica, '10.0.0.3:6379': broken}
+    aggregator = SlowlogAggregator(page_size=16)
+
+    report = aggregator.refresh(manager, 1)
+    replica.log(b'KEYS user:*', 1000000)
+    again = aggregator.refresh(manager, 1)
+
+    assert report['nodes']['10.0.0.3:6379']['error'] == 'connection refused'
+    hgetall = next(f for f in again['fingerprints'] if f['fingerprint'] == 'HGETALL ?')
+    assert hgetall['count'] == 100
+    assert hgetall['total_ms'] == 5050
+    assert hgetall['p99_ms'] == 99
+    keys = again['fingerprints'][0]
+    assert keys['fingerprint'] == 'KEYS ?' and keys['count'] == 2 and keys['nodes'] == ['10.0.0.2:6379']
+    assert again['nodes']['10.0.0.2:6379'] == {'last_id': 1, 'new_entries': 1}
+    assert again['entries'] == 102
+    assert hgetall['example'] == 'HGETALL ?'
+
+
+def test_cluster_nodes_include_replicas():
+    manager = RedisManager()
+    cluster = Mock(spec=RedisCluster)
+    primary, replica = Mock(), Mock()
+    primary.name, replica.name = '10.0.0.1:7000', '10.0.0.2:7001'
+    cluster.get_nodes.return_value = [primary, replica]
+    manager.connections.get_or_create(1, lambda: cluster)
+
+    assert manager.get_nodes(1) == {'10.0.0.1:7000': primary.redis_connection,
+                                    '10.0.0.2:7001': replica.redis_connection}